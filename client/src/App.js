@@ -147,8 +147,7 @@ export default function App() {
           language={selectedLanguage}
           onBack={handleBackToLanding}
           userName={user.name}
-          userEmail={user.email}
-          userId={user.userId}
+          accessToken={user.accessToken}
         />
       )}
 
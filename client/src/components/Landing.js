@@ -28,7 +28,7 @@ export function Landing({ onMoodSubmit, currentLanguage, userName, userEmail, us
       
       try {
         setLoadingActivity(true);
-        const res = await fetch(`${BASE_URL}/home/get_recent_activity?user_id=${encodeURIComponent(userId)}&limit=10`);
+        const res = await fetch(`${BASE_URL}/home/activity?user_id=${encodeURIComponent(userId)}&limit=10`);
         const data = await res.json();
         
         if (res.ok) {
@@ -3,7 +3,7 @@ import { toast } from "sonner";
 
 const BASE_URL = "http://localhost:5000";
 
-export function Recommendations({ mood, text, contentType, language, onBack, userName, userEmail }) {
+export function Recommendations({ mood, text, contentType, language, onBack, userName, accessToken }) {
   const [recommendations, setRecommendations] = useState([]);
   const [page, setPage] = useState(1);
   const [hasMore, setHasMore] = useState(true);
@@ -11,11 +11,25 @@ export function Recommendations({ mood, text, contentType, language, onBack, use
 
   const fetchRecommendations = async (pageNum = 1) => {
     try {
-      const res = await fetch(`${BASE_URL}/home/`, {
-        method: "POST",
-        headers: { "Content-Type": "application/json" },
-        body: JSON.stringify({ mood, text, content_type: contentType, language, page: pageNum, limit, user_id: userEmail }),
-      });
+      // The user is identified by the bearer token, never in the URL, so proxies,
+      // access logs and browser history do not record who asked
+      const headers = accessToken ? { Authorization: `Bearer ${accessToken}` } : {};
+      const params = { content_type: contentType, language, page: pageNum, limit };
+      let res;
+      if (mood) {
+        // GET so the browser cache revalidates pages it has seen (ETag / 304) when switching back
+        const query = new URLSearchParams(
+          Object.entries({ mood, ...params }).filter(([, value]) => value !== undefined && value !== null && value !== "")
+        );
+        res = await fetch(`${BASE_URL}/home/?${query}`, { headers });
+      } else {
+        // Free-form mood text stays in the request body
+        res = await fetch(`${BASE_URL}/home/`, {
+          method: "POST",
+          headers: { ...headers, "Content-Type": "application/json" },
+          body: JSON.stringify({ text, ...params }),
+        });
+      }
       const data = await res.json();
       console.log("Fetched recommendations:", data);
 
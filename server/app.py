@@ -1,18 +1,31 @@
-from flask import Flask, jsonify, request
+from flask import Flask, jsonify, request, Response
 from flask_cors import CORS
 from routes.auth import auth_bp
 from routes.home import home_bp
+from utils.metrics import metrics, instrument
+from utils.startup import register_collectors, warm_up
 
 app = Flask(__name__)
 CORS(app)  # Allow requests from frontend (React)
 
+# Request latency, per-stage spans and upstream call counts, served at /metrics
+instrument(app)
+register_collectors()
+
 # Register Blueprints
 app.register_blueprint(auth_bp, url_prefix="/auth")
 app.register_blueprint(home_bp, url_prefix="/home")
 
+# Catalog snapshot, moods table and (optionally) the in-process catalog index
+warm_up()
+
 @app.route("/")
 def home():
     return jsonify({"message": "Backend running successfully!"})
 
+@app.route("/metrics")
+def prometheus_metrics():
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
 if __name__ == "__main__":
     app.run(debug=True, port=5000)
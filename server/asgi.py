@@ -0,0 +1,54 @@
+"""Async serving mode: the /home and /auth endpoints as an ASGI app.
+
+Same API as app.py, but each request awaits its Supabase calls on one pooled
+async client per worker instead of holding a thread across them, so
+concurrency is no longer capped by the number of gunicorn threads. Run with
+
+    uvicorn asgi:app --workers 4 --port 5000
+
+Needs the optional starlette and uvicorn packages; app.py (WSGI) stays the default.
+"""
+from contextlib import asynccontextmanager
+
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Mount, Route
+
+from routes import async_auth, async_home
+from utils.metrics import instrument_asgi, metrics
+from utils.startup import register_collectors, warm_up
+from utils.sup_client import close_async_client
+
+register_collectors()
+
+
+@asynccontextmanager
+async def lifespan(app):
+    # Same warm-up as app.py; it runs once per worker, before it takes requests
+    await run_in_threadpool(warm_up)
+    yield
+    await close_async_client()
+
+
+async def home(request):
+    return JSONResponse({"message": "Backend running successfully!"})
+
+
+async def prometheus_metrics(request):
+    return Response(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+app = Starlette(
+    routes=[
+        Route("/", home),
+        Route("/metrics", prometheus_metrics),
+        Mount("/auth", routes=async_auth.routes),
+        Mount("/home", routes=async_home.routes),
+    ],
+    middleware=[Middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"])],
+    lifespan=lifespan,
+)
+app = instrument_asgi(app)
@@ -0,0 +1,92 @@
+"""Throughput and per-call latency of mood extraction over a text corpus.
+
+Uses a synthetic corpus by default (short and long texts, some negated, some
+with no mood words), or one text per line from --corpus. Results are written
+to benchmarks/results/ (see benchmarks/report.py).
+
+Run from the server directory:
+    python -m benchmarks.bench_mood_corpus [--texts 20000] [--corpus FILE] [--compare OLD.json]
+"""
+import argparse
+import random
+import time
+
+from benchmarks.report import compare, summarize, write_results
+from utils.mood_extract import extract_mood, extract_moods, mood_keywords, score_moods
+
+FILLER = (
+    "today the and a i was with after work some it feel like really just "
+    "watch listen tonight maybe movie song something week friends home"
+).split()
+
+
+def synthetic_corpus(count, seed=0):
+    rng = random.Random(seed)
+    keywords = [kw for kws in mood_keywords.values() for kw in kws]
+    texts = []
+    for _ in range(count):
+        words = [rng.choice(FILLER) for _ in range(rng.choice([6, 12, 40, 200]))]
+        # Most texts carry one to three mood words, some none at all
+        for _ in range(rng.choice([0, 1, 1, 2, 3])):
+            pos = rng.randrange(len(words))
+            words[pos] = rng.choice(keywords)
+            if rng.random() < 0.2:
+                words.insert(pos, "not")
+        texts.append(" ".join(words))
+    return texts
+
+
+def per_call(fn, texts):
+    latencies = []
+    started = time.perf_counter()
+    for text in texts:
+        t = time.perf_counter()
+        fn(text)
+        latencies.append((time.perf_counter() - t) * 1000)
+    elapsed = time.perf_counter() - started
+    return dict(summarize(latencies), texts_per_s=round(len(texts) / elapsed, 1))
+
+
+def batch(texts, parallel):
+    started = time.perf_counter()
+    for _ in extract_moods(texts, parallel=parallel):
+        pass
+    return {"texts_per_s": round(len(texts) / (time.perf_counter() - started), 1)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--texts", type=int, default=20000, help="size of the synthetic corpus")
+    parser.add_argument("--corpus", help="file with one text per line instead of the synthetic corpus")
+    parser.add_argument("--output", help="results file (default benchmarks/results/mood_corpus-<commit>.json)")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    args = parser.parse_args(argv)
+
+    if args.corpus:
+        with open(args.corpus) as f:
+            texts = [line.strip() for line in f if line.strip()]
+    else:
+        texts = synthetic_corpus(args.texts)
+
+    extract_mood(texts[0])  # warm up
+    results = [
+        dict(case="extract_mood", **per_call(extract_mood, texts)),
+        dict(case="score_moods", **per_call(score_moods, texts)),
+        dict(case="extract_moods batch", **batch(texts, parallel=False)),
+        dict(case="extract_moods parallel", **batch(texts, parallel=True)),
+    ]
+
+    print(f"{len(texts)} texts, {sum(map(len, texts)) / len(texts):.0f} chars on average")
+    print(f"{'case':<24}{'texts/s':>12}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for row in results:
+        print(f"{row['case']:<24}{row['texts_per_s']:>12}"
+              + "".join(f"{row.get(k, '-'):>10}" for k in ("p50_ms", "p95_ms", "p99_ms")))
+
+    config = {"texts": len(texts), "corpus": args.corpus or "synthetic"}
+    print("Results written to", write_results("mood_corpus", config, results, args.output))
+    if args.compare:
+        compare(args.compare, results, ["case"], ["texts_per_s", "p50_ms", "p99_ms"])
+
+
+if __name__ == "__main__":
+    main()
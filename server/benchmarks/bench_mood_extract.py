@@ -0,0 +1,49 @@
+"""Per-call latency of extract_mood, compared with the old per-keyword regex scan.
+
+Run from the server directory:
+    python -m benchmarks.bench_mood_extract
+"""
+import re
+import timeit
+
+from utils.mood_extract import extract_mood, mood_keywords
+
+SHORT_TEXT = "Feeling a bit down and lonely tonight"
+LONG_TEXT = " ".join([
+    "Today started slow, I spent the morning reading and thinking about where",
+    "the year went. Work has been a grind and the commute was terrible, but",
+    "the evening was quiet and I finally had time to cook something nice.",
+    "Now I want to sit back with a film that keeps me company without asking",
+    "too much of me, maybe something with a twist near the end.",
+] * 8)
+NO_MATCH_TEXT = "zzz " * 50
+
+
+def legacy_extract_mood(user_text):
+    # The pre-trie implementation: rebuild the keyword table, then one regex per keyword
+    text = user_text.lower().strip()
+    keywords_by_mood = {mood: list(kws) for mood, kws in mood_keywords.items()}
+    for mood, keywords in keywords_by_mood.items():
+        for kw in keywords:
+            if re.search(rf"\b{kw}\w*\b", text):
+                return mood
+    return None
+
+
+def bench(fn, text, number):
+    total = min(timeit.repeat(lambda: fn(text), number=number, repeat=5))
+    return total / number * 1e6
+
+
+def main():
+    cases = [("short", SHORT_TEXT), ("long", LONG_TEXT), ("no match", NO_MATCH_TEXT)]
+    print(f"{'input':<10}{'chars':>8}{'before (us)':>14}{'after (us)':>13}{'speedup':>10}")
+    for label, text in cases:
+        assert legacy_extract_mood(text) == extract_mood(text)
+        before = bench(legacy_extract_mood, text, 200)
+        after = bench(extract_mood, text, 2000)
+        print(f"{label:<10}{len(text):>8}{before:>14.1f}{after:>13.1f}{before / after:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""Payload size and JSON encode time of a 100-row /home/ page in each response shape.
+
+Run from the server directory:
+    python -m benchmarks.bench_payload
+"""
+import json
+import random
+import timeit
+
+from utils.projection import DEFAULT_FIELDS, to_columnar
+
+LIMIT = 100
+
+
+def full_movie_row(i):
+    # Roughly what select("*") returns for a movies row
+    return {
+        "movie_id": 10_000 + i,
+        "title": f"Some Movie Title Number {i}",
+        "genre": random.choice(["Comedy", "Drama", "Action", "Horror", "Romance"]),
+        "release_year": random.randint(1970, 2025),
+        "language": random.choice(["en", "hi", "ta", "ml", "te", "kn"]),
+        "mood_id": random.randint(1, 8),
+        "api_id": 500_000 + i,
+        "created_at": "2025-09-14T10:21:45.123456+00:00",
+    }
+
+
+def bench(payload):
+    body = json.dumps(payload)
+    seconds = min(timeit.repeat(lambda: json.dumps(payload), number=500, repeat=5)) / 500
+    return len(body.encode()), seconds * 1e6
+
+
+def main():
+    random.seed(0)
+    rows = [full_movie_row(i) for i in range(LIMIT)]
+    fields = DEFAULT_FIELDS["movies"]
+    projected = [{col: row[col] for col in fields} for row in rows]
+    columns, values = to_columnar(projected, fields)
+
+    shapes = [
+        ('select("*") rows', {"mood": "Happy", "count": LIMIT, "results": rows}),
+        ("default fields", {"mood": "Happy", "count": LIMIT, "results": projected}),
+        ("fields + columnar", {"mood": "Happy", "count": LIMIT, "columns": columns, "rows": values}),
+    ]
+    print(f"{'shape':<20}{'bytes':>10}{'encode (us)':>14}")
+    for label, payload in shapes:
+        size, micros = bench(payload)
+        print(f"{label:<20}{size:>10}{micros:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+"""Load test of the API against the local Supabase stand-in.
+
+Seeds a SQLite catalog (utils/local_backend.py) and a benchmark account, then
+starts the API with SUP_BACKEND=local: the WSGI app (app.py) under gunicorn
+in "sync" mode, the ASGI app (asgi.py) under uvicorn in "async" mode. Each
+endpoint is driven in turn by N closed-loop client threads for --duration
+seconds at each --concurrency level. Throughput and p50/p95/p99 latency per
+(mode, endpoint, concurrency) are printed and written to benchmarks/results/
+(see benchmarks/report.py), with the count of each response status; anything
+other than a 2xx or 304 counts as an error.
+
+Run from the server directory:
+    python -m benchmarks.load_test [--mode sync,async] [--concurrency 1,8,32,64,200]
+        [--duration 5] [--latency-ms 20] [--workers 2] [--threads 8] [--compare OLD.json]
+"""
+import argparse
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+
+import requests
+
+from benchmarks.report import compare, summarize, write_results
+from utils.local_backend import LocalClient, MOOD_NAMES, seed_catalog
+from utils.pagination import encode_cursor
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCH_EMAIL = "bench@example.com"
+BENCH_PASSWORD = "bench-password"
+LANGUAGES = ["en", "hi", "ta", "ml", "te", "kn"]
+
+
+def home_request(rng):
+    content_type = rng.choice(["movies", "series", "songs"])
+    body = {"mood": rng.choice(MOOD_NAMES), "content_type": content_type,
+            "page": rng.randint(1, 5), "limit": 20, "user_id": f"bench-{rng.randrange(1000)}"}
+    if content_type != "songs":
+        body["language"] = rng.choice(LANGUAGES)
+    return "POST", "/home/", body
+
+
+def feed_request(rng):
+    return "POST", "/home/feed", {"mood": rng.choice(MOOD_NAMES), "limit": 10,
+                                  "user_id": f"bench-{rng.randrange(1000)}"}
+
+
+def log_activity_request(rng):
+    return "POST", "/home/log_activity", {"user_id": f"bench-{rng.randrange(1000)}",
+                                          "action": "viewed", "mood": rng.choice(MOOD_NAMES)}
+
+
+# Older than every row: each request is a real activity_logs query, never the per-user cache
+ACTIVITY_CURSOR = encode_cursor(c="9999-12-31T00:00:00+00:00")
+
+
+def activity_request(rng):
+    return "GET", f"/home/activity?user_id=bench-{rng.randrange(1000)}&cursor={ACTIVITY_CURSOR}", None
+
+
+def login_request(rng):
+    return "POST", "/auth/login", {"email": BENCH_EMAIL, "password": BENCH_PASSWORD}
+
+
+ENDPOINTS = {
+    "home": home_request,
+    "feed": feed_request,
+    "log_activity": log_activity_request,
+    "activity": activity_request,
+    "login": login_request,
+}
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def prepare_database(path, size):
+    client = LocalClient(path)
+    seed_catalog(client, movies=size, series=size // 2, songs=size)
+    client.auth.sign_up({"email": BENCH_EMAIL, "password": BENCH_PASSWORD})
+    client.conn.close()
+
+
+def start_server(port, env, workers, threads, mode="sync"):
+    if mode == "async":
+        cmd = [
+            sys.executable, "-m", "uvicorn", "asgi:app",
+            "--host", "127.0.0.1", "--port", str(port), "--workers", str(workers),
+            "--log-level", "warning", "--no-access-log",
+        ]
+    else:
+        cmd = [
+            sys.executable, "-m", "gunicorn", "app:app",
+            "--bind", f"127.0.0.1:{port}", "--workers", str(workers), "--threads", str(threads),
+            "--log-level", "warning",
+        ]
+    proc = subprocess.Popen(cmd, cwd=SERVER_DIR, env=env)
+    # The socket accepts connections before the workers have finished importing the app
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"{cmd[2]} exited with {proc.returncode}")
+        try:
+            requests.get(f"http://127.0.0.1:{port}/", timeout=5)
+            return proc
+        except requests.RequestException:
+            time.sleep(0.2)
+    proc.terminate()
+    proc.wait(timeout=30)
+    raise RuntimeError(f"{cmd[2]} did not start within 60s")
+
+
+def _succeeded(status):
+    # A 4xx means the request was rejected, not served: only 2xx and 304 count
+    return 200 <= status < 300 or status == 304
+
+
+def run_level(base_url, make_request, concurrency, duration, seed):
+    latencies = []
+    statuses = Counter()  # HTTP status, or "error" when no response came back
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def client(n):
+        rng = random.Random(seed * 1000 + n)
+        session = requests.Session()
+        mine, seen = [], Counter()
+        while time.monotonic() < deadline:
+            method, path, body = make_request(rng)
+            started = time.perf_counter()
+            try:
+                seen[session.request(method, base_url + path, json=body, timeout=30).status_code] += 1
+            except requests.RequestException:
+                seen["error"] += 1
+            mine.append((time.perf_counter() - started) * 1000)
+        with lock:
+            latencies.extend(mine)
+            statuses.update(seen)
+
+    started = time.monotonic()
+    workers = [threading.Thread(target=client, args=(n,)) for n in range(concurrency)]
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    elapsed = time.monotonic() - started
+    return dict(
+        requests=len(latencies),
+        errors=sum(n for status, n in statuses.items() if status == "error" or not _succeeded(status)),
+        statuses={str(status): n for status, n in sorted(statuses.items(), key=lambda item: str(item[0]))},
+        throughput_rps=round(len(latencies) / elapsed, 1),
+        **summarize(latencies),
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mode", default="sync", help="comma-separated: sync (gunicorn, app.py), async (uvicorn, asgi.py)")
+    parser.add_argument("--endpoints", default="home,log_activity,login",
+                        help=f"comma-separated, from {', '.join(ENDPOINTS)}")
+    parser.add_argument("--concurrency", default="1,8,32,64", help="comma-separated client thread counts")
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds per endpoint and level")
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="simulated Supabase round trip")
+    parser.add_argument("--catalog-size", type=int, default=5000, help="movies and songs to seed")
+    parser.add_argument("--workers", type=int, default=2, help="gunicorn / uvicorn worker processes")
+    parser.add_argument("--threads", type=int, default=8, help="gunicorn threads per worker")
+    parser.add_argument("--output", help="results file (default benchmarks/results/load-<commit>.json)")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    args = parser.parse_args(argv)
+
+    endpoints = args.endpoints.split(",")
+    unknown = set(endpoints) - set(ENDPOINTS)
+    if unknown:
+        parser.error(f"unknown endpoints: {', '.join(sorted(unknown))}")
+    levels = [int(n) for n in args.concurrency.split(",")]
+    modes = args.mode.split(",")
+    if set(modes) - {"sync", "async"}:
+        parser.error("--mode takes sync and/or async")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.sqlite3")
+        prepare_database(db_path, args.catalog_size)
+        port = free_port()
+        env = dict(
+            os.environ,
+            SUP_BACKEND="local",
+            SUP_LOCAL_DB=db_path,
+            SUP_LOCAL_LATENCY_MS=str(args.latency_ms),
+            SUP_LOCAL_SEED="0",
+            CATALOG_VERSION_FILE=os.path.join(tmp, "catalog_version"),
+        )
+        # The OpenAI client is created at import time but never called on these paths
+        env.setdefault("OPEN_AI_KEY", "benchmark-placeholder")
+        results = []
+        print(f"{'mode':<7}{'endpoint':<14}{'conc':>6}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}  statuses")
+        for mode in modes:
+            server = start_server(port, env, args.workers, args.threads, mode)
+            try:
+                base_url = f"http://127.0.0.1:{port}"
+                for endpoint in endpoints:
+                    for concurrency in levels:
+                        row = dict(mode=mode, endpoint=endpoint, concurrency=concurrency,
+                                   **run_level(base_url, ENDPOINTS[endpoint], concurrency, args.duration, concurrency))
+                        results.append(row)
+                        print(f"{mode:<7}{endpoint:<14}{concurrency:>6}{row['throughput_rps']:>10}{row['p50_ms']:>10}"
+                              f"{row['p95_ms']:>10}{row['p99_ms']:>10}{row['errors']:>8}  "
+                              + " ".join(f"{status}:{n}" for status, n in row["statuses"].items()))
+            finally:
+                server.terminate()
+                server.wait(timeout=30)
+
+    config = {
+        "duration_s": args.duration, "latency_ms": args.latency_ms, "catalog_size": args.catalog_size,
+        "modes": modes, "workers": args.workers, "gunicorn_threads": args.threads,
+    }
+    print("Results written to", write_results("load", config, results, args.output))
+    if args.compare:
+        compare(args.compare, results, ["mode", "endpoint", "concurrency"], ["throughput_rps", "p50_ms", "p99_ms"])
+
+
+if __name__ == "__main__":
+    main()
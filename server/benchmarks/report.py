@@ -0,0 +1,90 @@
+"""Helpers shared by the benchmarks that write machine-readable results.
+
+Results are JSON files under benchmarks/results/ named after the benchmark and
+the current commit, so two commits can be compared with --compare.
+"""
+import json
+import os
+import platform
+import subprocess
+import time
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(0, min(len(sorted_values) - 1, round(pct / 100 * len(sorted_values) + 0.5) - 1))
+    return sorted_values[rank]
+
+
+def summarize(latencies_ms):
+    values = sorted(latencies_ms)
+    return {
+        "p50_ms": _round(percentile(values, 50)),
+        "p95_ms": _round(percentile(values, 95)),
+        "p99_ms": _round(percentile(values, 99)),
+        "mean_ms": _round(sum(values) / len(values)) if values else None,
+        "max_ms": _round(values[-1]) if values else None,
+    }
+
+
+def _round(value):
+    return None if value is None else round(value, 3)
+
+
+def git_commit():
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=10,
+            cwd=os.path.dirname(__file__),
+        )
+        commit = out.stdout.strip() or "unknown"
+        dirty = subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"], capture_output=True, text=True,
+            timeout=30, cwd=os.path.dirname(__file__),
+        ).stdout.strip()
+        return f"{commit}-dirty" if dirty else commit
+    except (OSError, subprocess.SubprocessError):
+        return "unknown"
+
+
+def write_results(name, config, results, output=None):
+    """Write one results file and return its path."""
+    commit = git_commit()
+    payload = {
+        "benchmark": name,
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "config": config,
+        "results": results,
+    }
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"{name}-{commit}.json")
+    with open(output, "w") as f:
+        json.dump(payload, f, indent=2)
+    return output
+
+
+def compare(baseline_path, results, key_fields, metrics):
+    """Print each metric next to the same row of a baseline results file."""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    old_rows = {tuple(row.get(k) for k in key_fields): row for row in baseline["results"]}
+    print(f"\nCompared with {baseline['commit']} ({baseline_path}):")
+    for row in results:
+        old = old_rows.get(tuple(row.get(k) for k in key_fields))
+        if not old:
+            continue
+        label = " ".join(str(row[k]) for k in key_fields)
+        changes = []
+        for metric in metrics:
+            if old.get(metric) and row.get(metric) is not None:
+                changes.append(f"{metric} {old[metric]} -> {row[metric]} ({(row[metric] / old[metric] - 1) * 100:+.1f}%)")
+        print(f"  {label}: " + ", ".join(changes))
@@ -0,0 +1,91 @@
+import asyncio
+
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+from routes.async_home import _body
+from routes.auth import _session_body
+from utils.auth_tokens import session_refresher
+from utils.metrics import span
+from utils.repository import async_repo
+
+# The /auth endpoints for asgi.py, with the responses of routes/auth.py
+
+
+async def register(request):
+    data = await _body(request)
+    name = data.get('name')  # optional
+    email = data.get('email')
+    password = data.get('password')
+
+    if not email or not password:
+        return JSONResponse({"error": "Email and password are required"}, status_code=400)
+
+    try:
+        with span("auth.sign_up"):
+            response = await async_repo.sign_up(email, password)
+        if response.user:
+            return JSONResponse({
+                "message": "User registered successfully!",
+                "user": response.user.email,
+                "name": name
+            }, status_code=201)
+        else:
+            return JSONResponse({"error": "Registration failed"}, status_code=400)
+    except Exception as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+
+
+async def login(request):
+    data = await _body(request)
+    email = data.get('email')
+    password = data.get('password')
+
+    if not email or not password:
+        return JSONResponse({"error": "Email and password are required"}, status_code=400)
+
+    try:
+        with span("auth.sign_in"):
+            response = await async_repo.sign_in(email, password)
+        if response.session:
+            return JSONResponse({"message": "Login successful!", **_session_body(response)})
+        else:
+            return JSONResponse({"error": "Invalid credentials"}, status_code=401)
+    except Exception as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+
+
+async def _rotate(refresh_token):
+    with span("auth.refresh"):
+        response = await async_repo.refresh_session(refresh_token)
+    if not response.session:
+        raise ValueError("Invalid refresh token")
+    return _session_body(response)
+
+
+async def refresh(request):
+    data = await _body(request)
+    refresh_token = data.get('refresh_token')
+
+    if not refresh_token:
+        return JSONResponse({"error": "refresh_token is required"}, status_code=400)
+
+    # Rotation goes through the same SessionRefresher as the Flask app. Refreshes are
+    # rare, so its blocking wait runs in a thread and the rotation itself on this loop.
+    loop = asyncio.get_running_loop()
+
+    def rotate():
+        return asyncio.run_coroutine_threadsafe(_rotate(refresh_token), loop).result()
+
+    try:
+        session = await asyncio.to_thread(session_refresher.refresh, refresh_token, rotate)
+        return JSONResponse({"message": "Session refreshed", **session})
+    except Exception as e:
+        return JSONResponse({"error": str(e)}, status_code=401)
+
+
+routes = [
+    Route("/register", register, methods=["POST"]),
+    Route("/login", login, methods=["POST"]),
+    Route("/refresh", refresh, methods=["POST"]),
+]
@@ -0,0 +1,197 @@
+import asyncio
+import functools
+import json
+
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+from routes.home import (
+    ACTIVITY_FIELDS, _activity_args, _activity_body, _feed_params, _feed_payload, _flag, _local_page,
+    _log_search, _mood_batch, _queue_activity, _recommend_etag, _recommend_params, _recommend_payload,
+    _resolve_mood, _similar, _snapshot_fallback,
+)
+from utils.activity_history import recent_activity
+from utils.auth_tokens import InvalidToken, bearer_user, choose_user
+from utils.http_response import encode_json, etag_matches, not_modified_headers
+from utils.metrics import span
+from utils.mood_registry import moods
+from utils.personalize import mixed_moods
+from utils.projection import DEFAULT_FIELDS
+from utils.repository import async_repo
+from utils.result_cache import results_cache
+
+# The /home endpoints for asgi.py. Parsing, personalization and response building
+# are shared with routes/home.py; only the Supabase calls differ, and they are
+# awaited on the pooled async client instead of holding a thread.
+
+
+def _error(error):
+    body, status = error
+    return JSONResponse(body, status_code=status)
+
+
+def _encoded(request, payload, etag=None):
+    # Same ETag / 304 / compression handling as the Flask app's json_response
+    status, body, headers = encode_json(
+        json.dumps(payload, sort_keys=True).encode(), request.method,
+        request.headers.get("if-none-match"), request.headers.get("accept-encoding"), etag,
+    )
+    if status == 304:
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
+
+
+async def _resolve_mood_async(data):
+    # A lookup is a dict read, but one that finds the moods cache expired reloads it
+    # from Supabase: that one goes to a thread instead of blocking the event loop
+    if moods.stale():
+        return await run_in_threadpool(_resolve_mood, data)
+    return _resolve_mood(data)
+
+
+async def _body(request):
+    try:
+        return await request.json() or {}
+    except ValueError:
+        return {}
+
+
+def authenticated(handler):
+    """The async counterpart of home_bp's before_request: a bearer token sets request.state.user_id."""
+    @functools.wraps(handler)
+    async def endpoint(request):
+        try:
+            request.state.user_id = bearer_user(request.headers.get("authorization"))
+        except InvalidToken as e:
+            return JSONResponse({"error": str(e)}, status_code=401)
+        return await handler(request)
+    return endpoint
+
+
+async def _fetch_page(mood_id, content_type, language, page, limit, after=None, fields=None):
+    offset = (page - 1) * limit
+    with span("content_query"):
+        rows = _local_page(mood_id, content_type, language, offset, limit, after, fields)
+        if rows is not None:
+            return rows
+        position = ("after", after) if after is not None else page
+        try:
+            return await results_cache.get_or_load_async(
+                (mood_id, content_type, language, position, limit, fields),
+                lambda: async_repo.content_page(content_type, mood_id, language, offset, limit, after, fields),
+            )
+        except Exception as e:
+            return _snapshot_fallback(e, mood_id, content_type, language, offset, limit, after, fields)
+
+
+async def log_activity(request):
+    data = await _body(request)
+    user_id = choose_user(request.state.user_id, data.get("user_id"))
+    body, status = _queue_activity(user_id, data.get("action"), data.get("mood"))
+    return JSONResponse(body, status_code=status)
+
+
+async def activity_history(request):
+    user_id = choose_user(request.state.user_id, request.query_params.get("user_id"))
+    limit, before, error = _activity_args(request.query_params)
+    if error:
+        return _error(error)
+
+    if not user_id:
+        return JSONResponse({"error": "Missing user_id"}, status_code=400)
+
+    try:
+        if before:
+            activities = await async_repo.activity_page(user_id, ACTIVITY_FIELDS, limit, before)
+        else:
+            activities = await recent_activity.recent_async(
+                user_id, limit, lambda n: async_repo.activity_page(user_id, ACTIVITY_FIELDS, n)
+            )
+    except Exception as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+
+    return JSONResponse(_activity_body(activities, limit))
+
+
+async def similar_songs(request):
+    # CPU-bound nearest-neighbour search: off the event loop
+    body, status = await run_in_threadpool(_similar, await _body(request))
+    return JSONResponse(body, status_code=status)
+
+
+async def extract_mood_batch(request):
+    lines, error = _mood_batch(await _body(request))
+    if error:
+        return _error(error)
+    # A sync iterator: Starlette pulls it from a worker thread
+    return StreamingResponse(lines, media_type="application/x-ndjson")
+
+
+async def recommend_content(request):
+    data = await _body(request) if request.method == "POST" else dict(request.query_params)
+    params, error = _recommend_params(data)
+    if error:
+        return _error(error)
+
+    user_id = choose_user(request.state.user_id, data.get("user_id"))
+    personalize = bool(user_id) and _flag(data.get("personalize"), True)
+    etag = _recommend_etag(data, params, user_id if personalize else None)
+
+    mood_name, mood_id, error = await _resolve_mood_async(data)
+    if error:
+        return _error(error)
+
+    if etag and request.method == "GET" and etag_matches(request.headers.get("if-none-match"), etag):
+        if user_id:
+            _log_search(user_id, params["content_type"], mood_name, params["language"])
+        return Response(status_code=304, headers=not_modified_headers(
+            etag, request.headers.get("if-none-match"), request.headers.get("accept-encoding")))
+
+    try:
+        candidates = await _fetch_page(mood_id, params["content_type"], params["language"], params["page"],
+                                       params["limit"], params["after"], params["fields"])
+    except Exception as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+
+    response = _recommend_payload(data, params, user_id, personalize, mood_name, candidates)
+    if personalize and mixed_moods(candidates):
+        etag = None  # its order also depends on the mood ranking, which the ETag leaves out
+    return _encoded(request, response, etag)
+
+
+async def mixed_feed(request):
+    data = await _body(request)
+    language = data.get("language")
+    params, error = _feed_params(data)
+    if error:
+        return _error(error)
+    content_types, page, limit = params
+
+    mood_name, mood_id, error = await _resolve_mood_async(data)
+    if error:
+        return _error(error)
+
+    # The per-type queries are independent: await them together
+    try:
+        results = await asyncio.gather(*(
+            _fetch_page(mood_id, content_type, None if content_type == "songs" else language,
+                        page, limit, None, DEFAULT_FIELDS[content_type])
+            for content_type in content_types
+        ))
+    except Exception as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    pages = dict(zip(content_types, results))
+
+    user_id = choose_user(request.state.user_id, data.get("user_id"))
+    return JSONResponse(_feed_payload(data, pages, user_id, mood_name, language))
+
+
+routes = [
+    Route("/", authenticated(recommend_content), methods=["GET", "POST"]),
+    Route("/feed", authenticated(mixed_feed), methods=["POST"]),
+    Route("/log_activity", authenticated(log_activity), methods=["POST"]),
+    Route("/activity", authenticated(activity_history), methods=["GET"]),
+    Route("/similar", authenticated(similar_songs), methods=["POST"]),
+    Route("/extract_mood_batch", authenticated(extract_mood_batch), methods=["POST"]),
+]
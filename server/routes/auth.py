@@ -1,14 +1,7 @@
 from flask import Blueprint, request, jsonify
-from supabase import create_client, Client
-import os
-from dotenv import load_dotenv
-from utils.sup_client import sb
-
-load_dotenv()
-
-
-SUP_URL = os.getenv("SUP_URL")
-SUP_KEY = os.getenv("SUP_KEY")
+from utils.repository import repo
+from utils.metrics import span
+from utils.auth_tokens import session_refresher
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -23,10 +16,8 @@ def register():
         return jsonify({"error": "Email and password are required"}), 400
 
     try:
-        response = sb.auth.sign_up({
-            "email": email,
-            "password": password
-        })
+        with span("auth.sign_up"):
+            response = repo.sign_up(email, password)
         if response.user:
             # optionally store 'name' in your users table
             return jsonify({
@@ -50,18 +41,44 @@ def login():
         return jsonify({"error": "Email and password are required"}), 400
 
     try:
-        response = sb.auth.sign_in_with_password({
-            "email": email,
-            "password": password
-        })
+        with span("auth.sign_in"):
+            response = repo.sign_in(email, password)
         if response.session:
-            return jsonify({
-                "message": "Login successful!",
-                "access_token": response.session.access_token,
-                "refresh_token": response.session.refresh_token,
-                "user": response.user.email
-            }), 200
+            return jsonify({"message": "Login successful!", **_session_body(response)}), 200
         else:
             return jsonify({"error": "Invalid credentials"}), 401
     except Exception as e:
         return jsonify({"error": str(e)}), 400
+
+
+def _session_body(response):
+    return {
+        "access_token": response.session.access_token,
+        "refresh_token": response.session.refresh_token,
+        "expires_in": getattr(response.session, "expires_in", None),
+        "user": response.user.email,
+    }
+
+
+def _rotate(refresh_token):
+    with span("auth.refresh"):
+        response = repo.refresh_session(refresh_token)
+    if not response.session:
+        raise ValueError("Invalid refresh token")
+    return _session_body(response)
+
+
+@auth_bp.route('/refresh', methods=['POST'])
+def refresh():
+    data = request.get_json(silent=True) or {}
+    refresh_token = data.get('refresh_token')
+
+    if not refresh_token:
+        return jsonify({"error": "refresh_token is required"}), 400
+
+    try:
+        # The old refresh token is spent; the client must store the new pair
+        session = session_refresher.refresh(refresh_token, lambda: _rotate(refresh_token))
+        return jsonify({"message": "Session refreshed", **session}), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 401
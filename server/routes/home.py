@@ -1,18 +1,49 @@
-from flask import Blueprint, request, jsonify
-from utils.sup_client import sb
-from utils.mood_extract import extract_mood
+import contextvars
+import json
+from concurrent.futures import ThreadPoolExecutor
+from flask import Blueprint, request, jsonify, Response, stream_with_context
+from utils.mood_extract import extract_mood, extract_moods
+from utils.mood_registry import moods
+from utils.result_cache import results_cache
+from utils.catalog_index import catalog_index, CATALOG_INDEX_ENABLED, CONTENT_KEYS
+from utils.catalog_snapshot import catalog_snapshot
+from utils.pagination import encode_cursor, decode_cursor
+from utils.projection import DEFAULT_FIELDS, parse_fields, to_columnar
+from utils.activity_writer import activity_writer
+from utils.activity_history import recent_activity
+from utils.song_features import song_index
+from utils.personalize import mixed_moods, personalizer
+from utils.repository import repo
+from utils.metrics import span
+from utils.http_response import etag_matches, json_response, make_etag, not_modified
+from utils.auth_tokens import authenticate_request, current_user_id
+from utils import catalog_version
 
 home_bp = Blueprint("home", __name__)
 
-@home_bp.route("/log_activity", methods=["POST"])
-def log_activity():
-    data = request.get_json()
-    user_id = data.get("user_id")
-    action = data.get("action")  # e.g., "searched for movies"
-    mood = data.get("mood")      # e.g., "Sad"
-    
+MAX_MOOD_BATCH = 20000
+
+# Columns the profile page shows for each activity
+ACTIVITY_FIELDS = "action, mood, created_at"
+MAX_ACTIVITY_PAGE = 100
+MAX_SIMILAR = 50
+MAX_PAGE_SIZE = 100
+
+CONTENT_TYPES = ("movies", "songs", "series")
+# Shared by /feed so the per-type queries of one request run side by side
+_feed_pool = ThreadPoolExecutor(max_workers=12, thread_name_prefix="feed")
+
+activity_writer.add_listener(recent_activity.record)
+activity_writer.add_listener(personalizer.record)
+
+# A bearer token, when sent, is verified locally and overrides any user_id in the request
+home_bp.before_request(authenticate_request)
+
+
+def _queue_activity(user_id, action, mood):
+    """(body, status) for /log_activity."""
     if not user_id or not action:
-        return jsonify({"error": "Missing user_id or action"}), 400
+        return {"error": "Missing user_id or action"}, 400
 
     try:
         # If the client sent an email as user_id, also include user_email column when inserting.
@@ -25,126 +56,433 @@ def log_activity():
         if isinstance(user_id, str) and "@" in user_id:
             insert_payload["user_email"] = user_id
 
-        resp = sb.table("activity_logs").insert(insert_payload).execute()
+        # Written in the background by the batched activity writer
+        with span("activity_log"):
+            queued = activity_writer.log(insert_payload)
+        if not queued:
+            return {"error": "Activity log queue is full, try again later"}, 503
 
-        # Return the inserted row so frontend can confirm
-        inserted = resp.data[0] if getattr(resp, "data", None) else None
-        return jsonify({"status": "success", "activity": inserted})
+        # Return the queued row so frontend can confirm
+        return {"status": "success", "activity": insert_payload}, 200
     except Exception as e:
-        return jsonify({"error": str(e)}), 400
+        return {"error": str(e)}, 400
 
-        # Order by created_at descending (most recent first)
-        # Try matching `user_id` first; if that returns no rows, try `user_email`.
-        resp = (
-            sb.table("activity_logs")
-            .select("*")
-            .eq("user_id", user_id)
-            .order("created_at", desc=True)
-            .limit(limit)
-            .execute()
-        )
 
-        activities = resp.data or []
-
-        if not activities:
-            # try user_email column as a fallback (some clients send email as identifier)
-            try:
-                resp2 = (
-                    sb.table("activity_logs")
-                    .select("*")
-                    .eq("user_email", user_id)
-                    .order("created_at", desc=True)
-                    .limit(limit)
-                    .execute()
-                )
-                activities = resp2.data or []
-            except Exception:
-                # if fallback fails, keep activities as empty list
-                activities = activities
-
-        return jsonify({"activities": activities})
-        return jsonify({"activities": []})
+@home_bp.route("/log_activity", methods=["POST"])
+def log_activity():
+    data = request.get_json()
+    user_id = current_user_id(data.get("user_id"))
+    action = data.get("action")  # e.g., "searched for movies"
+    mood = data.get("mood")      # e.g., "Sad"
+    body, status = _queue_activity(user_id, action, mood)
+    return jsonify(body), status
+
 
+def _activity_args(args):
+    """(limit, before, None) for /activity, or (None, None, (error body, status))."""
     try:
-        # Order by created_at descending (most recent first)
-        resp = (
-            sb.table("activity_logs")
-            .select("*")
-            .eq("user_id", user_id)
-            .order("created_at", desc=True)
-            .limit(limit)
-            .execute()
-        )
+        limit = int(args.get("limit", 20))
+    except (TypeError, ValueError):
+        return None, None, ({"error": "limit must be an integer"}, 400)
+    if not 1 <= limit <= MAX_ACTIVITY_PAGE:
+        return None, None, ({"error": f"limit must be between 1 and {MAX_ACTIVITY_PAGE}"}, 400)
+    before = None
+    if args.get("cursor"):
+        try:
+            before = decode_cursor(args["cursor"]).get("c")
+        except ValueError as e:
+            return None, None, ({"error": str(e)}, 400)
+        if not before:
+            return None, None, ({"error": "Invalid cursor"}, 400)
+    return limit, before, None
 
-        activities = resp.data or []
-        return jsonify({"activities": activities})
+
+def _activity_body(activities, limit):
+    fields = [f.strip() for f in ACTIVITY_FIELDS.split(",")]
+    activities = [{f: row.get(f) for f in fields} for row in activities]
+    next_cursor = None
+    if len(activities) == limit and activities[-1].get("created_at"):
+        next_cursor = encode_cursor(c=activities[-1]["created_at"])
+    return {"activities": activities, "next_cursor": next_cursor}
+
+
+@home_bp.route("/activity", methods=["GET"])
+def activity_history():
+    user_id = current_user_id(request.args.get("user_id"))
+    limit, before, error = _activity_args(request.args)
+    if error:
+        return error
+
+    if not user_id:
+        return jsonify({"error": "Missing user_id"}), 400
+
+    try:
+        if before:
+            activities = repo.activity_page(user_id, ACTIVITY_FIELDS, limit, before)
+        else:
+            # First page: per-user cache, kept current by the activity writer
+            activities = recent_activity.recent(
+                user_id, limit, lambda n: repo.activity_page(user_id, ACTIVITY_FIELDS, n)
+            )
     except Exception as e:
         return jsonify({"error": str(e)}), 400
 
+    return jsonify(_activity_body(activities, limit))
 
-@home_bp.route("/", methods=["POST"])
-def recommend_content():
-    data = request.get_json()
-    mood_name = data.get("mood")
-    text = data.get("text") 
-    content_type = data.get("content_type", "movies")
-    language = data.get("language")
-    page = int(data.get("page", 1))
-    limit = int(data.get("limit", 20))
+
+def _similar(data):
+    """(body, status) for /similar."""
+    deezer_id = data.get("deezer_id")
+    features = (data.get("valence"), data.get("energy"), data.get("tempo"))
+    try:
+        limit = min(int(data.get("limit", 10)), MAX_SIMILAR)
+    except (TypeError, ValueError):
+        return {"error": "limit must be an integer"}, 400
+    if limit < 1:
+        return {"error": "limit must be at least 1"}, 400
+
+    if deezer_id is None and None in features:
+        return {"error": "Provide deezer_id, or valence, energy and tempo"}, 400
+
+    try:
+        # Picks up newly ingested songs without refitting the whole index
+        song_index.ensure_fresh()
+        results = song_index.similar(deezer_id=deezer_id, features=features, k=limit)
+    except KeyError:
+        return {"error": "Song not found"}, 404
+    except Exception as e:
+        return {"error": str(e)}, 400
+
+    return {"count": len(results), "results": results}, 200
+
+
+@home_bp.route("/similar", methods=["POST"])
+def similar_songs():
+    body, status = _similar(request.get_json())
+    return jsonify(body), status
+
+
+def _mood_batch(data):
+    """(ndjson line generator, None) for /extract_mood_batch, or (None, (error body, status))."""
+    texts = data.get("texts")
+    with_scores = bool(data.get("scores"))
+    parallel = bool(data.get("parallel"))
+
+    if not isinstance(texts, list) or not texts:
+        return None, ({"error": "texts must be a non-empty list"}, 400)
+    if len(texts) > MAX_MOOD_BATCH:
+        return None, ({"error": f"At most {MAX_MOOD_BATCH} texts per batch"}, 400)
+
+    # Pure keyword matching - no database access. One JSON object per line, in input order.
+    def generate():
+        for index, (mood, scores) in enumerate(extract_moods(texts, with_scores, parallel)):
+            row = {"index": index, "mood": mood}
+            if with_scores:
+                row["scores"] = scores
+            yield json.dumps(row) + "\n"
+
+    return generate(), None
+
+
+@home_bp.route("/extract_mood_batch", methods=["POST"])
+def extract_mood_batch():
+    lines, error = _mood_batch(request.get_json())
+    if error:
+        return error
+    return Response(stream_with_context(lines), mimetype="application/x-ndjson")
+
+
+def _local_page(mood_id, content_type, language, offset, limit, after=None, fields=None):
+    """A page from the in-process catalog index or the snapshot of the current catalog, else None."""
+    if CATALOG_INDEX_ENABLED:
+        rows = catalog_index.page(content_type, mood_id, language, offset, limit, after, fields)
+        if rows is not None:
+            return rows
+    # A snapshot of the current catalog version answers without a query
+    snapshot = catalog_snapshot.get()
+    if snapshot and snapshot.version == catalog_version.current():
+        return snapshot.page(content_type, mood_id, language, offset, limit, after, fields)
+    return None
+
+
+def _snapshot_fallback(error, mood_id, content_type, language, offset, limit, after=None, fields=None):
+    # Supabase unreachable: serve the last snapshot, however old
+    snapshot = catalog_snapshot.get()
+    rows = snapshot.page(content_type, mood_id, language, offset, limit, after, fields) if snapshot else None
+    if rows is None:
+        raise error
+    print("Content query failed, served from the catalog snapshot:", error)
+    return rows
+
+
+def _fetch_page(mood_id, content_type, language, page, limit, after=None, fields=None):
+    # From the in-process catalog index or snapshot when they have it,
+    # otherwise from Supabase (cached per page)
     offset = (page - 1) * limit
+    with span("content_query"):
+        rows = _local_page(mood_id, content_type, language, offset, limit, after, fields)
+        if rows is not None:
+            return rows
+        position = ("after", after) if after is not None else page
+        try:
+            return results_cache.get_or_load(
+                (mood_id, content_type, language, position, limit, fields),
+                lambda: repo.content_page(content_type, mood_id, language, offset, limit, after, fields),
+            )
+        except Exception as e:
+            return _snapshot_fallback(e, mood_id, content_type, language, offset, limit, after, fields)
+
+
+def _resolve_mood(data):
+    """(mood_name, mood_id, None) or (mood_name, None, (error body, status))."""
+    mood_name = data.get("mood")
+    text = data.get("text")
 
     # Extract mood if not provided
     if text and not mood_name:
-        mood_name = extract_mood(text)
+        with span("extract_mood"):
+            mood_name = extract_mood(text)
 
     if not mood_name:
-        return jsonify({"error": "Mood not recognized"}), 400
+        return mood_name, None, ({"error": "Mood not recognized"}, 400)
 
-    # Validate content_type
-    if content_type not in ["movies", "songs", "series"]:
-        return jsonify({"error": "Invalid content type"}), 400
+    # Resolve mood_id from the in-process moods cache
+    try:
+        with span("mood_lookup"):
+            mood = moods.lookup(mood_name)
+    except Exception as e:
+        return mood_name, None, ({"error": "Database query failed: " + str(e)}, 400)
+
+    if not mood:
+        return mood_name, None, ({"error": "Mood not found in DB"}, 404)
+
+    return mood_name, mood["mood_id"], None
 
-    # Fetch mood_id from DB
+
+def _flag(value, default):
+    # JSON booleans, or "true"/"false" style strings from a query string
+    if value is None:
+        return default
+    if isinstance(value, str):
+        return value.strip().lower() in ("1", "true", "yes", "on")
+    return bool(value)
+
+
+def _page_args(data, default_limit):
+    """(page, limit, None), or (None, None, (error body, status))."""
     try:
-        # Try exact match first
-        mood_resp = sb.table("moods").select("mood_id, mood_name").eq("mood_name", mood_name).execute()
-        if not mood_resp.data:
-            # Fallback: case-insensitive partial match
-            mood_resp = sb.table("moods").select("mood_id, mood_name").ilike("mood_name", f"%{mood_name}%").execute()
+        page = int(data.get("page", 1))
+        limit = int(data.get("limit", default_limit))
+    except (TypeError, ValueError):
+        return None, None, ({"error": "page and limit must be integers"}, 400)
+    if page < 1 or not 1 <= limit <= MAX_PAGE_SIZE:
+        return None, None, ({"error": f"page must be at least 1 and limit between 1 and {MAX_PAGE_SIZE}"}, 400)
+    return page, limit, None
 
-        if not mood_resp.data:
-            return jsonify({"error": "Mood not found in DB"}), 404
 
-        mood_id = mood_resp.data[0]["mood_id"]
-    except Exception as e:
-        return jsonify({"error": "Database query failed: " + str(e)}), 400
+def _recommend_params(data):
+    """(params, None) for a /home/ request, or (None, (error body, status))."""
+    content_type = data.get("content_type", "movies")
+    page, limit, error = _page_args(data, 20)
+    if error:
+        return None, error
+
+    params = {
+        "content_type": content_type,
+        "language": data.get("language"),
+        "page": page,
+        "limit": limit,
+        "columnar": data.get("format") == "columnar",
+        # Keyset pagination: the client sends "cursor" (empty for the first page) and
+        # echoes back the "next_cursor" it gets; `page` keeps working without it
+        "cursor_mode": "cursor" in data,
+        "after": None,
+    }
+
+    # Validate content_type
+    if content_type not in CONTENT_TYPES:
+        return None, ({"error": "Invalid content type"}, 400)
 
-    # Fetch content matching mood and language with pagination
     try:
-        query = sb.table(content_type).select("*").eq("mood_id", mood_id)
-        if language:
-            query = query.eq("language", language)
+        params["fields"] = parse_fields(data.get("fields"), content_type)
+    except ValueError as e:
+        return None, ({"error": str(e)}, 400)
+
+    if data.get("cursor"):
+        try:
+            cursor = decode_cursor(data["cursor"])
+        except ValueError as e:
+            return None, ({"error": str(e)}, 400)
+        if cursor.get("t") != content_type or "k" not in cursor:
+            return None, ({"error": "Invalid cursor"}, 400)
+        params["after"] = cursor["k"]
+    return params, None
+
+
+def _recommend_etag(data, params, user_id=None):
+    # A page only changes with the catalog and, when personalized, with the user's
+    # affinity rankings, so its ETag comes from those and the request: a matching
+    # If-None-Match is answered without a query. The data's own watermark is part of
+    # it, so writes that skip bump() change it too. hide_seen pages change with every
+    # page shown, so they get an ETag from the body instead.
+    if user_id and _flag(data.get("hide_seen"), False):
+        return None
+    return make_etag(catalog_version.current(), catalog_version.watermark(), params["content_type"],
+                     data.get("mood"), data.get("text"), params["language"], params["page"], params["limit"],
+                     data.get("cursor") if params["cursor_mode"] else None, params["fields"], params["columnar"],
+                     personalizer.profile_version(user_id) if user_id else None)
+
+
+def _recommend_payload(data, params, user_id, personalize, mood_name, candidates):
+    content_type = params["content_type"]
+    # Re-rank for the user, and with "hide_seen" drop what they were already shown;
+    # the cursor still follows the unfiltered page
+    key = CONTENT_KEYS[content_type]
+    data_list = candidates
+    if personalize:
+        with span("personalize"):
+            data_list = personalizer.rerank(user_id, content_type, candidates, key,
+                                            hide_seen=_flag(data.get("hide_seen"), False))
+        # Only for hide_seen: what the user was shown never changes the order
+        personalizer.mark_seen(user_id, content_type, data_list, key)
 
-        results = query.range(offset, offset + limit - 1).execute()
-        data_list = results.data or []
+    if user_id:
+        _log_search(user_id, content_type, mood_name, params["language"])
+
+    response = {
+        "mood": mood_name,
+        "count": len(data_list),
+    }
+    if params["columnar"]:
+        # Column names once, then one value array per row
+        response["columns"], response["rows"] = to_columnar(data_list, params["fields"])
+    else:
+        response["results"] = data_list
+    if params["cursor_mode"]:
+        last_key = candidates[-1].get(key) if len(candidates) == params["limit"] else None
+        response["next_cursor"] = encode_cursor(t=content_type, k=last_key) if last_key is not None else None
+    return response
+
+
+@home_bp.route("/", methods=["GET", "POST"])
+def recommend_content():
+    # GET takes the same parameters in the query string, so browsers can revalidate with If-None-Match
+    data = request.get_json() if request.method == "POST" else request.args.to_dict()
+    params, error = _recommend_params(data)
+    if error:
+        return error
+
+    user_id = current_user_id(data.get("user_id"))
+    personalize = bool(user_id) and _flag(data.get("personalize"), True)
+    etag = _recommend_etag(data, params, user_id if personalize else None)
+
+    mood_name, mood_id, error = _resolve_mood(data)
+    if error:
+        return error
+
+    if etag and request.method == "GET" and etag_matches(request.headers.get("If-None-Match"), etag):
+        if user_id:
+            _log_search(user_id, params["content_type"], mood_name, params["language"])
+        return not_modified(etag, request.headers.get("If-None-Match"), request.headers.get("Accept-Encoding"))
+
+    try:
+        candidates = _fetch_page(mood_id, params["content_type"], params["language"], params["page"],
+                                 params["limit"], params["after"], params["fields"])
     except Exception as e:
         return jsonify({"error": str(e)}), 400
 
-    # Log the search activity - this will automatically record to activity_logs
-    user_id = data.get("user_id")
+    response = _recommend_payload(data, params, user_id, personalize, mood_name, candidates)
+    if personalize and mixed_moods(candidates):
+        etag = None  # its order also depends on the mood ranking, which the ETag leaves out
+    # Those and hide_seen pages get an ETag from the body itself
+    return json_response(response, request, etag)
+
+
+def _log_search(user_id, content_type, mood_name, language):
+    # Log the search activity - queued for the background writer, never blocks the request
+    with span("activity_log"):
+        personalizer.observe(user_id, language=language)
+        activity_writer.log({
+            "user_id": user_id,
+            "action": f"searched for {content_type}",
+            "mood": mood_name,
+        })
+
+
+def _feed_params(data):
+    """((content_types, page, limit), None), or (None, (error body, status)); limit is per content type."""
+    page, limit, error = _page_args(data, 10)
+    if error:
+        return None, error
+    content_types = data.get("content_types") or list(CONTENT_TYPES)
+    if not isinstance(content_types, list) or any(t not in CONTENT_TYPES for t in content_types):
+        return None, ({"error": "Invalid content type"}, 400)
+    return (content_types, page, limit), None
+
+
+def _feed_payload(data, pages, user_id, mood_name, language):
+    if user_id and _flag(data.get("personalize"), True):
+        hide_seen = _flag(data.get("hide_seen"), False)
+        with span("personalize"):
+            pages = {
+                content_type: personalizer.rerank(user_id, content_type, pages[content_type],
+                                                  CONTENT_KEYS[content_type], hide_seen)
+                for content_type in personalizer.content_type_order(user_id, pages)
+            }
+            for content_type, rows in pages.items():
+                personalizer.mark_seen(user_id, content_type, rows, CONTENT_KEYS[content_type])
+
+    # Interleave: one of each content type in turn
+    results = []
+    for i in range(max((len(rows) for rows in pages.values()), default=0)):
+        for content_type, rows in pages.items():
+            if i < len(rows):
+                results.append(dict(rows[i], content_type=content_type))
+
     if user_id:
-        try:
-            sb.table("activity_logs").insert({
+        with span("activity_log"):
+            personalizer.observe(user_id, language=language)
+            activity_writer.log({
                 "user_id": user_id,
-                "action": f"searched for {content_type}",
+                "action": "searched for feed",
                 "mood": mood_name,
-            }).execute()
-        except Exception:
-            # Don't fail the whole request if logging fails
-            pass
+            })
 
-    return jsonify({
+    return {
         "mood": mood_name,
-        "count": len(data_list),
-        "results": data_list
-    })
\ No newline at end of file
+        "count": len(results),
+        "counts": {content_type: len(rows) for content_type, rows in pages.items()},
+        "results": results
+    }
+
+
+@home_bp.route("/feed", methods=["POST"])
+def mixed_feed():
+    data = request.get_json()
+    language = data.get("language")
+    params, error = _feed_params(data)
+    if error:
+        return error
+    content_types, page, limit = params
+
+    # Mood extraction and lookup happen once for all content types
+    mood_name, mood_id, error = _resolve_mood(data)
+    if error:
+        return error
+
+    # Songs have no language column, so the language filter only applies to movies/series.
+    # Each task runs in a copy of the request context so its spans count towards this request.
+    futures = {
+        content_type: _feed_pool.submit(
+            contextvars.copy_context().run, _fetch_page, mood_id, content_type, None if content_type == "songs" else language,
+            page, limit, None, DEFAULT_FIELDS[content_type],
+        )
+        for content_type in content_types
+    }
+    try:
+        pages = {content_type: future.result() for content_type, future in futures.items()}
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
+    user_id = current_user_id(data.get("user_id"))
+    return jsonify(_feed_payload(data, pages, user_id, mood_name, language))
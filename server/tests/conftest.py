@@ -0,0 +1,31 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SERVER_DIR)
+
+# Run against the in-memory SQLite stand-in, never a real Supabase project
+_tmp = tempfile.mkdtemp(prefix="moodmuse-tests-")
+os.environ["SUP_BACKEND"] = "local"
+os.environ["SUP_LOCAL_DB"] = ":memory:"
+os.environ["CATALOG_VERSION_FILE"] = os.path.join(_tmp, "catalog_version")
+os.environ["CATALOG_SNAPSHOT"] = os.path.join(_tmp, "catalog_snapshot")
+os.environ.setdefault("OPEN_AI_KEY", "test-placeholder")  # the OpenAI client is built at import time
+
+
+@pytest.fixture(scope="session")
+def app():
+    from utils.local_backend import seed_catalog
+    from utils.sup_client import get_client
+
+    seed_catalog(get_client(), movies=300, series=100, songs=300)
+    from app import app as flask_app
+    return flask_app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
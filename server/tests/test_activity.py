@@ -0,0 +1,72 @@
+from utils.activity_writer import ActivityWriter
+from utils.local_backend import LocalClient, MOOD_NAMES
+from utils.mood_registry import MoodRegistry
+from utils.repository import Repository
+
+
+def test_history_lists_logged_activity(client):
+    client.post("/home/log_activity", json={"user_id": "hist@example.com", "action": "viewed", "mood": "Calm"})
+    resp = client.get("/home/activity?user_id=hist@example.com&limit=5")
+    assert resp.status_code == 200
+    assert resp.get_json()["activities"][0]["action"] == "viewed"
+
+
+def test_zero_limit_is_rejected(client):
+    assert client.get("/home/activity?user_id=someone&limit=0").status_code == 400
+
+
+def test_limit_above_maximum_is_rejected(client):
+    assert client.get("/home/activity?user_id=someone&limit=1000").status_code == 400
+
+
+def test_activity_page_matches_user_id_or_email():
+    repo = Repository(LocalClient())
+    repo.insert_activity([
+        {"user_id": "a@example.com", "user_email": "a@example.com", "action": "one"},
+        {"user_id": "uuid-1", "user_email": "a@example.com", "action": "two"},
+        {"user_id": "b@example.com", "action": "other"},
+    ])
+    actions = {row["action"] for row in repo.activity_page("a@example.com", "action, created_at", 10)}
+    assert actions == {"one", "two"}
+
+
+def test_activity_query_builds_on_the_pinned_postgrest_client():
+    from postgrest import SyncPostgrestClient
+    from utils.repository import _activity_query
+
+    class Client:
+        postgrest = SyncPostgrestClient("http://localhost/rest/v1")
+
+        def table(self, name):
+            return self.postgrest.from_(name)
+
+    params = _activity_query(Client(), "a@example.com", "action", 5).params
+    assert params["or"] == '(user_id.eq."a@example.com",user_email.eq."a@example.com")'
+
+
+class _RecordingRepository(Repository):
+    def __init__(self, client):
+        super().__init__(client)
+        self.calls = []
+
+    def moods(self):
+        self.calls.append("moods")
+        return super().moods()
+
+    def insert_activity(self, rows):
+        self.calls.append(("insert_activity", len(rows)))
+        return super().insert_activity(rows)
+
+
+def test_writer_and_mood_registry_go_through_the_repository():
+    local = LocalClient()
+    local.table("moods").insert([{"mood_name": name} for name in MOOD_NAMES]).execute()
+    repository = _RecordingRepository(local)
+
+    assert MoodRegistry(repository).lookup("calm")["mood_name"] == "Calm / Relaxed / Chill"
+    writer = ActivityWriter(repository, flush_interval=0.05)
+    writer.log({"user_id": "w@example.com", "action": "viewed"})
+    writer.close()
+
+    assert repository.calls == ["moods", ("insert_activity", 1)]
+    assert Repository(local).activity_page("w@example.com", "action", 5) == [{"action": "viewed"}]
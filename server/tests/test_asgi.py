@@ -0,0 +1,40 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("starlette")
+from starlette.testclient import TestClient  # noqa: E402
+
+from utils.metrics import metrics  # noqa: E402
+from utils.mood_registry import moods  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def async_client(app):
+    from asgi import app as asgi_app
+    with TestClient(asgi_app) as client:
+        yield client
+
+
+def test_expired_moods_are_reloaded_off_the_event_loop(async_client, monkeypatch):
+    reloads = []
+    refresh = moods.refresh
+
+    def checked_refresh():
+        try:
+            asyncio.get_running_loop()
+            reloads.append("event loop")
+        except RuntimeError:
+            reloads.append("thread")
+        return refresh()
+
+    monkeypatch.setattr(moods, "refresh", checked_refresh)
+    moods.invalidate()
+    resp = async_client.get("/home/?mood=Happy / Joyful&content_type=movies&limit=5")
+    assert resp.status_code == 200
+    assert reloads == ["thread"]
+
+
+def test_both_entry_points_register_the_collectors_once(async_client):
+    rendered = metrics.render()
+    assert rendered.count("# TYPE moodmuse_result_cache_hits gauge") == 1
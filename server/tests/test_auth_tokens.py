@@ -0,0 +1,61 @@
+import hashlib
+import hmac
+import time
+
+import pytest
+
+from utils.auth_tokens import InvalidToken, _b64encode, decode_token, encode_token
+
+SECRET = "test-secret"
+
+
+def _claims(**overrides):
+    claims = {"sub": "user-1", "email": "u@example.com", "aud": "authenticated", "exp": time.time() + 60}
+    claims.update(overrides)
+    return claims
+
+
+def test_valid_token_round_trips():
+    assert decode_token(encode_token(_claims(), SECRET), SECRET)["email"] == "u@example.com"
+
+
+def test_bad_signature_is_rejected():
+    with pytest.raises(InvalidToken, match="signature"):
+        decode_token(encode_token(_claims(), "another-secret"), SECRET)
+
+
+def test_expired_token_is_rejected():
+    with pytest.raises(InvalidToken, match="expired"):
+        decode_token(encode_token(_claims(exp=time.time() - 3600), SECRET), SECRET)
+
+
+def test_wrong_audience_is_rejected():
+    with pytest.raises(InvalidToken, match="audience"):
+        decode_token(encode_token(_claims(aud="someone-else"), SECRET), SECRET)
+
+
+@pytest.mark.parametrize("token", [
+    "W10.e30.AA",  # header is a JSON array
+    "bnVsbA.e30.AA",  # header is JSON null
+    "not-a-token",
+    "a.b.c.d",
+    "!!!.e30.AA",
+    _b64encode(b"\xff\xfe") + ".e30.AA",  # not UTF-8
+])
+def test_malformed_tokens_are_rejected(token):
+    with pytest.raises(InvalidToken, match="Malformed"):
+        decode_token(token, SECRET)
+
+
+def test_signed_non_object_payload_is_rejected():
+    header = _b64encode(b'{"alg":"HS256"}')
+    signed = f"{header}.{_b64encode(b'[1]')}"
+    signature = _b64encode(hmac.new(SECRET.encode(), signed.encode(), hashlib.sha256).digest())
+    with pytest.raises(InvalidToken, match="Malformed"):
+        decode_token(f"{signed}.{signature}", SECRET)
+
+
+@pytest.mark.parametrize("token", ["W10.e30.AA", "bnVsbA.e30.AA"])
+def test_malformed_bearer_token_is_a_401(client, token):
+    resp = client.get("/home/activity?user_id=someone", headers={"Authorization": f"Bearer {token}"})
+    assert resp.status_code == 401
@@ -0,0 +1,81 @@
+import time
+
+import pytest
+
+from utils import catalog_version
+from utils.auth_tokens import LOCAL_JWT_SECRET, encode_token
+from utils.http_response import encode_json
+from utils.sup_client import get_client
+
+PAGE = "/home/?mood=Happy / Joyful&content_type=movies&limit=50"
+
+
+@pytest.fixture(autouse=True)
+def watermark(monkeypatch):
+    # Read it once up front: a background re-read mid-test would change the ETags
+    monkeypatch.setattr(catalog_version, "WATERMARK_TTL", 3600)
+    while catalog_version._watermark_loading:
+        time.sleep(0.01)
+    catalog_version._load_watermark()
+
+
+def test_not_modified_repeats_the_encoded_etag(client):
+    first = client.get(PAGE, headers={"Accept-Encoding": "gzip"})
+    assert first.headers["Content-Encoding"] == "gzip"
+    assert first.headers["ETag"].endswith('-gzip"')
+
+    again = client.get(PAGE, headers={"Accept-Encoding": "gzip", "If-None-Match": first.headers["ETag"]})
+    assert again.status_code == 304
+    assert again.headers["ETag"] == first.headers["ETag"]
+
+
+def test_encode_json_304_repeats_the_encoded_body_etag():
+    body = b'{"results": "' + b"x" * 4096 + b'"}'
+    status, _, headers = encode_json(body, "GET", None, "gzip")
+    assert status == 200 and headers["ETag"].endswith('-gzip"')
+    status, _, revalidated = encode_json(body, "GET", headers["ETag"], "gzip")
+    assert status == 304
+    assert revalidated["ETag"] == headers["ETag"]
+
+
+def test_writes_that_skip_the_version_stamp_change_the_etag(client):
+    etag = client.get(PAGE).headers["ETag"]
+    assert client.get(PAGE, headers={"If-None-Match": etag}).status_code == 304
+
+    sb = get_client()
+    mood_id = sb.table("moods").select("mood_id").eq("mood_name", "Happy / Joyful").execute().data[0]["mood_id"]
+    sb.table("movies").insert({"api_id": 10**9, "title": "Added elsewhere", "mood_id": mood_id}).execute()
+    catalog_version._load_watermark()
+
+    resp = client.get(PAGE, headers={"If-None-Match": etag})
+    assert resp.status_code == 200
+    assert resp.headers["ETag"] != etag
+
+
+def _bearer(email):
+    claims = {"sub": email, "email": email, "aud": "authenticated", "exp": time.time() + 600}
+    return {"Authorization": f"Bearer {encode_token(claims, LOCAL_JWT_SECRET)}"}
+
+
+def test_personalized_page_is_revalidated_when_switching_back(client):
+    auth = _bearer("flip@example.com")
+    happy = "/home/?mood=Happy / Joyful&content_type=movies&limit=20&language=en"
+    sad = "/home/?mood=Sad / Melancholic&content_type=movies&limit=20&language=en"
+    client.get(happy, headers=auth)  # the first search gives the user a language ranking
+
+    first = client.get(happy, headers=auth)
+    assert first.status_code == 200
+    assert "Authorization" in first.headers["Vary"]
+    assert client.get(sad, headers=auth).status_code == 200
+    back = client.get(happy, headers=dict(auth, **{"If-None-Match": first.headers["ETag"]}))
+    assert back.status_code == 304
+
+
+def test_personalized_etag_changes_with_the_language_ranking(client):
+    auth = _bearer("switch@example.com")
+    page = "/home/?mood=Happy / Joyful&content_type=movies&limit=20"
+    client.get(page + "&language=en", headers=auth)
+    etag = client.get(page, headers=auth).headers["ETag"]
+    for _ in range(2):
+        client.get(page + "&language=hi", headers=auth)  # now prefers Hindi
+    assert client.get(page, headers=dict(auth, **{"If-None-Match": etag})).status_code == 200
@@ -0,0 +1,22 @@
+import pytest
+
+MOOD = "Happy / Joyful"
+
+
+def test_feed_interleaves_content_types(client):
+    resp = client.post("/home/feed", json={"mood": MOOD, "limit": 2})
+    assert resp.status_code == 200
+    assert resp.get_json()["counts"] == {"movies": 2, "series": 2, "songs": 2}
+
+
+@pytest.mark.parametrize("args", [
+    {"limit": "abc"},
+    {"limit": 0},
+    {"limit": 100000},
+    {"page": 0},
+    {"page": "two"},
+])
+def test_bad_page_or_limit_is_rejected(client, args):
+    resp = client.post("/home/feed", json={"mood": MOOD, **args})
+    assert resp.status_code == 400
+    assert "error" in resp.get_json()
@@ -0,0 +1,35 @@
+import pytest
+from postgrest import SyncPostgrestClient
+
+from utils.ingest_engine import IngestStats, upsert_batch
+from utils.local_backend import LocalClient
+
+
+def test_upsert_batch_skips_existing_keys():
+    client = LocalClient()
+    stats = IngestStats("movies")
+    rows = [{"api_id": 1, "title": "One"}, {"api_id": 2, "title": "Two"}, {"api_id": 2, "title": "Two again"}]
+    assert upsert_batch(client, "movies", rows, "api_id", stats) == 2
+    assert upsert_batch(client, "movies", [{"api_id": 2, "title": "Changed"}, {"api_id": 3}], "api_id", stats) == 1
+    titles = {r["api_id"]: r["title"] for r in client.table("movies").select("api_id,title").execute().data}
+    assert titles == {1: "One", 2: "Two again", 3: None}
+    assert (stats.inserted, stats.skipped) == (3, 2)
+
+
+def test_upsert_sends_on_conflict_as_query_param(monkeypatch):
+    sent = {}
+
+    def execute(query):
+        sent["params"], sent["prefer"] = query.params, query.headers.get("prefer")
+        return type("Response", (), {"data": [{}]})()
+
+    client = SyncPostgrestClient("http://supabase.invalid/rest/v1")
+    monkeypatch.setattr(type(client.from_("songs").upsert([{}])), "execute", execute)
+    upsert_batch(client, "songs", [{"deezer_id": "7"}], "deezer_id", IngestStats("songs"))
+    assert sent["params"]["on_conflict"] == "deezer_id"
+    assert "resolution=ignore-duplicates" in sent["prefer"]
+
+
+def test_local_upsert_rejects_arguments_postgrest_lacks():
+    with pytest.raises(TypeError):
+        LocalClient().table("movies").upsert([{"api_id": 1}], on_conflict="api_id")
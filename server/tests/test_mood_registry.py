@@ -0,0 +1,62 @@
+import threading
+import time
+
+import pytest
+
+from utils.mood_registry import MoodRegistry
+
+ROWS = [{"mood_id": 1, "mood_name": "Happy / Joyful"}]
+
+
+class _Repository:
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.calls = 0
+        self.fail = False
+
+    def moods(self):
+        self.calls += 1
+        time.sleep(self.delay)
+        if self.fail:
+            raise ConnectionError("supabase unreachable")
+        return ROWS
+
+
+def test_expired_rows_are_reloaded_by_one_thread():
+    repository = _Repository(delay=0.2)
+    registry = MoodRegistry(repository)
+    registry.load(ROWS)
+    registry.invalidate()
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(registry.lookup("happy"))) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert repository.calls == 1
+    assert all(row["mood_id"] == 1 for row in results)
+
+
+def test_failed_reload_keeps_old_rows_and_backs_off():
+    repository = _Repository()
+    registry = MoodRegistry(repository, retry_after=60)
+    registry.load(ROWS)
+    registry.invalidate()
+    repository.fail = True
+
+    assert registry.lookup("happy")["mood_id"] == 1
+    assert registry.lookup("happy")["mood_id"] == 1
+    assert repository.calls == 1
+
+
+def test_first_load_failure_raises_until_the_retry():
+    repository = _Repository()
+    repository.fail = True
+    registry = MoodRegistry(repository, retry_after=60)
+
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            registry.rows()
+    assert repository.calls == 1
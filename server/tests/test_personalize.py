@@ -0,0 +1,52 @@
+from utils.personalize import Personalizer
+
+ROWS = [
+    {"api_id": 1, "genre": "Comedy", "language": "en"},
+    {"api_id": 2, "genre": "Drama", "language": "fr"},
+    {"api_id": 3, "genre": "Family", "language": "fr"},
+    {"api_id": 4, "genre": "Horror", "language": "en"},
+]
+
+
+def _ids(rows):
+    return [row["api_id"] for row in rows]
+
+
+def test_rerank_orders_by_mood_then_language_affinity():
+    personalizer = Personalizer()
+    for _ in range(2):
+        personalizer.observe("u", mood="Happy / Joyful", language="fr")
+    personalizer.observe("u", mood="Sad / Melancholic", language="en")
+    # Happy rows first (Family in French before Comedy in English), then Sad, then the rest
+    assert _ids(personalizer.rerank("u", "movies", ROWS, "api_id")) == [3, 1, 2, 4]
+
+
+def test_users_with_different_histories_get_different_orders():
+    personalizer = Personalizer()
+    personalizer.observe("en-fan", language="en")
+    personalizer.observe("fr-fan", language="fr")
+    assert _ids(personalizer.rerank("en-fan", "movies", ROWS, "api_id")) == [1, 4, 2, 3]
+    assert _ids(personalizer.rerank("fr-fan", "movies", ROWS, "api_id")) == [2, 3, 1, 4]
+
+
+def test_impressions_do_not_change_the_order():
+    personalizer = Personalizer()
+    personalizer.observe("u", language="fr")
+    before = personalizer.rerank("u", "movies", ROWS, "api_id")
+    for _ in range(5):
+        personalizer.mark_seen("u", "movies", ROWS, "api_id")
+    assert personalizer.rerank("u", "movies", ROWS, "api_id") == before
+    assert personalizer.rerank("u", "movies", ROWS, "api_id", hide_seen=True) == []
+
+
+def test_personalized_page_is_stable_across_reloads(client):
+    query = {"mood": "Happy / Joyful", "content_type": "movies", "limit": 30, "user_id": "reloads"}
+    plain = client.post("/home/", json=dict(query, personalize=False)).get_json()["results"]
+    client.post("/home/", json=dict(query, language="hi"))  # now prefers Hindi
+    first = client.post("/home/", json=query).get_json()["results"]
+    second = client.post("/home/", json=query).get_json()["results"]
+    assert _ids(first) == _ids(second)
+    assert _ids(first) != _ids(plain)
+    assert sorted(_ids(first)) == sorted(_ids(plain))
+    languages = [row["language"] for row in first]
+    assert languages == sorted(languages, key=lambda language: language != "hi")
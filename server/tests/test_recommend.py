@@ -0,0 +1,35 @@
+MOOD = "Happy / Joyful"
+
+
+def test_page_of_results(client):
+    resp = client.post("/home/", json={"mood": MOOD, "content_type": "movies", "limit": 5})
+    assert resp.status_code == 200
+    assert resp.get_json()["count"] == 5
+
+
+def test_zero_limit_with_cursor_is_rejected(client):
+    resp = client.post("/home/", json={"mood": MOOD, "content_type": "movies", "limit": 0, "cursor": ""})
+    assert resp.status_code == 400
+
+
+def test_negative_limit_is_rejected(client):
+    resp = client.get(f"/home/?mood={MOOD}&content_type=movies&limit=-5")
+    assert resp.status_code == 400
+
+
+def test_limit_above_maximum_is_rejected(client):
+    resp = client.post("/home/", json={"mood": MOOD, "content_type": "movies", "limit": 10_000})
+    assert resp.status_code == 400
+
+
+def test_non_integer_page_is_rejected(client):
+    resp = client.post("/home/", json={"mood": MOOD, "content_type": "movies", "page": "two"})
+    assert resp.status_code == 400
+
+
+def test_cursor_pages_follow_on(client):
+    first = client.post("/home/", json={"mood": MOOD, "content_type": "songs", "limit": 3, "cursor": ""}).get_json()
+    second = client.post("/home/", json={"mood": MOOD, "content_type": "songs", "limit": 3,
+                                         "cursor": first["next_cursor"]}).get_json()
+    keys = [row["deezer_id"] for row in first["results"] + second["results"]]
+    assert len(set(keys)) == 6
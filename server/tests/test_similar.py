@@ -0,0 +1,62 @@
+import threading
+import time
+
+from utils.local_backend import LocalClient, seed_catalog
+from utils.song_features import SongIndex
+
+
+class _FlakyClient:
+    """A LocalClient whose queries can be made to fail or stall."""
+
+    def __init__(self, client):
+        self.client = client
+        self.fail = False
+        self.delay = 0.0
+
+    def table(self, name):
+        time.sleep(self.delay)
+        if self.fail:
+            raise ConnectionError("supabase unreachable")
+        return self.client.table(name)
+
+
+def _index():
+    local = LocalClient()
+    seed_catalog(local, movies=0, series=0, songs=200)
+    client = _FlakyClient(local)
+    index = SongIndex(client, refresh_interval=0, retry_after=60)
+    index.ensure_fresh()
+    return index, client
+
+
+def test_failed_refresh_keeps_serving_and_backs_off():
+    index, client = _index()
+    client.fail = True
+    deezer_id = index.similar(features=(0.5, 0.5, 120), k=1)[0]["deezer_id"]
+
+    index.ensure_fresh()  # fails, logs, keeps the index
+    assert len(index.similar(deezer_id=deezer_id, k=5)) == 5
+    client.fail = False
+    client.delay = 5  # a retry within the backoff would stall here
+    started = time.monotonic()
+    index.ensure_fresh()
+    assert time.monotonic() - started < 1
+
+
+def test_searches_do_not_wait_for_a_pull():
+    index, client = _index()
+    client.delay = 0.5
+    puller = threading.Thread(target=index.ensure_fresh)
+    puller.start()
+    time.sleep(0.05)
+    started = time.monotonic()
+    index.ensure_fresh()
+    assert len(index.similar(features=(0.5, 0.5, 120), k=3)) == 3
+    assert time.monotonic() - started < 0.3
+    puller.join()
+
+
+def test_negative_limit_is_rejected(client):
+    resp = client.post("/home/similar", json={"valence": 0.5, "energy": 0.5, "tempo": 120, "limit": -3})
+    assert resp.status_code == 400
+    assert resp.get_json()["error"] == "limit must be at least 1"
@@ -0,0 +1,93 @@
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from datetime import datetime, timezone
+
+_EPOCH = datetime.min.replace(tzinfo=timezone.utc)
+
+
+def _created_at(row):
+    try:
+        ts = datetime.fromisoformat(row["created_at"])
+    except (KeyError, TypeError, ValueError):
+        return _EPOCH
+    return ts if ts.tzinfo else ts.replace(tzinfo=timezone.utc)
+
+
+class RecentActivity:
+    """Per-user cache of the newest activity rows, kept current by the activity writer.
+
+    record() is called for every queued log row, so rows still waiting for the
+    background flush already show up in a user's history. Entries expire after
+    `ttl` seconds to pick up rows written by other worker processes.
+    """
+
+    def __init__(self, max_users=5000, per_user=50, ttl=60):
+        self.max_users = max_users
+        self.per_user = per_user
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._users = OrderedDict()  # identifier -> [loaded_at or None, deque of rows newest first]
+
+    def _entry(self, identifier):
+        entry = self._users.get(identifier)
+        if entry is None:
+            entry = self._users[identifier] = [None, deque(maxlen=self.per_user)]
+            if len(self._users) > self.max_users:
+                self._users.popitem(last=False)
+        else:
+            self._users.move_to_end(identifier)
+        return entry
+
+    def record(self, row):
+        identifiers = {row.get("user_id"), row.get("user_email")} - {None}
+        with self._lock:
+            for identifier in identifiers:
+                self._entry(identifier)[1].appendleft(row)
+
+    def recent(self, identifier, limit, load):
+        """Newest `limit` rows, from cache or from `load(per_user)` merged with pending rows."""
+        if limit > self.per_user:
+            return load(limit)
+        rows, pending = self._cached(identifier, limit)
+        if rows is not None:
+            return rows
+        return self._fill(identifier, load(self.per_user), pending, limit)
+
+    async def recent_async(self, identifier, limit, load):
+        """recent() for a coroutine function `load`."""
+        if limit > self.per_user:
+            return await load(limit)
+        rows, pending = self._cached(identifier, limit)
+        if rows is not None:
+            return rows
+        return self._fill(identifier, await load(self.per_user), pending, limit)
+
+    def _cached(self, identifier, limit):
+        # (fresh cached rows or None, rows recorded since the last load)
+        with self._lock:
+            entry = self._users.get(identifier)
+            if entry and entry[0] is not None and time.monotonic() - entry[0] < self.ttl:
+                self._users.move_to_end(identifier)
+                return list(entry[1])[:limit], None
+            return None, list(entry[1]) if entry else []
+
+    def _fill(self, identifier, rows, pending, limit):
+        # Pending rows newer than anything in the database have not been flushed yet
+        newest = max((_created_at(r) for r in rows), default=_EPOCH)
+        rows += [r for r in pending if _created_at(r) > newest]
+        rows.sort(key=_created_at, reverse=True)
+
+        with self._lock:
+            entry = self._entry(identifier)
+            entry[0] = time.monotonic()
+            entry[1].clear()
+            entry[1].extend(rows[:self.per_user])
+        return rows[:limit]
+
+recent_activity = RecentActivity(
+    max_users=int(os.getenv("ACTIVITY_CACHE_USERS", 5000)),
+    per_user=int(os.getenv("ACTIVITY_CACHE_ROWS", 50)),
+    ttl=int(os.getenv("ACTIVITY_CACHE_TTL", 60)),
+)
@@ -0,0 +1,143 @@
+import atexit
+import os
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+
+
+class ActivityWriter:
+    """Background writer that batches activity_logs inserts off the request path.
+
+    log() never blocks: rows go onto a bounded queue and are dropped (and
+    counted) when it is full. A worker thread flushes them with one bulk insert
+    once `batch_size` rows are waiting or `flush_interval` seconds have passed.
+    Batches are written with `repository.insert_activity` (a
+    utils.repository.Repository), by default the shared one.
+    """
+
+    def __init__(self, repository=None, max_queue=10000, batch_size=200, flush_interval=1.0):
+        self._repository = repository
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._listeners = []
+        self.enqueued = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.batches = 0
+
+    @property
+    def repository(self):
+        if self._repository is None:
+            from utils.repository import repo
+            self._repository = repo
+        return self._repository
+
+    def add_listener(self, callback):
+        """Call `callback(row)` in the request thread for every row accepted by log()."""
+        self._listeners.append(callback)
+
+    def log(self, row):
+        """Queue one activity row; returns False if it had to be dropped."""
+        self._ensure_started()
+        # Stamp the time of the event, not of the (later) flush
+        row.setdefault("created_at", datetime.now(timezone.utc).isoformat())
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            self.dropped += 1
+            return False
+        self.enqueued += 1
+        for callback in self._listeners:
+            try:
+                callback(row)
+            except Exception as e:
+                print("Activity listener failed:", e)
+        return True
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+                atexit.register(self.close)
+
+    def _run(self):
+        while True:
+            batch = self._take_batch()
+            if batch is None:
+                return
+            if batch:
+                self._write(batch)
+
+    def _take_batch(self):
+        # Block for the first row, then gather more until full or the interval runs out
+        try:
+            first = self._queue.get(timeout=self.flush_interval)
+        except queue.Empty:
+            return []
+        if first is _STOP:
+            return None
+        batch = [first]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                row = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if row is _STOP:
+                self._write(batch)
+                return None
+            batch.append(row)
+        return batch
+
+    def _write(self, batch):
+        # A bulk insert needs the same keys on every row
+        columns = {col for row in batch for col in row}
+        batch = [{col: row.get(col) for col in columns} for row in batch]
+        try:
+            self.repository.insert_activity(batch)
+            self.written += len(batch)
+            self.batches += 1
+        except Exception as e:
+            self.failed += len(batch)
+            print(f"Activity log flush failed ({len(batch)} rows):", e)
+
+    def close(self, timeout=5.0):
+        """Flush whatever is queued and stop the worker."""
+        thread = self._thread
+        if thread is None or not thread.is_alive():
+            return
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            return
+        thread.join(timeout)
+
+    def stats(self):
+        return {
+            "queued": self._queue.qsize(),
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "batches": self.batches,
+        }
+
+
+_STOP = object()
+
+activity_writer = ActivityWriter(
+    max_queue=int(os.getenv("ACTIVITY_QUEUE_SIZE", 10000)),
+    batch_size=int(os.getenv("ACTIVITY_BATCH_SIZE", 200)),
+    flush_interval=float(os.getenv("ACTIVITY_FLUSH_INTERVAL", 1.0)),
+)
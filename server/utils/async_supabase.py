@@ -0,0 +1,50 @@
+import os
+
+import httpx
+from gotrue import AsyncGoTrueClient
+from postgrest import AsyncPostgrestClient
+
+# Per worker process: keep-alive connections to Supabase shared by all in-flight requests
+SUP_POOL_SIZE = int(os.getenv("SUP_POOL_SIZE", 100))
+SUP_TIMEOUT = float(os.getenv("SUP_TIMEOUT", 10))
+
+POOL_LIMITS = httpx.Limits(
+    max_connections=SUP_POOL_SIZE, max_keepalive_connections=SUP_POOL_SIZE, keepalive_expiry=30
+)
+
+
+class _PooledPostgrest(AsyncPostgrestClient):
+    def create_session(self, base_url, headers, timeout):
+        return httpx.AsyncClient(base_url=base_url, headers=headers, timeout=timeout, limits=POOL_LIMITS)
+
+
+class AsyncSupabase:
+    """The async counterpart of the supabase-py client, for the parts this app uses.
+
+    supabase-py 1.0 has no async client, so this puts the async PostgREST and
+    GoTrue clients behind the same table(...) / auth shape, each over a pooled
+    keep-alive httpx client.
+    """
+
+    def __init__(self, url, key):
+        headers = {"apiKey": key, "Authorization": f"Bearer {key}"}
+        self.postgrest = _PooledPostgrest(
+            f"{url}/rest/v1",
+            headers={"Accept": "application/json", "Content-Type": "application/json", **headers},
+            timeout=SUP_TIMEOUT,
+        )
+        # One server-side client serves every user: never keep or refresh a session on it
+        self.auth = AsyncGoTrueClient(
+            url=f"{url}/auth/v1",
+            headers=headers,
+            auto_refresh_token=False,
+            persist_session=False,
+            http_client=httpx.AsyncClient(timeout=SUP_TIMEOUT, limits=POOL_LIMITS),
+        )
+
+    def table(self, name):
+        return self.postgrest.from_(name)
+
+    async def aclose(self):
+        await self.postgrest.aclose()
+        await self.auth.close()
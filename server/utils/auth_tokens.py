@@ -0,0 +1,235 @@
+"""Local verification of Supabase access tokens.
+
+Supabase signs access tokens (JWTs) with the project's JWT secret, so with
+SUP_JWT_SECRET set the API can check a token's signature and expiry itself
+instead of asking Supabase Auth. Verified claims are cached per token (keyed
+by its SHA-256) until the token expires or AUTH_CACHE_TTL passes, whichever
+is first, so a request with a known token costs one dict lookup.
+
+Only HS256 tokens are accepted: that is what projects using the JWT secret
+issue. Without a secret, bearer tokens are ignored and the endpoints fall
+back to the user_id the client sends.
+"""
+import base64
+import binascii
+import hashlib
+import hmac
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from flask import g, jsonify, request
+
+# The local backend (utils/local_backend.py) signs with this when SUP_JWT_SECRET is unset
+LOCAL_JWT_SECRET = "moodmuse-local-jwt-secret"
+
+JWT_SECRET = os.getenv("SUP_JWT_SECRET") or (LOCAL_JWT_SECRET if os.getenv("SUP_BACKEND") == "local" else None)
+JWT_AUDIENCE = os.getenv("SUP_JWT_AUDIENCE", "authenticated")
+JWT_LEEWAY = int(os.getenv("SUP_JWT_LEEWAY", 30))  # seconds of clock skew allowed on exp/nbf
+# With AUTH_REQUIRED=1 a user_id in the request is ignored: only a valid bearer token identifies the user
+AUTH_REQUIRED = os.getenv("AUTH_REQUIRED", "0") == "1"
+
+AUTH_CACHE_ENTRIES = int(os.getenv("AUTH_CACHE_ENTRIES", 10000))
+AUTH_CACHE_TTL = int(os.getenv("AUTH_CACHE_TTL", 300))
+# A refresh token is single use; retries of the same refresh within this window get the same new session
+REFRESH_REUSE_SECONDS = 10
+
+
+class InvalidToken(ValueError):
+    pass
+
+
+def _b64decode(segment):
+    return base64.urlsafe_b64decode(segment + "=" * (-len(segment) % 4))
+
+
+def _b64encode(data):
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def encode_token(claims, secret):
+    """HS256 JWT for `claims`."""
+    header = _b64encode(json.dumps({"alg": "HS256", "typ": "JWT"}, separators=(",", ":")).encode())
+    payload = _b64encode(json.dumps(claims, separators=(",", ":")).encode())
+    signature = hmac.new(secret.encode(), f"{header}.{payload}".encode(), hashlib.sha256).digest()
+    return f"{header}.{payload}.{_b64encode(signature)}"
+
+
+def _json_segment(segment):
+    # Any base64url, UTF-8 or JSON error, or JSON that is not an object, is a malformed token
+    try:
+        value = json.loads(_b64decode(segment))
+    except (ValueError, binascii.Error):
+        raise InvalidToken("Malformed token")
+    if not isinstance(value, dict):
+        raise InvalidToken("Malformed token")
+    return value
+
+
+def decode_token(token, secret, audience=JWT_AUDIENCE, leeway=JWT_LEEWAY):
+    """Claims of an HS256 `token` after checking its signature, expiry, nbf and audience."""
+    try:
+        header_b64, payload_b64, signature_b64 = token.split(".")
+        header = _json_segment(header_b64)
+        signature = _b64decode(signature_b64)
+    except (ValueError, binascii.Error):
+        raise InvalidToken("Malformed token")
+    if header.get("alg") != "HS256":
+        raise InvalidToken("Unsupported token algorithm")
+    expected = hmac.new(secret.encode(), f"{header_b64}.{payload_b64}".encode(), hashlib.sha256).digest()
+    if not hmac.compare_digest(signature, expected):
+        raise InvalidToken("Invalid token signature")
+    claims = _json_segment(payload_b64)
+
+    now = time.time()
+    if not isinstance(claims.get("exp"), (int, float)) or claims["exp"] + leeway < now:
+        raise InvalidToken("Token expired")
+    if isinstance(claims.get("nbf"), (int, float)) and claims["nbf"] - leeway > now:
+        raise InvalidToken("Token not yet valid")
+    if audience:
+        aud = claims.get("aud")
+        if audience not in (aud if isinstance(aud, list) else [aud]):
+            raise InvalidToken("Invalid token audience")
+    if not claims.get("sub"):
+        raise InvalidToken("Token has no subject")
+    return claims
+
+
+class ClaimsCache:
+    """Verified claims by token hash, LRU-bounded, each kept until min(exp, now + ttl)."""
+
+    def __init__(self, secret, max_entries=AUTH_CACHE_ENTRIES, ttl=AUTH_CACHE_TTL):
+        self.secret = secret
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # sha256(token) -> (expires_at, claims)
+        self.hits = 0
+        self.misses = 0
+        self.rejected = 0
+
+    def verify(self, token):
+        key = hashlib.sha256(token.encode()).digest()
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+        try:
+            claims = decode_token(token, self.secret)
+        except InvalidToken:
+            with self._lock:
+                self.rejected += 1
+            raise
+        with self._lock:
+            self._entries[key] = (min(claims["exp"], now + self.ttl), claims)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return claims
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses,
+                    "rejected": self.rejected}
+
+
+claims_cache = ClaimsCache(JWT_SECRET) if JWT_SECRET else None
+
+
+def user_identity(claims):
+    # Activity rows and profiles are keyed by the email the client has always sent as user_id
+    return claims.get("email") or claims["sub"]
+
+
+def bearer_user(authorization):
+    """User id from an Authorization header value, or None without a usable bearer token.
+
+    Raises InvalidToken for a token that fails verification.
+    """
+    scheme, _, token = (authorization or "").partition(" ")
+    if claims_cache is None or scheme.lower() != "bearer" or not token.strip():
+        return None
+    return user_identity(claims_cache.verify(token.strip()))
+
+
+def choose_user(authenticated, claimed=None):
+    """The authenticated user, else `claimed` (the client's own user_id) unless AUTH_REQUIRED."""
+    if authenticated:
+        return authenticated
+    return None if AUTH_REQUIRED else claimed
+
+
+def authenticate_request():
+    """before_request hook: sets g.user_id from a valid bearer token.
+
+    A missing token leaves g.user_id unset; an invalid or expired one is a 401.
+    """
+    g.user_id = None
+    try:
+        g.user_id = bearer_user(request.headers.get("Authorization"))
+    except InvalidToken as e:
+        return jsonify({"error": str(e)}), 401
+    return None
+
+
+def current_user_id(claimed=None):
+    return choose_user(g.get("user_id"), claimed)
+
+
+class SessionRefresher:
+    """Refresh-token rotation in one place.
+
+    Supabase refresh tokens are single use, so two tabs (or a retry) refreshing
+    with the same token at once would log the user out. Concurrent refreshes of
+    one token share a single upstream call, and its result is handed to repeats
+    for REFRESH_REUSE_SECONDS.
+    """
+
+    def __init__(self, reuse_seconds=REFRESH_REUSE_SECONDS):
+        self.reuse_seconds = reuse_seconds
+        self._lock = threading.Lock()
+        self._recent = {}  # sha256(refresh token) -> (expires_at, session)
+        self._inflight = {}  # sha256(refresh token) -> Event, result holder
+
+    def refresh(self, refresh_token, rotate):
+        """`rotate()` exchanges the token for a new session dict upstream."""
+        key = hashlib.sha256(refresh_token.encode()).digest()
+        now = time.monotonic()
+        with self._lock:
+            for k in [k for k, (expires, _) in self._recent.items() if expires <= now]:
+                del self._recent[k]
+            if key in self._recent:
+                return self._recent[key][1]
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = (threading.Event(), {})
+
+        done, result = flight
+        if not leader:
+            done.wait()
+            if "error" in result:
+                raise result["error"]
+            return result["session"]
+
+        try:
+            result["session"] = rotate()
+            with self._lock:
+                self._recent[key] = (time.monotonic() + self.reuse_seconds, result["session"])
+            return result["session"]
+        except Exception as e:
+            result["error"] = e
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            done.set()
+
+
+session_refresher = SessionRefresher()
@@ -0,0 +1,206 @@
+import math
+import os
+import sys
+import threading
+import time
+from array import array
+from bisect import bisect_right
+
+from utils import catalog_version
+
+# Stable, ever-growing key per content table, used as the incremental-refresh watermark
+CONTENT_KEYS = {"movies": "api_id", "series": "api_id", "songs": "deezer_id"}
+
+CATALOG_INDEX_ENABLED = os.getenv("CATALOG_INDEX", "0") == "1"
+REFRESH_INTERVAL = int(os.getenv("CATALOG_INDEX_REFRESH", 60))
+# Watermark pulls only see keys above the last one loaded, so rebuild from scratch now and then
+FULL_RELOAD_INTERVAL = int(os.getenv("CATALOG_INDEX_FULL_RELOAD", 3600))
+LOAD_PAGE_SIZE = 1000
+INT_NULL = -(2 ** 63)  # None in an int64 column
+
+
+def pull_rows(client, table, key, watermark=None, columns="*"):
+    """Yield batches of rows whose `key` is above `watermark`, in key order."""
+    offset = 0
+    while True:
+        query = client.table(table).select(columns)
+        if watermark is not None:
+            query = query.gt(key, watermark)
+        rows = query.order(key).range(offset, offset + LOAD_PAGE_SIZE - 1).execute().data or []
+        yield rows
+        if len(rows) < LOAD_PAGE_SIZE:
+            return
+        offset += LOAD_PAGE_SIZE
+
+
+class _Column:
+    """Values of one column by row position: an int64 or float64 array while every
+    value fits (None stored as INT_NULL / NaN), a list of interned values otherwise."""
+
+    __slots__ = ("kind", "values")
+
+    def __init__(self):
+        self.kind = None  # "int", "float" or "list"; None until the first non-null value
+        self.values = []
+
+    def __len__(self):
+        return len(self.values)
+
+    def __getitem__(self, pos):
+        value = self.values[pos]
+        if self.kind == "int":
+            return None if value == INT_NULL else value
+        if self.kind == "float":
+            return None if math.isnan(value) else value
+        return value
+
+    def append(self, value):
+        if self.kind is None and value is not None:
+            # Earlier rows were all null
+            if type(value) is int:
+                self.kind, self.values = "int", array("q", [INT_NULL] * len(self.values))
+            elif type(value) is float:
+                self.kind, self.values = "float", array("d", [math.nan] * len(self.values))
+            else:
+                self.kind = "list"
+        if self.kind == "int" and (value is None or type(value) is int) and value != INT_NULL:
+            try:
+                self.values.append(INT_NULL if value is None else value)
+                return
+            except OverflowError:
+                pass
+        elif self.kind == "float" and (value is None or type(value) is float):
+            self.values.append(math.nan if value is None else value)
+            return
+        elif self.kind in (None, "list"):
+            self.values.append(sys.intern(value) if type(value) is str else value)
+            return
+        # A value the array cannot hold exactly (text, bool, int in a float column, > int64)
+        self.values = [self[pos] for pos in range(len(self.values))]
+        self.kind = "list"
+        self.append(value)
+
+
+class ContentIndex:
+    """Column-oriented copy of one content table, bucketed by (mood_id, language).
+
+    Numeric columns (ids, mood_id, years, audio features) are typed arrays,
+    text columns lists of interned strings; buckets hold row positions in key
+    order, so a page of results is a slice of a bucket.
+    """
+
+    def __init__(self, table, key):
+        self.table = table
+        self.key = key
+        self.columns = []
+        self.data = {}
+        self.size = 0
+        self.watermark = None
+        self._keys = set()
+        self._buckets = {}  # (mood_id, language) -> array of row positions
+        self._by_mood = {}  # mood_id -> array of row positions, for requests without a language
+
+    def add_rows(self, rows):
+        for row in rows:
+            key = row.get(self.key)
+            if key in self._keys:
+                continue
+            if not self.columns:
+                self.columns = list(row)
+                self.data = {col: _Column() for col in self.columns}
+            for col in self.columns:
+                self.data[col].append(row.get(col))
+
+            pos = self.size
+            self.size += 1
+            self._keys.add(key)
+            mood_id, language = row.get("mood_id"), row.get("language")
+            self._buckets.setdefault((mood_id, language), array("I")).append(pos)
+            self._by_mood.setdefault(mood_id, array("I")).append(pos)
+            if self.watermark is None or key > self.watermark:
+                self.watermark = key
+
+    def row(self, pos, fields=None):
+        if fields is None:
+            return {col: self.data[col][pos] for col in self.columns}
+        return {col: self.data[col][pos] for col in fields if col in self.data}
+
+    def page(self, mood_id, language, offset, limit, after=None, fields=None):
+        if language:
+            positions = self._buckets.get((mood_id, language), ())
+        else:
+            positions = self._by_mood.get(mood_id, ())
+        if after is not None:
+            # Buckets are in key order, so a cursor is a binary search away
+            keys = self.data[self.key]
+            offset = bisect_right(positions, after, key=lambda pos: keys[pos])
+        return [self.row(pos, fields) for pos in positions[offset:offset + limit]]
+
+
+class CatalogIndex:
+    """In-process serving index for the movies, series and songs tables."""
+
+    def __init__(self, client=None, tables=CONTENT_KEYS):
+        self._client = client
+        self.tables = tables
+        self._indexes = {}
+        self._lock = threading.Lock()
+        self._version = None
+        self._last_full = 0.0
+        self._thread = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            from utils.sup_client import sb
+            self._client = sb
+        return self._client
+
+    def is_warm(self, content_type):
+        return content_type in self._indexes
+
+    def refresh(self, full=False):
+        """Pull new rows into every table's index; full=True rebuilds them from scratch."""
+        with self._lock:
+            self._version = catalog_version.current()
+            full = full or time.monotonic() - self._last_full > FULL_RELOAD_INTERVAL
+            for table, key in self.tables.items():
+                current = self._indexes.get(table)
+                if full or current is None:
+                    index = ContentIndex(table, key)
+                    for rows in pull_rows(self.client, table, key, None):
+                        index.add_rows(rows)
+                    self._indexes[table] = index  # swap in only once complete
+                else:
+                    for rows in pull_rows(self.client, table, key, current.watermark):
+                        current.add_rows(rows)
+            if full:
+                self._last_full = time.monotonic()
+
+    def page(self, content_type, mood_id, language, offset, limit, after=None, fields=None):
+        """A page of rows, or None while the table has not been loaded yet."""
+        index = self._indexes.get(content_type)
+        if index is None:
+            return None
+        return index.page(mood_id, language, offset, limit, after, fields)
+
+    def start(self, interval=REFRESH_INTERVAL):
+        """Load in the background, then refresh every `interval` seconds or when ingestion bumps the catalog version."""
+        if self._thread:
+            return
+        self._thread = threading.Thread(target=self._run, args=(interval,), daemon=True)
+        self._thread.start()
+
+    def _run(self, interval):
+        next_refresh = 0.0
+        while True:
+            if time.monotonic() >= next_refresh or catalog_version.current() != self._version:
+                try:
+                    self.refresh()
+                except Exception as e:
+                    print("Catalog index refresh failed:", e)
+                next_refresh = time.monotonic() + interval
+            time.sleep(1)
+
+
+catalog_index = CatalogIndex()
@@ -0,0 +1,276 @@
+"""Memory-mappable columnar snapshot of the catalog tables.
+
+Written after ingestion (see utils/ingest.py) or with
+
+    python -m utils.catalog_snapshot
+
+and mmapped read-only by every API worker, so all gunicorn workers share the
+same pages through the OS page cache. Layout: an 8-byte magic, the JSON
+header length (u64), the JSON header, then 8-byte aligned blobs. Numeric
+columns are fixed-width int64/float64 arrays, text columns are u32 indexes into
+one interned string table, and each table's rows are sorted by
+(mood_id, language, key) so a (mood, language) bucket is a contiguous range.
+"""
+import json
+import math
+import mmap
+import os
+import struct
+import threading
+import time
+from array import array
+from bisect import bisect_right
+
+from utils.catalog_index import CONTENT_KEYS, pull_rows
+
+SNAPSHOT_PATH = os.getenv("CATALOG_SNAPSHOT", os.path.join(os.path.dirname(__file__), ".catalog_snapshot"))
+CHECK_INTERVAL = 5.0  # seconds between checks for a newer snapshot file
+
+MAGIC = b"MMCATv1\0"
+FORMAT_VERSION = 1
+INT_NULL = -(2 ** 63)
+STR_NULL = 0xFFFFFFFF
+_TYPECODES = {"int": "q", "float": "d", "str": "I"}
+
+
+def _column_type(values):
+    present = [v for v in values if v is not None]
+    if all(type(v) is int for v in present):
+        return "int"
+    if all(type(v) in (int, float) for v in present):
+        return "float"
+    return "str"
+
+
+def _nullable(value):
+    # None sorts first, without ever comparing None with a value
+    return (value is not None, value if value is not None else 0)
+
+
+class _Writer:
+    def __init__(self):
+        self.blobs = []
+        self.size = 0
+        self.strings = {}
+
+    def add(self, data):
+        offset = self.size
+        self.blobs.append(data)
+        self.size += len(data)
+        pad = -self.size % 8
+        if pad:
+            self.blobs.append(b"\0" * pad)
+            self.size += pad
+        return offset
+
+    def intern(self, value):
+        return self.strings.setdefault(value, len(self.strings))
+
+    def table(self, rows, key):
+        rows = sorted(rows, key=lambda row: (
+            _nullable(row.get("mood_id")), _nullable(row.get("language")), _nullable(row.get(key))
+        ))
+        columns = list(dict.fromkeys(col for row in rows for col in row))
+        meta = {"key": key, "rows": len(rows), "columns": {}, "buckets": [], "moods": []}
+
+        for col in columns:
+            values = [row.get(col) for row in rows]
+            kind = _column_type(values)
+            if kind == "int":
+                data = array("q", (INT_NULL if v is None else v for v in values))
+            elif kind == "float":
+                data = array("d", (math.nan if v is None else float(v) for v in values))
+            else:
+                data = array("I", (STR_NULL if v is None else self.intern(str(v)) for v in values))
+            meta["columns"][col] = {"type": kind, "offset": self.add(data.tobytes())}
+
+        # Contiguous (mood_id, language) ranges, plus per-mood row order by key for requests without a language
+        by_mood = {}
+        for pos, row in enumerate(rows):
+            bucket = (row.get("mood_id"), row.get("language"))
+            if meta["buckets"] and tuple(meta["buckets"][-1][:2]) == bucket:
+                meta["buckets"][-1][3] = pos + 1
+            else:
+                meta["buckets"].append([bucket[0], bucket[1], pos, pos + 1])
+            by_mood.setdefault(row.get("mood_id"), []).append(pos)
+        order = array("I")
+        for mood_id, positions in by_mood.items():
+            positions.sort(key=lambda pos: _nullable(rows[pos].get(key)))
+            meta["moods"].append([mood_id, len(order), len(order) + len(positions)])
+            order.extend(positions)
+        meta["mood_order"] = self.add(order.tobytes())
+        return meta
+
+    def string_table(self):
+        encoded = [s.encode() for s in self.strings]  # dict order is index order
+        offsets = array("I", [0])
+        for data in encoded:
+            offsets.append(offsets[-1] + len(data))
+        return {"count": len(encoded), "offsets": self.add(offsets.tobytes()), "data": self.add(b"".join(encoded))}
+
+
+def write_snapshot(path, tables, mood_rows, version):
+    """Write {table: (rows, key)} to `path` atomically."""
+    writer = _Writer()
+    header = {
+        "format": FORMAT_VERSION,
+        "catalog_version": version,
+        "created_at": time.time(),
+        "moods": mood_rows,
+        "tables": {name: writer.table(rows, key) for name, (rows, key) in tables.items()},
+    }
+    header["strings"] = writer.string_table()
+    header_bytes = json.dumps(header).encode()
+    prefix = MAGIC + struct.pack("<Q", len(header_bytes)) + header_bytes
+    prefix += b"\0" * (-len(prefix) % 8)
+
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(prefix)
+        for blob in writer.blobs:
+            f.write(blob)
+    os.replace(tmp, path)
+    return path
+
+
+def export(client, version, path=SNAPSHOT_PATH, tables=CONTENT_KEYS):
+    """Pull every content table and the moods from `client` into a snapshot for catalog `version`."""
+    started = time.monotonic()
+    data = {}
+    for table, key in tables.items():
+        rows = []
+        for batch in pull_rows(client, table, key):
+            rows += batch
+        data[table] = (rows, key)
+    mood_rows = client.table("moods").select("mood_id, mood_name").execute().data or []
+    write_snapshot(path, data, mood_rows, version)
+    counts = ", ".join(f"{len(rows)} {table}" for table, (rows, _) in data.items())
+    print(f"Catalog snapshot written to {path} ({counts}, {os.path.getsize(path)} bytes) "
+          f"in {time.monotonic() - started:.1f}s")
+
+
+class _Strings:
+    def __init__(self, buf, meta, base):
+        self._offsets = buf[base + meta["offsets"]:base + meta["offsets"] + 4 * (meta["count"] + 1)].cast("I")
+        self._data = buf[base + meta["data"]:]
+
+    def __getitem__(self, index):
+        if index == STR_NULL:
+            return None
+        return str(self._data[self._offsets[index]:self._offsets[index + 1]], "utf-8")
+
+
+class _Column:
+    def __init__(self, view, kind, strings):
+        self.view = view
+        self.kind = kind
+        self.strings = strings
+
+    def __getitem__(self, pos):
+        value = self.view[pos]
+        if self.kind == "int":
+            return None if value == INT_NULL else value
+        if self.kind == "float":
+            return None if math.isnan(value) else value
+        return self.strings[value]
+
+
+class SnapshotTable:
+    def __init__(self, buf, meta, strings, base):
+        self.key = meta["key"]
+        self.size = size = meta["rows"]
+        self.columns = {}
+        for col, info in meta["columns"].items():
+            typecode = _TYPECODES[info["type"]]
+            start = base + info["offset"]
+            end = start + size * struct.calcsize(typecode)
+            self.columns[col] = _Column(buf[start:end].cast(typecode), info["type"], strings)
+        self._buckets = {(m, lang): (start, end) for m, lang, start, end in meta["buckets"]}
+        self._order = buf[base + meta["mood_order"]:base + meta["mood_order"] + 4 * size].cast("I")
+        self._moods = {m: (start, end) for m, start, end in meta["moods"]}
+
+    def row(self, pos, fields=None):
+        names = self.columns if fields is None else [f for f in fields if f in self.columns]
+        return {col: self.columns[col][pos] for col in names}
+
+    def page(self, mood_id, language, offset, limit, after=None, fields=None):
+        keys = self.columns[self.key]
+        if language:
+            start, end = self._buckets.get((mood_id, language), (0, 0))
+            positions = range(start, end)
+        else:
+            start, end = self._moods.get(mood_id, (0, 0))
+            positions = self._order[start:end]
+        if after is not None:
+            offset = bisect_right(positions, after, key=lambda pos: keys[pos])
+        return [self.row(pos, fields) for pos in positions[offset:offset + limit]]
+
+
+class CatalogSnapshot:
+    """Read-only view of one snapshot file; rows are decoded only when a page asks for them."""
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        buf = memoryview(self._mmap)
+        if bytes(buf[:8]) != MAGIC:
+            raise ValueError(f"{path} is not a catalog snapshot")
+        (header_len,) = struct.unpack("<Q", buf[8:16])
+        header = json.loads(bytes(buf[16:16 + header_len]))
+        if header["format"] != FORMAT_VERSION:
+            raise ValueError(f"Unsupported snapshot format {header['format']}")
+        base = 16 + header_len + (-(16 + header_len) % 8)
+        self.path = path
+        self.version = header["catalog_version"]
+        self.created_at = header["created_at"]
+        self.moods = header["moods"]
+        strings = _Strings(buf, header["strings"], base)
+        self.tables = {name: SnapshotTable(buf, meta, strings, base) for name, meta in header["tables"].items()}
+
+    def page(self, content_type, mood_id, language, offset, limit, after=None, fields=None):
+        """A page of rows, or None if the snapshot has no such table."""
+        table = self.tables.get(content_type)
+        if table is None:
+            return None
+        return table.page(mood_id, language, offset, limit, after, fields)
+
+
+class SnapshotStore:
+    """The newest snapshot at `path`, re-checked every CHECK_INTERVAL seconds and remapped when replaced."""
+
+    def __init__(self, path=SNAPSHOT_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._stat = None
+        self._checked_at = None
+
+    def get(self):
+        now = time.monotonic()
+        if self._checked_at is not None and now - self._checked_at < CHECK_INTERVAL:
+            return self._snapshot
+        with self._lock:
+            self._checked_at = now
+            try:
+                st = os.stat(self.path)
+            except FileNotFoundError:
+                return self._snapshot
+            stat = (st.st_ino, st.st_mtime_ns, st.st_size)
+            if stat != self._stat:
+                self._stat = stat
+                try:
+                    # Old mappings stay valid for requests still using them and are freed with them
+                    self._snapshot = CatalogSnapshot(self.path)
+                except (OSError, ValueError, KeyError) as e:
+                    print("Could not load catalog snapshot:", e)
+            return self._snapshot
+
+
+catalog_snapshot = SnapshotStore()
+
+
+if __name__ == "__main__":
+    from utils import catalog_version
+    from utils.sup_client import sb
+
+    export(sb, catalog_version.current())
@@ -0,0 +1,71 @@
+import os
+import threading
+import time
+
+# Ingestion scripts run in their own processes, so they signal "catalog changed"
+# to the API workers through a small stamp file rather than in memory.
+VERSION_FILE = os.getenv(
+    "CATALOG_VERSION_FILE", os.path.join(os.path.dirname(__file__), ".catalog_version")
+)
+CHECK_INTERVAL = 1.0  # seconds between re-reads of the stamp file
+# Writes that skip bump() (the Supabase dashboard, another service) only show in the
+# data itself: its watermark is re-read in the background this often
+WATERMARK_TTL = float(os.getenv("CATALOG_WATERMARK_TTL", 30))
+
+_cached = ("0", None)  # (version, checked_at)
+_watermark = (None, None)  # (watermark, checked_at)
+_watermark_lock = threading.Lock()
+_watermark_loading = False
+
+
+def bump():
+    """Mark the catalog as changed; call after inserting rows."""
+    version = str(time.time_ns())
+    tmp = f"{VERSION_FILE}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        f.write(version)
+    os.replace(tmp, VERSION_FILE)
+    return version
+
+
+def current():
+    global _cached
+    version, checked_at = _cached
+    now = time.monotonic()
+    if checked_at is not None and now - checked_at < CHECK_INTERVAL:
+        return version
+    try:
+        with open(VERSION_FILE) as f:
+            version = f.read().strip() or "0"
+    except FileNotFoundError:
+        version = "0"
+    _cached = (version, now)
+    return version
+
+
+def _load_watermark():
+    global _watermark, _watermark_loading
+    value = _watermark[0]
+    try:
+        from utils.repository import repo
+        value = repo.catalog_watermark()
+    except Exception as e:
+        print("Could not read the catalog watermark:", e)
+    with _watermark_lock:
+        _watermark = (value, time.monotonic())
+        _watermark_loading = False
+
+
+def watermark():
+    """Row count and largest key of each content table, at most WATERMARK_TTL (plus one
+    query) old. Never blocks: a stale value is returned while a thread re-reads it,
+    and None until the first read completes."""
+    global _watermark_loading
+    value, checked_at = _watermark
+    if checked_at is None or time.monotonic() - checked_at >= WATERMARK_TTL:
+        with _watermark_lock:
+            if _watermark_loading:
+                return value
+            _watermark_loading = True
+        threading.Thread(target=_load_watermark, daemon=True).start()
+    return value
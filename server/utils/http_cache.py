@@ -0,0 +1,111 @@
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from dotenv import load_dotenv
+
+# The first module the ingestion scripts import (python -m utils.insert_songs too),
+# so .env is loaded before any of their settings are read
+load_dotenv()
+
+# Query parameters that identify the caller rather than the resource
+SECRET_PARAMS = {"api_key", "access_token"}
+
+HTTP_CACHE_ENABLED = os.getenv("HTTP_CACHE", "0") == "1"
+HTTP_CACHE_DIR = os.getenv("HTTP_CACHE_DIR", os.path.join(os.path.dirname(__file__), ".http_cache"))
+HTTP_CACHE_TTL = int(os.getenv("HTTP_CACHE_TTL", 6 * 3600))
+HTTP_CACHE_MAX_BYTES = int(os.getenv("HTTP_CACHE_MAX_BYTES", 200 * 1024 * 1024))
+INGEST_OFFLINE = os.getenv("INGEST_OFFLINE", "0") == "1"
+
+
+def cache_key(url):
+    """Canonical URL without credentials, so the same request hashes the same for every key holder."""
+    parts = urlsplit(url)
+    query = sorted((k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if k not in SECRET_PARAMS)
+    return urlunsplit((parts.scheme, parts.netloc, parts.path, urlencode(query), ""))
+
+
+class DiskCache:
+    """Content-addressed, gzip-compressed cache of JSON responses on local disk.
+
+    Files are named by the SHA-256 of the canonical URL. An entry's mtime is
+    its last access, which drives LRU eviction once the directory grows past
+    `max_bytes`; the time it was stored is kept inside the file for the TTL.
+    With offline=True the fetcher replays only from here and never touches
+    the network.
+    """
+
+    def __init__(self, root=HTTP_CACHE_DIR, ttl=HTTP_CACHE_TTL, max_bytes=HTTP_CACHE_MAX_BYTES,
+                 offline=INGEST_OFFLINE):
+        self.root = root
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.offline = offline
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+        self._bytes = sum(size for _, _, size in self._entries())
+
+    def _path(self, url):
+        digest = hashlib.sha256(cache_key(url).encode()).hexdigest()
+        return os.path.join(self.root, digest[:2], f"{digest}.json.gz")
+
+    def _entries(self):
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                if name.endswith(".json.gz"):
+                    path = os.path.join(dirpath, name)
+                    try:
+                        st = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    yield path, st.st_mtime, st.st_size
+
+    def get(self, url):
+        path = self._path(url)
+        try:
+            with gzip.open(path, "rt") as f:
+                entry = json.load(f)
+        except (FileNotFoundError, OSError, ValueError):
+            self.misses += 1
+            return None
+        # Offline replays whatever is there, however old
+        if not self.offline and time.time() - entry["stored_at"] > self.ttl:
+            self.misses += 1
+            return None
+        os.utime(path)  # mark as recently used
+        self.hits += 1
+        return entry["body"]
+
+    def put(self, url, body):
+        path = self._path(url)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with gzip.open(tmp, "wt") as f:
+            json.dump({"url": cache_key(url), "stored_at": time.time(), "body": body}, f)
+        size = os.path.getsize(tmp)
+        try:
+            old = os.path.getsize(path)
+        except FileNotFoundError:
+            old = 0
+        os.replace(tmp, path)
+        with self._lock:
+            self._bytes += size - old
+            if self._bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        # Least recently used first, down to 90% of the cap
+        for path, _, size in sorted(self._entries(), key=lambda e: e[1]):
+            if self._bytes <= self.max_bytes * 0.9:
+                break
+            try:
+                os.remove(path)
+                self._bytes -= size
+            except FileNotFoundError:
+                pass
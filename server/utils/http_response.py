@@ -0,0 +1,161 @@
+import gzip
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+
+from flask import Response, current_app
+
+try:
+    import brotli
+except ImportError:  # optional; gzip only without it
+    brotli = None
+
+# Bodies smaller than this are sent as is: compressing them saves little and costs CPU
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", 1024))
+COMPRESSED_CACHE_BYTES = int(os.getenv("COMPRESSED_CACHE_BYTES", 16 * 1024 * 1024))
+
+_ENCODED_ETAG_RE = re.compile(r'-(?:br|gzip)"$')
+
+
+def make_etag(*parts):
+    """Strong ETag over `parts` (bytes are hashed as is, anything else by its repr)."""
+    h = hashlib.blake2b(digest_size=12)
+    for part in parts:
+        h.update(part if isinstance(part, bytes) else repr(part).encode())
+        h.update(b"\0")
+    return f'"{h.hexdigest()}"'
+
+
+def etag_matches(if_none_match, etag):
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # If-None-Match uses weak comparison, so W/"x" matches "x"; "x-gzip" is the
+    # same representation before content coding
+    candidates = (tag.strip().removeprefix("W/") for tag in if_none_match.split(","))
+    return any(_ENCODED_ETAG_RE.sub('"', tag) == etag for tag in candidates)
+
+
+def choose_encoding(accept_encoding):
+    """"br" or "gzip" if the client accepts it (brotli preferred when installed), else None."""
+    accepted = {}
+    for item in (accept_encoding or "").split(","):
+        name, _, params = item.strip().partition(";")
+        q = 1.0
+        if params.strip().startswith("q="):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        if name:
+            accepted[name.lower()] = q
+    wildcard = accepted.get("*", 0.0)
+    if brotli is not None and accepted.get("br", wildcard) > 0:
+        return "br"
+    if accepted.get("gzip", wildcard) > 0:
+        return "gzip"
+    return None
+
+
+class CompressedCache:
+    """LRU of compressed bodies keyed by (body hash, encoding), bounded by total bytes."""
+
+    def __init__(self, max_bytes=COMPRESSED_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_compress(self, digest, encoding, body):
+        key = (digest, encoding)
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return data
+            self.misses += 1
+        if encoding == "br":
+            data = brotli.compress(body, quality=5)
+        else:
+            data = gzip.compress(body, compresslevel=6)
+        with self._lock:
+            if key not in self._entries and len(data) <= self.max_bytes:
+                self._entries[key] = data
+                self._bytes += len(data)
+                while self._bytes > self.max_bytes:
+                    _, evicted = self._entries.popitem(last=False)
+                    self._bytes -= len(evicted)
+        return data
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self._bytes, "hits": self.hits, "misses": self.misses}
+
+
+compressed_cache = CompressedCache()
+
+
+def cache_headers(etag):
+    # no-cache: browsers keep the body but revalidate with If-None-Match every time.
+    # Personalized pages differ by the bearer token's user.
+    return {"ETag": etag, "Cache-Control": "private, no-cache", "Vary": "Accept-Encoding, Authorization"}
+
+
+def _encoded_etag(etag, encoding):
+    # A strong ETag belongs to one content coding
+    return f'{etag[:-1]}-{encoding}"' if encoding else etag
+
+
+def revalidated_etag(if_none_match, etag, accept_encoding):
+    """The ETag a 200 for `etag` would carry, for a 304 sent without building the body.
+
+    The body's size is not known then, but the client's matching tag shows
+    whether it was large enough to be compressed.
+    """
+    for tag in (if_none_match or "").split(","):
+        tag = tag.strip().removeprefix("W/")
+        if tag != etag and _ENCODED_ETAG_RE.sub('"', tag) == etag:
+            return _encoded_etag(etag, choose_encoding(accept_encoding))
+    return etag
+
+
+def not_modified_headers(etag, if_none_match, accept_encoding):
+    return cache_headers(revalidated_etag(if_none_match, etag, accept_encoding))
+
+
+def not_modified(etag, if_none_match=None, accept_encoding=None):
+    return Response(status=304, headers=not_modified_headers(etag, if_none_match, accept_encoding))
+
+
+def encode_json(body, method, if_none_match, accept_encoding, etag=None):
+    """(status, body, headers) for the JSON `body` bytes: an ETag (the body hash unless
+    given), 304 on a matching conditional GET, and gzip/brotli for large bodies when accepted."""
+    digest = make_etag(body)
+    etag = etag or digest
+    encoding = choose_encoding(accept_encoding) if len(body) >= COMPRESS_MIN_BYTES else None
+    # A 304 repeats the ETag of the representation the 200 would send
+    headers = cache_headers(_encoded_etag(etag, encoding))
+    if method in ("GET", "HEAD") and etag_matches(if_none_match, etag):
+        return 304, b"", headers
+
+    if encoding:
+        body = compressed_cache.get_or_compress(digest, encoding, body)
+        headers["Content-Encoding"] = encoding
+    return 200, body, headers
+
+
+def json_response(payload, request, etag=None):
+    """Flask response for `payload`, see encode_json()."""
+    status, body, headers = encode_json(
+        current_app.json.dumps(payload).encode(), request.method,
+        request.headers.get("If-None-Match"), request.headers.get("Accept-Encoding"), etag,
+    )
+    if status == 304:
+        return Response(status=304, headers=headers)
+    return Response(body, mimetype="application/json", headers=headers)
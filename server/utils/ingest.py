@@ -0,0 +1,80 @@
+"""Catalog ingestion CLI.
+
+    python -m utils.ingest movies series --langs en,hi --pages 1-30 --workers 8
+    python -m utils.ingest all --mode incremental --parallel
+"""
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+from dotenv import load_dotenv
+
+# Before the imports below: they read their settings (INGEST_OFFLINE, HTTP_CACHE,
+# TMDB_RATE, ...) from the environment when they are first imported
+load_dotenv()
+
+from utils import catalog_snapshot, catalog_version, insert_movies, insert_series, insert_songs, insert_tmdb
+from utils.http_cache import INGEST_OFFLINE
+from utils.ingest_engine import INGEST_WORKERS, IngestContext
+
+SOURCES = ("movies", "series", "songs")
+
+
+def parse_pages(value):
+    """"5" -> range(5, 6), "1-30" -> range(1, 31)."""
+    first, _, last = value.partition("-")
+    return range(int(first), int(last or first) + 1)
+
+
+def run_sources(ctx, sources, languages=None, pages=None, parallel=False, snapshot=True):
+    """Run the named sources with one shared context; returns {source: [IngestStats, ...]}.
+
+    Afterwards the catalog version is bumped and, with snapshot=True, a fresh
+    catalog snapshot is exported for the API workers.
+    """
+    def run_one(source):
+        if source == "songs":
+            return insert_songs.run(ctx)
+        module = insert_movies if source == "movies" else insert_series
+        return module.run(ctx, languages or insert_tmdb.LANGUAGES, pages or module.PAGES)
+
+    if parallel and len(sources) > 1:
+        with ThreadPoolExecutor(max_workers=len(sources)) as pool:
+            results = dict(zip(sources, pool.map(run_one, sources)))
+    else:
+        results = {source: run_one(source) for source in sources}
+
+    # Let running API workers drop cached result pages
+    version = catalog_version.bump()
+    if snapshot:
+        try:
+            catalog_snapshot.export(ctx.client, version)
+        except Exception as e:
+            print("⚠️ Catalog snapshot export failed:", e)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m utils.ingest", description="Populate the catalog tables.")
+    parser.add_argument("sources", nargs="+", choices=SOURCES + ("all",))
+    parser.add_argument("--langs", help="comma-separated TMDB original languages (default: all)")
+    parser.add_argument("--pages", type=parse_pages, help='TMDB page range, e.g. "1-30"')
+    parser.add_argument("--workers", type=int, default=INGEST_WORKERS)
+    parser.add_argument("--mode", choices=("full", "incremental"), default="full")
+    parser.add_argument("--parallel", action="store_true", help="run the sources concurrently")
+    parser.add_argument("--offline", action="store_true", help="replay HTTP responses from the disk cache only")
+    parser.add_argument("--no-snapshot", action="store_true", help="skip exporting the catalog snapshot")
+    args = parser.parse_args(argv)
+
+    sources = list(SOURCES) if "all" in args.sources else list(dict.fromkeys(args.sources))
+    languages = args.langs.split(",") if args.langs else None
+    ctx = IngestContext(workers=args.workers, mode=args.mode, offline=args.offline or INGEST_OFFLINE)
+    results = run_sources(ctx, sources, languages, args.pages, args.parallel, snapshot=not args.no_snapshot)
+
+    print("Summary:")
+    for stats_list in results.values():
+        for stats in stats_list:
+            print(" ", stats.report())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,282 @@
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from utils.http_cache import DiskCache, HTTP_CACHE_ENABLED, INGEST_OFFLINE, cache_key
+
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", 8))
+INGEST_CHECKPOINT_DIR = os.getenv("INGEST_CHECKPOINT_DIR", os.path.dirname(__file__))
+
+
+class TokenBucket:
+    """Allows `rate` acquisitions per second on average, with bursts up to `capacity`."""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or max(1, int(rate))
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class HttpFetcher:
+    """Pooled, rate-limited JSON fetcher with exponential backoff and jitter.
+
+    One instance is shared by all worker threads of a source, so connections
+    are reused and the token bucket caps the request rate for the whole crawl.
+    Responses go through an on-disk cache when HTTP_CACHE=1 or INGEST_OFFLINE=1.
+    """
+
+    def __init__(self, rate=20, concurrency=INGEST_WORKERS, retries=5,
+                 backoff=0.5, max_backoff=30, timeout=15, cache=None):
+        if cache is None and (HTTP_CACHE_ENABLED or INGEST_OFFLINE):
+            cache = DiskCache()
+        self.cache = cache
+        self.bucket = TokenBucket(rate)
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=concurrency)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def get_json(self, url):
+        if self.cache:
+            body = self.cache.get(url)
+            if body is not None:
+                return body
+            if self.cache.offline:
+                print(f"Offline and not cached: {cache_key(url)}")
+                return None
+
+        for attempt in range(self.retries):
+            self.bucket.acquire()
+            try:
+                resp = self.session.get(url, timeout=self.timeout)
+                if resp.status_code == 429 and resp.headers.get("Retry-After", "").isdigit():
+                    time.sleep(int(resp.headers["Retry-After"]))
+                    continue
+                if 400 <= resp.status_code < 500 and resp.status_code != 429:
+                    print(f"Request to {resp.url} rejected with {resp.status_code}, not retrying")
+                    return None
+                resp.raise_for_status()
+                body = resp.json()
+                if self.cache:
+                    self.cache.put(url, body)
+                return body
+            except requests.exceptions.RequestException as e:
+                # Full jitter: sleep a random amount up to the exponential cap
+                delay = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+                print(f"Request failed ({e}), retrying in {delay:.1f}s...")
+                time.sleep(delay)
+        return None
+
+
+class IngestStats:
+    def __init__(self, source):
+        self.source = source
+        self.started = time.monotonic()
+        self.units = 0
+        self.pages = 0
+        self.rows = 0
+        self.inserted = 0
+        self.skipped = 0
+        self.failed = 0
+        self._lock = threading.Lock()
+
+    def add(self, pages=0, rows=0, inserted=0, skipped=0, failed=0):
+        with self._lock:
+            self.pages += pages
+            self.rows += rows
+            self.inserted += inserted
+            self.skipped += skipped
+            self.failed += failed
+
+    def report(self):
+        elapsed = max(time.monotonic() - self.started, 1e-9)
+        return (
+            f"{self.source}: {self.units} units, {self.pages} pages, {self.rows} rows "
+            f"({self.inserted} inserted, {self.skipped} skipped), {self.failed} failed in {elapsed:.1f}s "
+            f"({self.pages / elapsed:.1f} pages/s, {self.rows / elapsed:.1f} rows/s)"
+        )
+
+
+class Checkpoint:
+    """Local JSON file (one per ingestion script) recording finished units and per-key watermarks.
+
+    Units finished by an interrupted run are skipped when it is started again;
+    once every unit of a source succeeds its finished set is cleared, while the
+    watermarks are kept for the next incremental run.
+    """
+
+    def __init__(self, name):
+        self.path = path = os.path.join(INGEST_CHECKPOINT_DIR, f".ingest_{name}.json")
+        self._lock = threading.Lock()
+        try:
+            with open(path) as f:
+                state = json.load(f)
+        except (FileNotFoundError, ValueError):
+            state = {}
+        self._done = {source: set(units) for source, units in state.get("done", {}).items()}
+        self._watermarks = state.get("watermarks", {})
+
+    def _save(self):
+        state = {
+            "done": {source: sorted(units) for source, units in self._done.items() if units},
+            "watermarks": self._watermarks,
+        }
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(state, f, indent=1)
+        os.replace(tmp, self.path)
+
+    def is_done(self, source, unit):
+        return str(unit) in self._done.get(source, ())
+
+    def mark_done(self, source, unit):
+        with self._lock:
+            self._done.setdefault(source, set()).add(str(unit))
+            self._save()
+
+    def finish(self, source):
+        with self._lock:
+            self._done.pop(source, None)
+            self._save()
+
+    def watermark(self, key, default=None):
+        return self._watermarks.get(key, default)
+
+    def set_watermark(self, key, value):
+        with self._lock:
+            self._watermarks[key] = value
+            self._save()
+
+
+def run_source(source, units, process, workers=INGEST_WORKERS, checkpoint=None):
+    """Run `process(unit, stats)` for every unit on a thread pool and return the stats.
+
+    A unit is whatever one worker fetches and stores in one go, e.g. a
+    (language, page) pair or a playlist id. Failures (an exception, or
+    `process` returning False) are reported and counted without stopping the
+    other units. With a checkpoint, finished units are recorded as they
+    complete and skipped when an interrupted run is resumed.
+    """
+    stats = IngestStats(source)
+    if checkpoint:
+        pending = [unit for unit in units if not checkpoint.is_done(source, unit)]
+        if len(pending) < len(units):
+            print(f"Resuming {source}: {len(units) - len(pending)} of {len(units)} units already done")
+        units = pending
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(process, unit, stats): unit for unit in units}
+        for future in as_completed(futures):
+            stats.units += 1
+            try:
+                ok = future.result() is not False
+            except Exception as e:
+                ok = False
+                print(f"⚠️ {source} {futures[future]} failed:", e)
+            if not ok:
+                stats.add(failed=1)
+            elif checkpoint:
+                checkpoint.mark_done(source, futures[future])
+
+    if checkpoint and not stats.failed:
+        checkpoint.finish(source)
+    print(stats.report())
+    return stats
+
+
+def upsert_batch(client, table, rows, key, stats):
+    """Write `rows` with one bulk upsert, leaving rows whose `key` already exists untouched.
+
+    Needs a unique constraint on `key`. With ignore_duplicates the response
+    only contains the rows that were actually inserted.
+    """
+    unique = list({row[key]: row for row in rows if row.get(key) is not None}.values())
+    inserted = 0
+    if unique:
+        query = client.table(table).upsert(unique, ignore_duplicates=True)
+        # postgrest-py 0.10's upsert() has no on_conflict argument; without the
+        # query param PostgREST would resolve conflicts on the primary key instead
+        query.params = query.params.add("on_conflict", key)
+        resp = query.execute()
+        inserted = len(resp.data or [])
+    stats.add(pages=1, rows=len(rows), inserted=inserted, skipped=len(rows) - inserted)
+    return inserted
+
+
+class IngestContext:
+    """State shared by every source in one ingestion run, each piece built on first use.
+
+    Creating a context costs nothing; the Supabase client, the moods registry,
+    per-API fetchers, checkpoints and lookup tables such as TMDB genre maps are
+    created once when a source first asks for them, so several sources can run
+    in one process without paying that setup again.
+    """
+
+    def __init__(self, client=None, workers=INGEST_WORKERS, mode="full", offline=INGEST_OFFLINE):
+        self.workers = workers
+        self.mode = mode
+        self.offline = offline
+        self._lock = threading.RLock()
+        self._values = {}
+        if client is not None:
+            self._values["client"] = client
+
+    @property
+    def incremental(self):
+        return self.mode == "incremental"
+
+    def once(self, key, factory):
+        """Return the value stored under `key`, calling `factory()` the first time."""
+        with self._lock:
+            if key not in self._values:
+                self._values[key] = factory()
+            return self._values[key]
+
+    @property
+    def client(self):
+        def connect():
+            # Supabase, or the local stand-in with SUP_BACKEND=local
+            from utils.sup_client import sb
+            return sb
+        return self.once("client", connect)
+
+    @property
+    def moods(self):
+        from utils.mood_registry import MoodRegistry
+        from utils.repository import Repository
+        return self.once("moods", lambda: MoodRegistry(Repository(self.client)))
+
+    def fetcher(self, name, rate):
+        def build():
+            cache = None
+            if HTTP_CACHE_ENABLED or self.offline:
+                cache = self.once("http_cache", lambda: DiskCache(offline=self.offline))
+            return HttpFetcher(rate=rate, concurrency=self.workers, cache=cache)
+        return self.once(("fetcher", name), build)
+
+    def checkpoint(self, name):
+        return self.once(("checkpoint", name), lambda: Checkpoint(name))
@@ -1,89 +1,79 @@
 import os
-import requests
-import time
 import random
-from supabase import create_client
-from dotenv import load_dotenv
-
-load_dotenv()
-SUP_URL = os.getenv("SUP_URL")
-SUP_KEY = os.getenv("SUP_KEY")
-sb = create_client(SUP_URL, SUP_KEY)
-
-def assign_mood(valence, energy, tempo):
-    if valence > 0.7 and energy > 0.7:
-        mood_name = "Happy / Joyful"
-    elif valence < 0.4 and energy < 0.4:
-        mood_name = "Sad / Melancholic"
-    elif energy > 0.7 and valence < 0.5:
-        mood_name = "Energetic / Excited"
-    elif valence > 0.5 and energy < 0.5:
-        mood_name = "Romantic / Love"
-    else:
-        mood_name = "Thoughtful / Calm"
-
-    mood = sb.table("moods").select("mood_id").eq("mood_name", mood_name).execute()
-    if mood.data and len(mood.data) > 0:
-        return mood.data[0]["mood_id"]
-    return None
-
-def fetch_url(url, retries=5, delay=2):
-    for _ in range(retries):
-        try:
-            resp = requests.get(url)
-            resp.raise_for_status()
-            return resp.json()
-        except requests.exceptions.RequestException as e:
-            print("Request failed, retrying...", e)
-            time.sleep(delay)
-    return None
-
-playlist_ids = [
-    908622995, 1111146134, 1050834620, 1321842755,
-    3155776842, 1234567890
-]
-
-for playlist_id in playlist_ids:
-    url = f"https://api.deezer.com/playlist/{playlist_id}/tracks"
-    while url:
-        resp = fetch_url(url)
-        if not resp or "data" not in resp:
-            break
-
-        for t in resp["data"]:
-            deezer_id = str(t["id"])
-            title = t["title"]
-            artist = t["artist"]["name"]
-            release_year = None
-            if "album" in t and "release_date" in t["album"]:
-                release_year = int(t["album"]["release_date"].split("-")[0])
-
-            # Since Deezer doesn't give these, assign random approximate values
-            tempo = random.randint(80, 160)
-            valence = round(random.uniform(0.2, 0.9), 2)
-            energy = round(random.uniform(0.2, 0.9), 2)
 
-            mood_id = assign_mood(valence, energy, tempo)
+from utils.ingest_engine import run_source, upsert_batch
+from utils.song_features import classify_moods
 
-            existing = sb.table("songs").select("deezer_id").eq("deezer_id", deezer_id).execute()
-            if existing.data:
-                continue
-
-            sb.table("songs").insert({
-                "deezer_id": deezer_id,
-                "title": title,
-                "artist": artist,
-                "release_year": release_year,
-                "tempo": tempo,
-                "valence": valence,
-                "energy": energy,
-                "mood_id": mood_id
-            }).execute()
-
-        url = resp.get("next")  # pagination
-        time.sleep(0.2)
-
-print("✅ Songs populated from Deezer with generated moods!")
+DEEZER_RATE = float(os.getenv("DEEZER_RATE", 8))  # Deezer allows 50 requests per 5 seconds
 
+PLAYLIST_IDS = [
+    908622995, 1111146134, 1050834620, 1321842755,
+    3155776842, 1234567890
+]
 
 
+def build_rows(ctx, tracks):
+    rows = []
+    for t in tracks:
+        release_year = None
+        if "album" in t and "release_date" in t["album"]:
+            release_year = int(t["album"]["release_date"].split("-")[0])
+
+        # Since Deezer doesn't give these, assign random approximate values
+        rows.append({
+            "deezer_id": str(t["id"]),
+            "title": t["title"],
+            "artist": t["artist"]["name"],
+            "release_year": release_year,
+            "tempo": random.randint(80, 160),
+            "valence": round(random.uniform(0.2, 0.9), 2),
+            "energy": round(random.uniform(0.2, 0.9), 2),
+        })
+
+    # Classify the whole page at once, then map names to ids in memory
+    mood_names = classify_moods(
+        [r["valence"] for r in rows], [r["energy"] for r in rows], [r["tempo"] for r in rows]
+    )
+    for row, mood_name in zip(rows, mood_names):
+        row["mood_id"] = ctx.moods.mood_id(mood_name)
+    return rows
+
+
+def run(ctx, playlist_ids=PLAYLIST_IDS):
+    fetcher = ctx.fetcher("deezer", DEEZER_RATE)
+    checkpoint = ctx.checkpoint("songs")
+
+    def process_playlist(playlist_id, stats):
+        # In incremental mode, playlists whose Deezer checksum has not changed are skipped
+        meta = fetcher.get_json(f"https://api.deezer.com/playlist/{playlist_id}")
+        checksum = meta.get("checksum") if meta else None
+        if ctx.incremental and checksum and checksum == checkpoint.watermark(f"songs:{playlist_id}"):
+            print(f"Playlist {playlist_id} unchanged since the last run, skipping")
+            return
+
+        url = f"https://api.deezer.com/playlist/{playlist_id}/tracks"
+        while url:
+            resp = fetcher.get_json(url)
+            if not resp:
+                print(f"⚠️ Stopping playlist {playlist_id} due to repeated failures")
+                return False
+            if "data" not in resp:
+                # Deezer reports unknown or private playlists in the body; nothing to retry
+                print(f"Playlist {playlist_id} returned no tracks:", resp.get("error"))
+                break
+
+            # One write per Deezer page; tracks already in the table are skipped
+            upsert_batch(ctx.client, "songs", build_rows(ctx, resp["data"]), "deezer_id", stats)
+            url = resp.get("next")  # pagination
+
+        if checksum:
+            checkpoint.set_watermark(f"songs:{playlist_id}", checksum)
+
+    # Playlists are crawled concurrently; pages within one playlist follow its "next" links.
+    # Finished playlists are checkpointed, so an interrupted run picks up where it stopped.
+    return [run_source("songs", playlist_ids, process_playlist, ctx.workers, checkpoint)]
+
+
+if __name__ == "__main__":
+    from utils.ingest import main
+    main(["songs"])
@@ -0,0 +1,141 @@
+import os
+from datetime import date, timedelta
+
+from utils.ingest_engine import run_source, upsert_batch
+
+# Shared crawl for the TMDB-backed tables (see insert_movies.py and insert_series.py)
+LANGUAGES = ["en", "hi", "ta", "ml", "te", "kn"]
+TMDB_RATE = float(os.getenv("TMDB_RATE", 30))  # TMDB allows ~40 req/s
+INCREMENTAL_OVERLAP_DAYS = 7  # re-read a week back to catch late TMDB additions
+MAX_TMDB_PAGES = 500
+
+# Genre → Mood mapping
+GENRE_MOODS = {
+    "Comedy": "Happy / Joyful",
+    "Drama": "Sad / Melancholic",
+    "Romance": "Romantic / Love",
+    "Action": "Energetic / Excited",
+    "Adventure": "Energetic / Excited",
+    "Music": "Happy / Joyful",
+    "Documentary": "Serious / Thoughtful",
+    "Mystery": "Serious / Thoughtful",
+    "Horror": "Scary / Fearful / Dark",
+    "Thriller": "Scary / Fearful / Dark",
+    "Animation": "Happy / Joyful",
+    "Family": "Happy / Joyful",
+    "Biography": "Motivational / Inspirational",
+    "Sport": "Motivational / Inspirational"
+}
+
+
+class TmdbSpec:
+    """What differs between the TMDB movie and TV crawls."""
+
+    def __init__(self, table, kind, title_field, date_field, discover_date):
+        self.table = table  # Supabase table
+        self.kind = kind  # "movie" or "tv" in TMDB URLs
+        self.title_field = title_field
+        self.date_field = date_field  # release date field on results
+        self.discover_date = discover_date  # the same date as a discover filter/sort key
+
+
+def tmdb_url(path, **params):
+    query = "&".join(f"{k}={v}" for k, v in params.items())
+    return f"https://api.themoviedb.org/3/{path}?api_key={os.getenv('TMDB_KEY')}&{query}"
+
+
+def genre_names(ctx, spec):
+    """TMDB genre id -> name, fetched once per run."""
+    def load():
+        resp = ctx.fetcher("tmdb", TMDB_RATE).get_json(tmdb_url(f"genre/{spec.kind}/list", language="en-US"))
+        if not resp:
+            raise RuntimeError(f"Could not load TMDB {spec.kind} genres")
+        return {g["id"]: g["name"] for g in resp["genres"]}
+    return ctx.once(("tmdb_genres", spec.kind), load)
+
+
+def discover_url(spec, lang, page, since=None):
+    params = {"with_original_language": lang, "page": page}
+    if since:
+        params["sort_by"] = f"{spec.discover_date}.desc"
+        params[f"{spec.discover_date}.gte"] = since
+    return tmdb_url(f"discover/{spec.kind}", **params)
+
+
+def build_rows(ctx, spec, results):
+    genres = genre_names(ctx, spec)
+    rows = []
+    for item in results:
+        released = item.get(spec.date_field)
+        genre_name = genres.get(item["genre_ids"][0]) if item.get("genre_ids") else None
+        mood_name = GENRE_MOODS.get(genre_name)
+        rows.append({
+            "title": item.get(spec.title_field),
+            "genre": genre_name,
+            "release_year": int(released.split("-")[0]) if released else None,
+            "language": item.get("original_language"),
+            "mood_id": ctx.moods.mood_id(mood_name) if mood_name else None,
+            "api_id": item.get("id")
+        })
+    return rows
+
+
+def store_page(ctx, spec, lang, page, resp, stats):
+    rows = build_rows(ctx, spec, resp.get("results", []))
+    # One write for the whole page; rows already in the table are skipped
+    inserted = upsert_batch(ctx.client, spec.table, rows, "api_id", stats)
+    print(f"✅ {spec.table} {lang} - Page {page}: {inserted} inserted, {len(rows) - inserted} skipped")
+
+
+def crawl(ctx, spec, languages=LANGUAGES, pages=range(1, 31)):
+    """Fetch and store one TMDB table; returns the IngestStats of each phase that ran."""
+    fetcher = ctx.fetcher("tmdb", TMDB_RATE)
+    checkpoint = ctx.checkpoint(spec.table)
+    today = date.today().isoformat()
+    genre_names(ctx, spec)  # fail fast, before any workers start
+
+    def process_page(unit, stats):
+        lang, page = unit
+        resp = fetcher.get_json(discover_url(spec, lang, page))
+        if not resp:
+            print(f"⚠️ Skipping page {page} for language {lang} due to repeated failures")
+            return False
+        store_page(ctx, spec, lang, page, resp, stats)
+
+    def process_language_since(lang, stats):
+        last_run = date.fromisoformat(checkpoint.watermark(f"{spec.table}:{lang}"))
+        since = (last_run - timedelta(days=INCREMENTAL_OVERLAP_DAYS)).isoformat()
+        page = 1
+        while True:
+            resp = fetcher.get_json(discover_url(spec, lang, page, since))
+            if not resp:
+                print(f"⚠️ Stopping {lang} at page {page} due to repeated failures")
+                return False
+            store_page(ctx, spec, lang, page, resp, stats)
+            if page >= min(resp.get("total_pages") or 1, MAX_TMDB_PAGES):
+                break
+            page += 1
+        checkpoint.set_watermark(f"{spec.table}:{lang}", today)
+
+    # Languages without a watermark yet always get a full crawl
+    incremental = [lang for lang in languages if ctx.incremental and checkpoint.watermark(f"{spec.table}:{lang}")]
+    full = [lang for lang in languages if lang not in incremental]
+    results = []
+
+    # Pages are fetched and stored concurrently; the fetcher's token bucket replaces fixed sleeps.
+    # Finished units are checkpointed, so an interrupted run picks up where it stopped.
+    if full:
+        print(f"Fetching {spec.table} in languages: {', '.join(full)}")
+        units = [(lang, page) for lang in full for page in pages]
+        stats = run_source(spec.table, units, process_page, ctx.workers, checkpoint)
+        if not stats.failed:
+            for lang in full:
+                checkpoint.set_watermark(f"{spec.table}:{lang}", today)
+        results.append(stats)
+
+    if incremental:
+        print(f"Fetching {spec.table} released since the last run in: {', '.join(incremental)}")
+        results.append(run_source(
+            f"{spec.table}:incremental", incremental, process_language_since, ctx.workers, checkpoint
+        ))
+    return results
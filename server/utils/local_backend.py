@@ -0,0 +1,545 @@
+import asyncio
+import hashlib
+import os
+import random
+import re
+import secrets
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+from httpx import QueryParams
+
+from utils.auth_tokens import LOCAL_JWT_SECRET, encode_token
+
+# Stand-in for the Supabase project: the same tables, queried through the same
+# table(...).select(...).eq(...).execute() shape as supabase-py, backed by SQLite.
+# Selected with SUP_BACKEND=local (see utils/sup_client.py).
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS moods (
+    mood_id INTEGER PRIMARY KEY,
+    mood_name TEXT UNIQUE NOT NULL
+);
+CREATE TABLE IF NOT EXISTS movies (
+    movie_id INTEGER PRIMARY KEY,
+    api_id INTEGER UNIQUE,
+    title TEXT,
+    genre TEXT,
+    release_year INTEGER,
+    language TEXT,
+    mood_id INTEGER
+);
+CREATE TABLE IF NOT EXISTS series (
+    series_id INTEGER PRIMARY KEY,
+    api_id INTEGER UNIQUE,
+    title TEXT,
+    genre TEXT,
+    release_year INTEGER,
+    language TEXT,
+    mood_id INTEGER
+);
+CREATE TABLE IF NOT EXISTS songs (
+    song_id INTEGER PRIMARY KEY,
+    deezer_id TEXT UNIQUE,
+    title TEXT,
+    artist TEXT,
+    release_year INTEGER,
+    tempo REAL,
+    valence REAL,
+    energy REAL,
+    mood_id INTEGER
+);
+CREATE TABLE IF NOT EXISTS activity_logs (
+    id INTEGER PRIMARY KEY,
+    user_id TEXT,
+    user_email TEXT,
+    action TEXT,
+    mood TEXT,
+    created_at TEXT
+);
+CREATE INDEX IF NOT EXISTS movies_mood ON movies (mood_id, language, api_id);
+CREATE INDEX IF NOT EXISTS series_mood ON series (mood_id, language, api_id);
+CREATE INDEX IF NOT EXISTS songs_mood ON songs (mood_id, deezer_id);
+CREATE INDEX IF NOT EXISTS activity_user ON activity_logs (user_id, created_at);
+CREATE INDEX IF NOT EXISTS activity_email ON activity_logs (user_email, created_at);
+CREATE TABLE IF NOT EXISTS auth_users (
+    id TEXT PRIMARY KEY,
+    email TEXT UNIQUE NOT NULL,
+    password_hash TEXT NOT NULL,
+    created_at TEXT
+);
+CREATE TABLE IF NOT EXISTS auth_refresh_tokens (
+    token TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    revoked INTEGER NOT NULL DEFAULT 0,
+    created_at TEXT
+);
+"""
+
+ACCESS_TOKEN_SECONDS = 3600  # Supabase's default access token lifetime
+
+MOOD_NAMES = [
+    "Happy / Joyful", "Sad / Melancholic", "Romantic / Love", "Energetic / Excited",
+    "Calm / Relaxed / Chill", "Serious / Thoughtful", "Scary / Fearful / Dark",
+    "Motivational / Inspirational",
+]
+
+_IDENT_RE = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+# One condition of a PostgREST logic tree: column.operator.value, value optionally double-quoted
+_OR_TERM_RE = re.compile(r'\s*(\w+)\.(eq|neq|gt|gte|lt|lte|like|ilike)\.("(?:[^"\\]|\\.)*"|[^,]*)\s*(?:,|$)')
+_OPERATORS = {"eq": "=", "neq": "!=", "gt": ">", "gte": ">=", "lt": "<", "lte": "<=",
+              "like": "LIKE", "ilike": "LIKE"}
+
+
+class LocalAPIError(Exception):
+    """Raised where PostgREST would answer with an error."""
+
+
+def _ident(name):
+    name = name.strip()
+    if not _IDENT_RE.match(name):
+        raise LocalAPIError(f"Invalid column name: {name!r}")
+    return name
+
+
+def _pattern(value):
+    # PostgREST accepts * as well as % as the wildcard
+    return str(value).replace("*", "%")
+
+
+class _Response:
+    def __init__(self, data):
+        self.data = data
+        self.count = None
+
+
+class LocalQuery:
+    """Chainable query on one table, mirroring the supabase-py builder methods the app uses."""
+
+    def __init__(self, client, table):
+        self._client = client
+        self._table = _ident(table)
+        self._op = "select"
+        self._columns = "*"
+        self._count = None
+        self._where = []
+        self._params = []
+        self._order = []
+        self._limit = None
+        self._offset = None
+        self._payload = None
+        self._ignore_duplicates = False
+        # PostgREST query string options the builders have no argument for, e.g. on_conflict
+        self.params = QueryParams()
+
+    def select(self, columns="*", count=None):
+        self._columns = columns
+        self._count = count  # "exact" etc.: the response's count is the number of matching rows
+        return self
+
+    def _filter(self, column, op, value):
+        if op in ("like", "ilike"):
+            value = _pattern(value)
+        self._where.append(f"{_ident(column)} {_OPERATORS[op]} ?")
+        self._params.append(value)
+        return self
+
+    def eq(self, column, value):
+        return self._filter(column, "eq", value)
+
+    def neq(self, column, value):
+        return self._filter(column, "neq", value)
+
+    def gt(self, column, value):
+        return self._filter(column, "gt", value)
+
+    def gte(self, column, value):
+        return self._filter(column, "gte", value)
+
+    def lt(self, column, value):
+        return self._filter(column, "lt", value)
+
+    def lte(self, column, value):
+        return self._filter(column, "lte", value)
+
+    def like(self, column, pattern):
+        # SQLite's LIKE ignores ASCII case, so like and ilike only differ on Supabase
+        return self._filter(column, "like", pattern)
+
+    def ilike(self, column, pattern):
+        return self._filter(column, "ilike", pattern)
+
+    def in_(self, column, values):
+        values = list(values)
+        if not values:
+            self._where.append("0")
+            return self
+        self._where.append(f"{_ident(column)} IN ({', '.join('?' * len(values))})")
+        self._params.extend(values)
+        return self
+
+    def or_(self, filters):
+        terms, params, pos = [], [], 0
+        while pos < len(filters):
+            match = _OR_TERM_RE.match(filters, pos)
+            if not match or match.end() == pos:
+                raise LocalAPIError(f"Could not parse filter: {filters!r}")
+            column, op, value = match.groups()
+            if value.startswith('"'):
+                value = re.sub(r"\\(.)", r"\1", value[1:-1])
+            terms.append(f"{_ident(column)} {_OPERATORS[op]} ?")
+            params.append(_pattern(value) if op in ("like", "ilike") else value)
+            pos = match.end()
+        self._where.append("(" + " OR ".join(terms) + ")")
+        self._params.extend(params)
+        return self
+
+    def order(self, column, desc=False, nullsfirst=None):
+        column = _ident(column)
+        # Postgres puts NULLs last ascending and first descending
+        nulls_first = desc if nullsfirst is None else nullsfirst
+        self._order.append(f"{column} IS NULL {'DESC' if nulls_first else 'ASC'}, {column} {'DESC' if desc else 'ASC'}")
+        return self
+
+    def limit(self, size):
+        self._limit = size
+        return self
+
+    def range(self, start, end):
+        self._offset = start
+        self._limit = end - start + 1
+        return self
+
+    # Same keyword arguments as postgrest-py 0.10, so code that passes one it lacks fails here too
+    def insert(self, rows, *, count=None, returning=None, upsert=False):
+        self._op = "upsert" if upsert else "insert"
+        self._payload = rows if isinstance(rows, list) else [rows]
+        return self
+
+    def upsert(self, rows, *, count=None, returning=None, ignore_duplicates=False):
+        self._op = "upsert"
+        self._payload = rows if isinstance(rows, list) else [rows]
+        self._ignore_duplicates = ignore_duplicates
+        return self
+
+    def execute(self):
+        self._client.simulate_latency()
+        return self.run()
+
+    def run(self):
+        """execute() without the simulated round trip."""
+        with self._client.lock:
+            if self._op == "select":
+                response = _Response(self._select())
+                if self._count:
+                    response.count = self._total()
+                return response
+            return _Response(self._write())
+
+    def _select(self):
+        columns = self._columns.strip()
+        projection = "*" if columns == "*" else ", ".join(_ident(c) for c in columns.split(","))
+        sql = f"SELECT {projection} FROM {self._table}"
+        if self._where:
+            sql += " WHERE " + " AND ".join(self._where)
+        if self._order:
+            sql += " ORDER BY " + ", ".join(self._order)
+        if self._limit is not None or self._offset is not None:
+            sql += " LIMIT ? OFFSET ?"
+            params = self._params + [-1 if self._limit is None else self._limit, self._offset or 0]
+        else:
+            params = self._params
+        try:
+            return [dict(row) for row in self._client.conn.execute(sql, params)]
+        except sqlite3.Error as e:
+            raise LocalAPIError(str(e)) from e
+
+    def _total(self):
+        sql = f"SELECT COUNT(*) FROM {self._table}"
+        if self._where:
+            sql += " WHERE " + " AND ".join(self._where)
+        try:
+            return self._client.conn.execute(sql, self._params).fetchone()[0]
+        except sqlite3.Error as e:
+            raise LocalAPIError(str(e)) from e
+
+    def _write(self):
+        if not self._payload:
+            return []
+        if self._table == "activity_logs":
+            now = datetime.now(timezone.utc).isoformat()
+            self._payload = [dict(row, created_at=row.get("created_at") or now) for row in self._payload]
+        columns = [_ident(c) for c in self._payload[0]]
+        sql = f"INSERT INTO {self._table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+        if self._op == "upsert":
+            # Without ?on_conflict= PostgREST resolves conflicts on the primary key
+            on_conflict = self.params.get("on_conflict") or self._primary_key()
+            keys = ", ".join(_ident(c) for c in on_conflict.split(","))
+            updates = ", ".join(f"{c} = excluded.{c}" for c in columns)
+            if self._ignore_duplicates or not updates:
+                sql += f" ON CONFLICT ({keys}) DO NOTHING"
+            else:
+                sql += f" ON CONFLICT ({keys}) DO UPDATE SET {updates}"
+        sql += " RETURNING *"
+        written = []
+        try:
+            with self._client.conn:
+                for row in self._payload:
+                    written += [dict(r) for r in self._client.conn.execute(sql, [row.get(c) for c in columns])]
+        except sqlite3.Error as e:
+            raise LocalAPIError(str(e)) from e
+        return written
+
+    def _primary_key(self):
+        rows = self._client.conn.execute(f"PRAGMA table_info({self._table})").fetchall()
+        return ",".join(row[1] for row in sorted(rows, key=lambda row: row[5]) if row[5])
+
+
+def _hash_password(password, salt):
+    return hashlib.pbkdf2_hmac("sha256", password.encode(), salt.encode(), 10000).hex()
+
+
+class LocalAuth:
+    """Email/password sign-up, sign-in and session refresh with the supabase-py (gotrue) call shapes.
+
+    Access tokens are HS256 JWTs signed like Supabase's (SUP_JWT_SECRET, or a
+    fixed local secret), so utils/auth_tokens.py verifies them the same way.
+    Refresh tokens are single use. Nothing here is meant to be secure.
+    """
+
+    def __init__(self, client, secret=None, expires_in=ACCESS_TOKEN_SECONDS):
+        self._client = client
+        self.secret = secret or os.getenv("SUP_JWT_SECRET") or LOCAL_JWT_SECRET
+        self.expires_in = expires_in
+
+    def _session(self, user):
+        now = int(time.time())
+        claims = {"sub": user.id, "email": user.email, "aud": "authenticated", "role": "authenticated",
+                  "iat": now, "exp": now + self.expires_in}
+        refresh_token = secrets.token_urlsafe(24)
+        with self._client.lock, self._client.conn:
+            self._client.conn.execute(
+                "INSERT INTO auth_refresh_tokens (token, user_id, created_at) VALUES (?, ?, ?)",
+                (refresh_token, user.id, datetime.now(timezone.utc).isoformat()),
+            )
+        return SimpleNamespace(
+            access_token=encode_token(claims, self.secret),
+            refresh_token=refresh_token,
+            token_type="bearer",
+            expires_in=self.expires_in,
+            expires_at=claims["exp"],
+            user=user,
+        )
+
+    def sign_up(self, credentials):
+        self._client.simulate_latency()
+        return self._sign_up(credentials)
+
+    def _sign_up(self, credentials):
+        email, password = credentials["email"], credentials["password"]
+        user_id = secrets.token_hex(16)
+        salt = secrets.token_hex(8)
+        try:
+            with self._client.lock, self._client.conn:
+                self._client.conn.execute(
+                    "INSERT INTO auth_users (id, email, password_hash, created_at) VALUES (?, ?, ?, ?)",
+                    (user_id, email, f"{salt}${_hash_password(password, salt)}",
+                     datetime.now(timezone.utc).isoformat()),
+                )
+        except sqlite3.IntegrityError:
+            raise LocalAPIError("User already registered")
+        user = SimpleNamespace(id=user_id, email=email)
+        return SimpleNamespace(user=user, session=self._session(user))
+
+    def sign_in_with_password(self, credentials):
+        self._client.simulate_latency()
+        return self._sign_in_with_password(credentials)
+
+    def _sign_in_with_password(self, credentials):
+        email, password = credentials["email"], credentials["password"]
+        with self._client.lock:
+            row = self._client.conn.execute(
+                "SELECT id, email, password_hash FROM auth_users WHERE email = ?", (email,)
+            ).fetchone()
+        if row:
+            salt, digest = row["password_hash"].split("$", 1)
+            if secrets.compare_digest(digest, _hash_password(password, salt)):
+                user = SimpleNamespace(id=row["id"], email=row["email"])
+                return SimpleNamespace(user=user, session=self._session(user))
+        raise LocalAPIError("Invalid login credentials")
+
+    def refresh_session(self, refresh_token):
+        self._client.simulate_latency()
+        return self._refresh_session(refresh_token)
+
+    def _refresh_session(self, refresh_token):
+        with self._client.lock, self._client.conn:
+            row = self._client.conn.execute(
+                "SELECT u.id, u.email FROM auth_refresh_tokens t JOIN auth_users u ON u.id = t.user_id "
+                "WHERE t.token = ? AND t.revoked = 0", (refresh_token,)
+            ).fetchone()
+            if row is None:
+                raise LocalAPIError("Invalid Refresh Token")
+            self._client.conn.execute("UPDATE auth_refresh_tokens SET revoked = 1 WHERE token = ?", (refresh_token,))
+        user = SimpleNamespace(id=row["id"], email=row["email"])
+        return SimpleNamespace(user=user, session=self._session(user))
+
+
+class LocalClient:
+    """SQLite-backed client with the subset of the supabase-py API this app uses.
+
+    `path` is a database file, or ":memory:" for a throwaway one. Every
+    execute() and auth call first sleeps `latency` seconds (plus up to
+    `jitter` more) to stand in for the network round trip to Supabase.
+    """
+
+    def __init__(self, path=":memory:", latency=0.0, jitter=0.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.lock = threading.RLock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        if path != ":memory:":
+            # Several gunicorn workers may share one database file
+            self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+        self.auth = LocalAuth(self)
+
+    def table(self, name):
+        return LocalQuery(self, name)
+
+    def round_trip(self):
+        return self.latency + (random.uniform(0, self.jitter) if self.jitter else 0)
+
+    def simulate_latency(self):
+        delay = self.round_trip()
+        if delay > 0:
+            time.sleep(delay)
+
+
+class AsyncLocalQuery:
+    """A LocalQuery whose execute() is a coroutine that awaits the simulated round trip."""
+
+    def __init__(self, query):
+        self._query = query
+
+    def __getattr__(self, name):
+        method = getattr(self._query, name)
+
+        def build(*args, **kwargs):
+            method(*args, **kwargs)
+            return self
+        return build
+
+    async def execute(self):
+        delay = self._query._client.round_trip()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return self._query.run()
+
+
+class AsyncLocalAuth:
+    def __init__(self, client):
+        self._client = client
+
+    async def _call(self, method, *args):
+        delay = self._client.round_trip()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        # Password hashing takes a few ms of CPU: keep it off the event loop
+        return await asyncio.to_thread(method, *args)
+
+    async def sign_up(self, credentials):
+        return await self._call(self._client.auth._sign_up, credentials)
+
+    async def sign_in_with_password(self, credentials):
+        return await self._call(self._client.auth._sign_in_with_password, credentials)
+
+    async def refresh_session(self, refresh_token):
+        return await self._call(self._client.auth._refresh_session, refresh_token)
+
+
+class AsyncLocalClient:
+    """Async view of a LocalClient (same database), with the shape of utils.async_supabase.AsyncSupabase.
+
+    The simulated round trips are awaited instead of slept through, so they
+    do not hold a thread; the SQLite work itself still runs inline.
+    """
+
+    def __init__(self, client):
+        self._client = client
+        self.auth = AsyncLocalAuth(client)
+
+    def table(self, name):
+        return AsyncLocalQuery(self._client.table(name))
+
+    async def aclose(self):
+        pass
+
+
+def seed_catalog(client, movies=5000, series=2000, songs=5000, seed=0):
+    """Fill an empty local database with the moods and a synthetic catalog of the given size."""
+    from utils.insert_tmdb import GENRE_MOODS, LANGUAGES
+    from utils.song_features import classify_moods
+
+    rng = random.Random(seed)
+    existing = client.table("moods").select("mood_id").limit(1).execute().data
+    if existing:
+        return
+    mood_rows = client.table("moods").insert([{"mood_name": name} for name in MOOD_NAMES]).execute().data
+    mood_ids = {row["mood_name"]: row["mood_id"] for row in mood_rows}
+    genres = list(GENRE_MOODS)
+
+    def tmdb_rows(count, first_key, label):
+        rows = []
+        for i in range(count):
+            genre = rng.choice(genres)
+            rows.append({
+                "api_id": first_key + i,
+                "title": f"{label} {i}",
+                "genre": genre,
+                "release_year": rng.randint(1970, 2025),
+                "language": rng.choice(LANGUAGES),
+                "mood_id": mood_ids.get(GENRE_MOODS[genre]),
+            })
+        return rows
+
+    valence = [round(rng.random(), 3) for _ in range(songs)]
+    energy = [round(rng.random(), 3) for _ in range(songs)]
+    tempo = [round(rng.uniform(60, 200), 1) for _ in range(songs)]
+    song_moods = classify_moods(valence, energy, tempo) if songs else []
+    song_rows = [{
+        "deezer_id": str(100000 + i),
+        "title": f"Song {i}",
+        "artist": f"Artist {i % 500}",
+        "release_year": rng.randint(1970, 2025),
+        "tempo": tempo[i],
+        "valence": valence[i],
+        "energy": energy[i],
+        # Exact names, like insert_songs: "Thoughtful / Calm" songs get no mood_id there either
+        "mood_id": mood_ids.get(song_moods[i]),
+    } for i in range(songs)]
+
+    latency, client.latency = client.latency, 0.0
+    try:
+        client.table("movies").insert(tmdb_rows(movies, 1, "Movie")).execute()
+        client.table("series").insert(tmdb_rows(series, 1, "Series")).execute()
+        client.table("songs").insert(song_rows).execute()
+    finally:
+        client.latency = latency
+
+
+def create_local_client():
+    """The local client configured from SUP_LOCAL_* environment variables."""
+    client = LocalClient(
+        os.getenv("SUP_LOCAL_DB", ":memory:"),
+        latency=float(os.getenv("SUP_LOCAL_LATENCY_MS", 0)) / 1000,
+        jitter=float(os.getenv("SUP_LOCAL_JITTER_MS", 0)) / 1000,
+    )
+    size = int(os.getenv("SUP_LOCAL_SEED", 0))
+    if size:
+        seed_catalog(client, movies=size, series=size // 2, songs=size)
+    return client
@@ -0,0 +1,282 @@
+import contextvars
+import os
+import sys
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+from contextlib import contextmanager
+
+# Histogram bucket upper bounds, in seconds
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21)
+
+# Opt-in sampling profiler: requests slower than PROFILE_SLOW_MS get their stacks dumped
+PROFILE_SLOW_MS = float(os.getenv("PROFILE_SLOW_MS", 0))
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", 5))
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(os.path.dirname(__file__), ".profiles"))
+
+
+def _label_text(labels):
+    if not labels:
+        return ""
+    escaped = (
+        f'{k}="' + str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+        for k, v in labels
+    )
+    return "{" + ",".join(escaped) + "}"
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Registry:
+    """Counters and histograms rendered in the Prometheus text format.
+
+    Metrics are per process: under gunicorn each worker exposes its own.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}  # name -> {labels: value}
+        self._histograms = {}  # name -> {labels: Histogram}
+        self._help = {}
+        self._collectors = []
+
+    def describe(self, name, text):
+        self._help[name] = text
+
+    def inc(self, name, value=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name, value, buckets=LATENCY_BUCKETS, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            hist = series.get(key)
+            if hist is None:
+                hist = series[key] = Histogram(buckets)
+            hist.observe(value)
+
+    def add_collector(self, collect):
+        """`collect()` returns {gauge name: value} read at scrape time."""
+        self._collectors.append(collect)
+
+    def render(self):
+        lines = []
+        with self._lock:
+            for name, series in sorted(self._counters.items()):
+                self._header(lines, name, "counter")
+                for labels, value in sorted(series.items()):
+                    lines.append(f"{name}{_label_text(labels)} {value}")
+            for name, series in sorted(self._histograms.items()):
+                self._header(lines, name, "histogram")
+                for labels, hist in sorted(series.items()):
+                    cumulative = 0
+                    for bound, count in zip(list(hist.buckets) + ["+Inf"], hist.counts):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{_label_text(labels + (('le', bound),))} {cumulative}")
+                    lines.append(f"{name}_sum{_label_text(labels)} {hist.sum}")
+                    lines.append(f"{name}_count{_label_text(labels)} {hist.count}")
+        for collect in self._collectors:
+            try:
+                gauges = collect()
+            except Exception as e:
+                print("Metrics collector failed:", e)
+                continue
+            for name, value in sorted(gauges.items()):
+                self._header(lines, name, "gauge")
+                lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+    def _header(self, lines, name, kind):
+        if name in self._help:
+            lines.append(f"# HELP {name} {self._help[name]}")
+        lines.append(f"# TYPE {name} {kind}")
+
+
+metrics = Registry()
+metrics.describe("moodmuse_request_seconds", "Request latency by endpoint and status")
+metrics.describe("moodmuse_stage_seconds", "Time spent in each stage of a request")
+metrics.describe("moodmuse_stage_upstream_calls", "Supabase calls made in one stage of a request")
+metrics.describe("moodmuse_upstream_calls_per_request", "Supabase calls made while serving one request")
+metrics.describe("moodmuse_upstream_calls_total", "Supabase calls by kind")
+
+
+class RequestStats:
+    __slots__ = ("endpoint", "started", "upstream", "lock")
+
+    def __init__(self, endpoint):
+        self.endpoint = endpoint
+        self.started = time.perf_counter()
+        self.upstream = 0
+        self.lock = threading.Lock()
+
+
+# Set for the duration of a request; copied into worker threads with contextvars.copy_context()
+_current = contextvars.ContextVar("request_stats", default=None)
+# Upstream calls made inside the innermost open span
+_span_calls = contextvars.ContextVar("span_calls", default=None)
+
+
+@contextmanager
+def span(stage):
+    """Time a block of request handling into moodmuse_stage_seconds{stage=...}.
+
+    Inside a request, the Supabase calls made in the block are counted into
+    moodmuse_stage_upstream_calls{stage=...} as well.
+    """
+    in_request = _current.get() is not None
+    calls = [0]
+    token = _span_calls.set(calls)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.observe("moodmuse_stage_seconds", time.perf_counter() - started, stage=stage)
+        _span_calls.reset(token)
+        if in_request:
+            metrics.observe("moodmuse_stage_upstream_calls", calls[0], buckets=COUNT_BUCKETS, stage=stage)
+
+
+def count_upstream(kind):
+    """Record one Supabase call, for the totals and for the current request if there is one."""
+    metrics.inc("moodmuse_upstream_calls_total", kind=kind)
+    calls = _span_calls.get()
+    if calls is not None:
+        calls[0] += 1
+    stats = _current.get()
+    if stats is not None:
+        with stats.lock:
+            stats.upstream += 1
+
+
+class SamplingProfiler:
+    """Samples the stacks of threads serving requests every `interval` seconds.
+
+    Only runs when PROFILE_SLOW_MS is set. Stacks of a request slower than the
+    threshold are written to PROFILE_DIR in the collapsed "frame;frame;frame
+    count" format that flamegraph.pl and speedscope read.
+    """
+
+    def __init__(self, interval, out_dir):
+        self.interval = interval
+        self.out_dir = out_dir
+        self._lock = threading.Lock()
+        self._active = {}  # thread id -> Counter of collapsed stacks
+        self._thread = None
+
+    def begin(self):
+        with self._lock:
+            self._active[threading.get_ident()] = Counter()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+
+    def end(self):
+        with self._lock:
+            return self._active.pop(threading.get_ident(), None)
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            frames = sys._current_frames()
+            with self._lock:
+                for ident, samples in self._active.items():
+                    frame = frames.get(ident)
+                    stack = []
+                    while frame is not None:
+                        code = frame.f_code
+                        stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                        frame = frame.f_back
+                    if stack:
+                        samples[";".join(reversed(stack))] += 1
+
+    def dump(self, samples, endpoint, elapsed_ms):
+        os.makedirs(self.out_dir, exist_ok=True)
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}-{endpoint}-{elapsed_ms:.0f}ms-{os.getpid()}.folded"
+        path = os.path.join(self.out_dir, name.replace("/", "_"))
+        with open(path, "w") as f:
+            for stack, count in samples.most_common():
+                f.write(f"{stack} {count}\n")
+        return path
+
+
+profiler = SamplingProfiler(PROFILE_INTERVAL_MS / 1000, PROFILE_DIR) if PROFILE_SLOW_MS > 0 else None
+
+
+def instrument(app):
+    """Time every request of `app` and count its upstream calls."""
+    from flask import request
+
+    @app.before_request
+    def _start_request():
+        request.environ["moodmuse.stats_token"] = _current.set(RequestStats(request.endpoint or "unknown"))
+        if profiler:
+            profiler.begin()
+
+    @app.after_request
+    def _finish_request(response):
+        token = request.environ.pop("moodmuse.stats_token", None)
+        stats = _current.get()
+        if token is None or stats is None:
+            return response
+        elapsed = time.perf_counter() - stats.started
+        metrics.observe("moodmuse_request_seconds", elapsed,
+                        endpoint=stats.endpoint, method=request.method, status=response.status_code)
+        metrics.observe("moodmuse_upstream_calls_per_request", stats.upstream, buckets=COUNT_BUCKETS,
+                        endpoint=stats.endpoint)
+        _current.reset(token)
+        if profiler:
+            samples = profiler.end()
+            if samples and elapsed * 1000 >= PROFILE_SLOW_MS:
+                path = profiler.dump(samples, stats.endpoint, elapsed * 1000)
+                print(f"Slow request {stats.endpoint} ({elapsed * 1000:.0f} ms), stacks in {path}")
+        return response
+
+
+def instrument_asgi(app):
+    """ASGI middleware doing for asgi.py what instrument() does for the Flask app.
+
+    Endpoints are labelled module.function of the route handler, e.g.
+    "async_home.recommend_content". The sampling profiler is thread based and
+    does not apply here.
+    """
+    async def middleware(scope, receive, send):
+        if scope["type"] != "http":
+            return await app(scope, receive, send)
+        stats = RequestStats("unknown")
+        token = _current.set(stats)
+        status = [500]
+
+        async def send_status(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        try:
+            await app(scope, receive, send_status)
+        finally:
+            handler = scope.get("endpoint")
+            if handler is not None:
+                stats.endpoint = f"{handler.__module__.rsplit('.', 1)[-1]}.{handler.__name__}"
+            elapsed = time.perf_counter() - stats.started
+            metrics.observe("moodmuse_request_seconds", elapsed,
+                            endpoint=stats.endpoint, method=scope["method"], status=status[0])
+            metrics.observe("moodmuse_upstream_calls_per_request", stats.upstream, buckets=COUNT_BUCKETS,
+                            endpoint=stats.endpoint)
+            _current.reset(token)
+    return middleware
@@ -1,6 +1,8 @@
 import os
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor
 from openai import OpenAI
-from difflib import get_close_matches
 
 client = OpenAI(api_key=os.getenv("OPEN_AI_KEY"))
 
@@ -15,100 +17,216 @@ pre_moods = [
     "Motivational / Inspirational"
 ]
 
-import re
+mood_keywords = {
+    "Happy / Joyful": [
+        "happy", "joy", "joyful", "delighted", "smile", "laugh", "cheerful",
+        "great", "good", "amazing", "awesome", "excited", "fun", "positive",
+        "blissful", "content", "ecstatic", "elated", "gleeful", "jubilant",
+        "merry", "overjoyed", "pleasant", "satisfied", "thrilled", "upbeat",
+        "vibrant", "euphoric", "sunny", "jolly", "radiant", "peppy",
+        "buoyant", "optimistic", "hopeful", "sparkling", "bright", "lighthearted",
+        "cheery", "playful", "grinning", "beaming", "chirpy", "lively",
+        "exhilarated", "contented", "fortunate", "blessed", "rejoicing", "joyous",
+        "delightful", "festive", "sparkly", "chirping", "thrilled", "tickled",
+        "bubbly", "jovial", "effervescent", "gleaming", "smiley"
+    ],
+    "Sad / Melancholic": [
+        "sad", "depressed", "cry", "crying", "tears", "lonely", "down",
+        "heartbroken", "gloomy", "upset", "bad", "hurt", "hopeless",
+        "miserable", "unhappy", "melancholy", "blue", "sorrowful", "grief",
+        "despondent", "forlorn", "wistful", "pensive", "somber", "mourning",
+        "dejected", "disheartened", "downcast", "disappointed", "tragic",
+        "anguished", "woeful", "lamenting", "glum", "crestfallen", "mournful",
+        "dispirited", "heavyhearted", "heartache", "pain", "distressed",
+        "desolate", "loneliness", "sadness", "hopelessness", "downhearted",
+        "regretful", "bluehearted", "morose", "dreary", "troubled", "aching",
+        "grieving", "sullen", "unfortunate", "painful", "tearful", "brokenhearted"
+    ],
+    "Romantic / Love": [
+        "love", "romantic", "heart", "crush", "affection", "caring", "sweet",
+        "admire", "couple", "date", "relationship", "beautiful", "cute",
+        "adorable", "beloved", "passion", "tender", "intimate", "darling",
+        "honey", "sweetheart", "romance", "boyfriend", "girlfriend", "partner",
+        "flirt", "flirty", "devoted", "fondness", "enamored", "amour",
+        "smitten", "cherish", "kiss", "hug", "hugging", "cuddle", "cuddling",
+        "affectionate", "loving", "together", "bond", "relationshipgoals",
+        "adore", "sweetie", "bae", "darling", "romantically", "passionate",
+        "loveable", "lover", "crushes", "heartfelt", "soulmate", "amorous"
+    ],
+    "Energetic / Excited": [
+        "energetic", "excited", "pumped", "hyped", "ready", "motivated",
+        "thrilled", "dynamic", "active", "powerful", "alive", "charged",
+        "lively", "spirited", "vivacious", "bubbly", "exhilarated", "enthusiastic",
+        "firedup", "vibrant", "eager", "sparked", "amped", "zestful", "alert",
+        "peppy", "highspirited", "electrified", "galvanized", "euphoric", "energetically",
+        "onfire", "adrenaline", "bursting", "vigorous", "motivating", "readytoroll",
+        "fullthrottle", "driven", "exciting", "elated", "upbeat", "hyper", "jubilant"
+    ],
+    "Calm / Relaxed / Chill": [
+        "calm", "relaxed", "peaceful", "chill", "soothing", "gentle", "cozy",
+        "comfortable", "tranquil", "easygoing", "rest", "slow",
+        "serene", "unwind", "laidback", "composed", "quiet", "soft",
+        "mellow", "placid", "content", "balanced", "restful", "light",
+        "leisurely", "carefree", "smooth", "hushed", "pacified", "gentlehearted",
+        "zen", "meditative", "cool", "harmonious", "relieving", "quietude",
+        "blissful", "soothed", "untroubled", "placidly", "peaceably",
+        "softspoken", "tranquilized", "serenity", "relaxing", "easygoingly"
+    ],
+    "Serious / Thoughtful": [
+        "serious", "thinking", "thoughtful", "deep", "focus", "reflect",
+        "pensive", "philosophical", "quiet", "introspective", "study", "concentrate",
+        "contemplative", "meditative", "analytical", "cerebral", "reasoning", "mindful",
+        "deliberate", "considerate", "inward", "brooding", "ruminative", "scholarly",
+        "reflective", "pondering", "cogitative", "attentive", "examining", "careful",
+        "alert", "observant", "thoughtfully", "judicious", "evaluative", "disciplined",
+        "serenity", "mindfulthinking", "seriously", "intellectual", "studious",
+        "cognitive", "mindset", "insightful", "logical", "focused", "concentration"
+    ],
+    "Scary / Fearful / Dark": [
+        "scared", "fear", "dark", "terrified", "horror", "nervous",
+        "afraid", "panic", "creepy", "tense", "ghost", "nightmare",
+        "frightened", "alarmed", "dread", "spooked", "anxious", "uneasy",
+        "phobic", "haunted", "ominous", "grim", "threatened", "menacing",
+        "apprehensive", "shaken", "startled", "shivery", "jumpy", "paranoid",
+        "suspenseful", "macabre", "chilling", "bloodcurdling", "gory", "darkness",
+        "terrifying", "fearful", "horrifying", "creepycrawlies", "panicstricken",
+        "haunting", "spinechilling", "grimdark", "foreboding", "disturbing"
+    ],
+    "Motivational / Inspirational": [
+        "motivate", "motivated", "inspired", "goal", "dream", "success",
+        "determined", "focus", "ambition", "dedicated", "driven", "positive", "confidence",
+        "encouraged", "empowered", "uplifted", "aspire", "achievement", "courage",
+        "resilient", "perseverance", "persistent", "goaloriented", "vision", "hope",
+        "optimistic", "energetic", "enthusiastic", "ambitious", "fearless", "strong",
+        "hardworking", "dedication", "tenacious", "winning", "overcome", "inspirational",
+        "leader", "trailblazer", "motivating", "commitment", "successdriven", "determination",
+        "selfbelief", "confident", "proactive", "empower", "uplifting", "focusongoals"
+    ]
+}
+
+# Keywords match as word prefixes ("happ" matches "happiness"), so every keyword
+# is folded into one character trie at import time. A token then needs a single
+# walk down the trie instead of one regex search per keyword.
+_WORD_RE = re.compile(r"\w+")
+_TRIE_END = ""  # node key holding the indices of moods whose keyword ends here
+
+
+def _build_keyword_trie(keywords_by_mood):
+    moods = list(keywords_by_mood)
+    trie = {}
+    for idx, mood in enumerate(moods):
+        for kw in keywords_by_mood[mood]:
+            node = trie
+            for ch in kw:
+                node = node.setdefault(ch, {})
+            hits = node.setdefault(_TRIE_END, [])
+            if idx not in hits:
+                hits.append(idx)
+    return moods, trie
+
+
+_MOODS, _KEYWORD_TRIE = _build_keyword_trie(mood_keywords)
+
+
+def _token_matches(token):
+    """Yield the index of every mood with a keyword that prefixes `token`."""
+    node = _KEYWORD_TRIE
+    for ch in token:
+        node = node.get(ch)
+        if node is None:
+            return
+        hits = node.get(_TRIE_END)
+        if hits:
+            yield from hits
+
 
 def extract_mood(user_text: str) -> str:
-    text = user_text.lower().strip()
-    mood_keywords = {
-        "Happy / Joyful": [
-            "happy", "joy", "joyful", "delighted", "smile", "laugh", "cheerful",
-            "great", "good", "amazing", "awesome", "excited", "fun", "positive",
-            "blissful", "content", "ecstatic", "elated", "gleeful", "jubilant",
-            "merry", "overjoyed", "pleasant", "satisfied", "thrilled", "upbeat",
-            "vibrant", "euphoric", "sunny", "jolly", "radiant", "peppy",
-            "buoyant", "optimistic", "hopeful", "sparkling", "bright", "lighthearted",
-            "cheery", "playful", "grinning", "beaming", "chirpy", "lively",
-            "exhilarated", "contented", "fortunate", "blessed", "rejoicing", "joyous",
-            "delightful", "festive", "sparkly", "chirping", "thrilled", "tickled",
-            "bubbly", "jovial", "effervescent", "gleaming", "smiley"
-        ],
-        "Sad / Melancholic": [
-            "sad", "depressed", "cry", "crying", "tears", "lonely", "down",
-            "heartbroken", "gloomy", "upset", "bad", "hurt", "hopeless",
-            "miserable", "unhappy", "melancholy", "blue", "sorrowful", "grief",
-            "despondent", "forlorn", "wistful", "pensive", "somber", "mourning",
-            "dejected", "disheartened", "downcast", "disappointed", "tragic",
-            "anguished", "woeful", "lamenting", "glum", "crestfallen", "mournful",
-            "dispirited", "heavyhearted", "heartache", "pain", "distressed",
-            "desolate", "loneliness", "sadness", "hopelessness", "downhearted",
-            "regretful", "bluehearted", "morose", "dreary", "troubled", "aching",
-            "grieving", "sullen", "unfortunate", "painful", "tearful", "brokenhearted"
-        ],
-        "Romantic / Love": [
-            "love", "romantic", "heart", "crush", "affection", "caring", "sweet",
-            "admire", "couple", "date", "relationship", "beautiful", "cute",
-            "adorable", "beloved", "passion", "tender", "intimate", "darling",
-            "honey", "sweetheart", "romance", "boyfriend", "girlfriend", "partner",
-            "flirt", "flirty", "devoted", "fondness", "enamored", "amour",
-            "smitten", "cherish", "kiss", "hug", "hugging", "cuddle", "cuddling",
-            "affectionate", "loving", "together", "bond", "relationshipgoals",
-            "adore", "sweetie", "bae", "darling", "romantically", "passionate",
-            "loveable", "lover", "crushes", "heartfelt", "soulmate", "amorous"
-        ],
-        "Energetic / Excited": [
-            "energetic", "excited", "pumped", "hyped", "ready", "motivated",
-            "thrilled", "dynamic", "active", "powerful", "alive", "charged",
-            "lively", "spirited", "vivacious", "bubbly", "exhilarated", "enthusiastic",
-            "firedup", "vibrant", "eager", "sparked", "amped", "zestful", "alert",
-            "peppy", "highspirited", "electrified", "galvanized", "euphoric", "energetically",
-            "onfire", "adrenaline", "bursting", "vigorous", "motivating", "readytoroll",
-            "fullthrottle", "driven", "exciting", "elated", "upbeat", "hyper", "jubilant"
-        ],
-        "Calm / Relaxed / Chill": [
-            "calm", "relaxed", "peaceful", "chill", "soothing", "gentle", "cozy",
-            "comfortable", "tranquil", "easygoing", "rest", "slow",
-            "serene", "unwind", "laidback", "composed", "quiet", "soft",
-            "mellow", "placid", "content", "balanced", "restful", "light",
-            "leisurely", "carefree", "smooth", "hushed", "pacified", "gentlehearted",
-            "zen", "meditative", "cool", "harmonious", "relieving", "quietude",
-            "blissful", "soothed", "untroubled", "placidly", "peaceably",
-            "softspoken", "tranquilized", "serenity", "relaxing", "easygoingly"
-        ],
-        "Serious / Thoughtful": [
-            "serious", "thinking", "thoughtful", "deep", "focus", "reflect",
-            "pensive", "philosophical", "quiet", "introspective", "study", "concentrate",
-            "contemplative", "meditative", "analytical", "cerebral", "reasoning", "mindful",
-            "deliberate", "considerate", "inward", "brooding", "ruminative", "scholarly",
-            "reflective", "pondering", "cogitative", "attentive", "examining", "careful",
-            "alert", "observant", "thoughtfully", "judicious", "evaluative", "disciplined",
-            "serenity", "mindfulthinking", "seriously", "intellectual", "studious",
-            "cognitive", "mindset", "insightful", "logical", "focused", "concentration"
-        ],
-        "Scary / Fearful / Dark": [
-            "scared", "fear", "dark", "terrified", "horror", "nervous",
-            "afraid", "panic", "creepy", "tense", "ghost", "nightmare",
-            "frightened", "alarmed", "dread", "spooked", "anxious", "uneasy",
-            "phobic", "haunted", "ominous", "grim", "threatened", "menacing",
-            "apprehensive", "shaken", "startled", "shivery", "jumpy", "paranoid",
-            "suspenseful", "macabre", "chilling", "bloodcurdling", "gory", "darkness",
-            "terrifying", "fearful", "horrifying", "creepycrawlies", "panicstricken",
-            "haunting", "spinechilling", "grimdark", "foreboding", "disturbing"
-        ],
-        "Motivational / Inspirational": [
-            "motivate", "motivated", "inspired", "goal", "dream", "success",
-            "determined", "focus", "ambition", "dedicated", "driven", "positive", "confidence",
-            "encouraged", "empowered", "uplifted", "aspire", "achievement", "courage",
-            "resilient", "perseverance", "persistent", "goaloriented", "vision", "hope",
-            "optimistic", "energetic", "enthusiastic", "ambitious", "fearless", "strong",
-            "hardworking", "dedication", "tenacious", "winning", "overcome", "inspirational",
-            "leader", "trailblazer", "motivating", "commitment", "successdriven", "determination",
-            "selfbelief", "confident", "proactive", "empower", "uplifting", "focusongoals"
-        ]
-    }
-    # 🔍 Match using substring logic (not exact word)
-    for mood, keywords in mood_keywords.items():
-        for kw in keywords:
-            if re.search(rf"\b{kw}\w*\b", text):  
-                return mood
-
-    return None
\ No newline at end of file
+    # 🔍 First mood (in mood_keywords order) with any keyword prefixing a word
+    best = None
+    for token in set(_WORD_RE.findall(user_text.lower())):
+        for idx in _token_matches(token):
+            if best is None or idx < best:
+                best = idx
+        if best == 0:
+            break
+
+    return _MOODS[best] if best is not None else None
+
+
+# Per-mood multiplier applied to every keyword hit in score_moods
+mood_weights = {mood: 1.0 for mood in mood_keywords}
+
+# Words that flip the next few keyword hits ("not happy", "never felt this alone").
+# "t" covers the tail of "don't" / "can't" once the apostrophe splits the word.
+NEGATIONS = {
+    "not", "no", "never", "nor", "without", "hardly", "barely", "cannot",
+    "dont", "doesnt", "didnt", "isnt", "wasnt", "arent", "cant", "wont", "aint", "t",
+}
+NEGATION_WINDOW = 2
+_CLAUSE_RE = re.compile(r"[.,;:!?\n]+")
+
+
+def score_moods(user_text: str, weights: dict = None) -> list:
+    """Rank every mood by its keyword hits in one pass over the text.
+
+    Unlike extract_mood every mood is counted, and hits within a couple of words
+    after a negation ("not happy", "don't feel scared") subtract instead of add.
+    Returns (mood, score) pairs with a positive score, best first; ties keep
+    mood_keywords order.
+    """
+    weights = weights or mood_weights
+    scores = [0.0] * len(_MOODS)
+    for clause in _CLAUSE_RE.split(user_text.lower()):
+        negated_for = 0  # negation never carries past punctuation
+        for token in _WORD_RE.findall(clause):
+            if token in NEGATIONS:
+                negated_for = NEGATION_WINDOW
+                continue
+            sign = -1.0 if negated_for else 1.0
+            for idx in set(_token_matches(token)):
+                scores[idx] += sign * weights.get(_MOODS[idx], 1.0)
+            if negated_for:
+                negated_for -= 1
+
+    ranked = [(_MOODS[idx], score) for idx, score in enumerate(scores) if score > 0]
+    ranked.sort(key=lambda item: -item[1])
+    return ranked
+
+
+# Batches at least this large may be spread over a process pool by extract_moods
+BATCH_POOL_MIN = 2000
+BATCH_WORKERS = int(os.getenv("MOOD_BATCH_WORKERS", os.cpu_count() or 1))
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=BATCH_WORKERS)
+        return _pool
+
+
+def _classify(item):
+    # Module-level so the process pool can pickle it
+    text, with_scores = item
+    if not isinstance(text, str):
+        return None, []
+    return extract_mood(text), (score_moods(text) if with_scores else [])
+
+
+def extract_moods(texts, with_scores=False, parallel=False):
+    """Yield (mood, ranked_scores) for each text, in input order.
+
+    With parallel=True, batches of BATCH_POOL_MIN or more are classified in
+    chunks on a shared process pool; smaller batches stay in-process because
+    pickling costs more than the matching itself.
+    """
+    items = ((text, with_scores) for text in texts)
+    if parallel and BATCH_WORKERS > 1 and len(texts) >= BATCH_POOL_MIN:
+        chunksize = max(64, len(texts) // (BATCH_WORKERS * 4))
+        yield from _get_pool().map(_classify, items, chunksize=chunksize)
+    else:
+        yield from map(_classify, items)
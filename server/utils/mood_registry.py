@@ -0,0 +1,117 @@
+import os
+import threading
+import time
+from difflib import get_close_matches
+
+MOOD_CACHE_TTL = int(os.getenv("MOOD_CACHE_TTL", 300))
+# After a failed reload, wait this long before asking Supabase again
+MOOD_RETRY_SECONDS = float(os.getenv("MOOD_RETRY_SECONDS", 5))
+
+
+class MoodRegistry:
+    """In-process copy of the `moods` table (a handful of rows that rarely change).
+
+    Rows are loaded on first use or via refresh(), reloaded once they are older
+    than `ttl` seconds, and can be dropped explicitly with invalidate(). One
+    thread reloads while the others keep serving the old rows, and a failed
+    reload is retried `retry_after` seconds later, not on every request.
+    Reads go through `repository` (a utils.repository.Repository), by default
+    the shared one.
+    """
+
+    def __init__(self, repository=None, ttl=MOOD_CACHE_TTL, retry_after=MOOD_RETRY_SECONDS):
+        self._repository = repository
+        self.ttl = ttl
+        self.retry_after = retry_after
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()  # held by the one thread reloading
+        self._loaded_at = None
+        self._error = None  # why the last reload failed, while nothing was ever loaded
+        self._rows = []
+        self._by_name = {}
+        self._by_key = {}  # lowercased full names and "/"-separated parts -> row
+
+    @property
+    def repository(self):
+        if self._repository is None:
+            from utils.repository import repo
+            self._repository = repo
+        return self._repository
+
+    def refresh(self):
+        return self.load(self.repository.moods())
+
+    def load(self, rows):
+        """Use `rows` as the moods table, e.g. from a catalog snapshot while Supabase is unreachable."""
+        by_key = {}
+        for row in rows:
+            name = row["mood_name"]
+            by_key.setdefault(name.lower(), row)
+            for part in name.split("/"):
+                by_key.setdefault(part.strip().lower(), row)
+
+        with self._lock:
+            self._rows = rows
+            self._by_name = {row["mood_name"]: row for row in rows}
+            self._by_key = by_key
+            self._loaded_at = time.monotonic()
+            self._error = None
+        return rows
+
+    def invalidate(self):
+        with self._lock:
+            self._loaded_at = None
+
+    def stale(self):
+        """Whether the next rows() call reloads the table from Supabase."""
+        loaded_at = self._loaded_at
+        return loaded_at is None or time.monotonic() - loaded_at > self.ttl
+
+    def rows(self):
+        if not self.stale():
+            if self._error is not None and not self._rows:
+                raise self._error
+            return self._rows
+        # Single flight: with rows to serve, nobody waits for another thread's reload
+        if not self._refresh_lock.acquire(blocking=not self._rows):
+            return self._rows
+        try:
+            if self.stale():
+                self.refresh()
+        except Exception as e:
+            with self._lock:
+                # Back off: the next attempt comes retry_after seconds from now
+                self._loaded_at = time.monotonic() - self.ttl + self.retry_after
+                if not self._rows:
+                    self._error = e
+                    raise
+        finally:
+            self._refresh_lock.release()
+        if self._error is not None and not self._rows:
+            raise self._error
+        return self._rows
+
+    def mood_id(self, mood_name):
+        """Exact-name lookup, as the ingestion scripts' eq("mood_name", ...) did."""
+        self.rows()
+        row = self._by_name.get(mood_name)
+        return row["mood_id"] if row else None
+
+    def lookup(self, mood_name):
+        """Resolve user input to a mood row: exact, then case-insensitive, then fuzzy."""
+        rows = self.rows()
+        row = self._by_name.get(mood_name)
+        if row:
+            return row
+
+        # Same semantics as ilike("mood_name", "%name%")
+        needle = mood_name.lower()
+        for row in rows:
+            if needle in row["mood_name"].lower():
+                return row
+
+        close = get_close_matches(needle.strip(), list(self._by_key), n=1, cutoff=0.75)
+        return self._by_key[close[0]] if close else None
+
+
+moods = MoodRegistry()
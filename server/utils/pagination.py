@@ -0,0 +1,20 @@
+import base64
+import json
+
+
+# Opaque keyset cursors: the client only ever echoes back what we handed out
+def encode_cursor(**fields):
+    raw = json.dumps(fields, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """Inverse of encode_cursor; raises ValueError for anything it did not produce."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        fields = json.loads(raw)
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if not isinstance(fields, dict):
+        raise ValueError("Invalid cursor")
+    return fields
@@ -0,0 +1,212 @@
+import hashlib
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from utils.insert_tmdb import GENRE_MOODS
+
+SEARCH_PREFIX = "searched for "
+
+
+class BloomFilter:
+    """Fixed-size set of strings with no false negatives and ~`error_rate` false positives.
+
+    Two generations are kept: once `capacity` keys have been added the older
+    generation is dropped, so the filter forgets the oldest keys instead of
+    filling up.
+    """
+
+    def __init__(self, capacity=2000, error_rate=0.01):
+        self.capacity = capacity
+        self.bits = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.bits / capacity * math.log(2)))
+        self._current = bytearray((self.bits + 7) // 8)
+        self._previous = None
+        self._count = 0
+
+    def _positions(self, key):
+        # Double hashing: k positions from the two halves of one digest
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.bits for i in range(self.hashes)]
+
+    def add(self, key):
+        if self._count >= self.capacity:
+            self._previous, self._current = self._current, bytearray(len(self._current))
+            self._count = 0
+        for pos in self._positions(key):
+            self._current[pos >> 3] |= 1 << (pos & 7)
+        self._count += 1
+
+    def __contains__(self, key):
+        positions = self._positions(key)
+        for bits in (self._current, self._previous):
+            if bits is not None and all(bits[pos >> 3] & (1 << (pos & 7)) for pos in positions):
+                return True
+        return False
+
+
+class UserProfile:
+    __slots__ = ("moods", "content_types", "languages", "updated_at", "seen")
+
+    def __init__(self, seen_capacity):
+        self.moods = {}
+        self.content_types = {}
+        self.languages = {}
+        self.updated_at = time.time()
+        self.seen = BloomFilter(seen_capacity)
+
+
+def _normalized(weights):
+    total = sum(weights.values())
+    return {k: v / total for k, v in weights.items()} if total else {}
+
+
+def mixed_moods(rows):
+    """Whether `rows` span several moods, so their order also depends on the user's mood ranking.
+
+    A recommendation page is filtered on one mood, and a title's mood comes from
+    its genre, so normally it does not.
+    """
+    return len({GENRE_MOODS.get(row.get("genre")) for row in rows}) > 1
+
+
+def _ranking(weights):
+    # Most weight first, ties by name: decay scales every weight alike, so it never reorders
+    return tuple(k for k, _ in sorted(weights.items(), key=lambda item: (-item[1], item[0])))
+
+
+class Personalizer:
+    """Per-user mood, content type and language affinities, updated as activity is logged.
+
+    record() is registered as an activity writer listener, so every logged
+    search adds to the user's counts. Counts decay with a half-life of
+    `half_life` seconds, so recent searches weigh more than old ones. Profiles
+    live in this process only and the least recently active users are evicted
+    beyond `max_users`.
+
+    Rows are ordered by the rank of their mood and language in the user's
+    affinities, so a page only changes order when those rankings change, not
+    with every search or every page the user is shown.
+    """
+
+    def __init__(self, max_users=5000, half_life=7 * 86400, seen_capacity=2000):
+        self.max_users = max_users
+        self.half_life = half_life
+        self.seen_capacity = seen_capacity
+        self._lock = threading.Lock()
+        self._users = OrderedDict()  # user_id -> UserProfile
+
+    def _profile(self, user_id, create=False):
+        profile = self._users.get(user_id)
+        if profile is not None:
+            self._users.move_to_end(user_id)
+        elif create:
+            profile = self._users[user_id] = UserProfile(self.seen_capacity)
+            if len(self._users) > self.max_users:
+                self._users.popitem(last=False)
+        return profile
+
+    def observe(self, user_id, mood=None, content_type=None, language=None):
+        if not user_id:
+            return
+        with self._lock:
+            profile = self._profile(user_id, create=True)
+            now = time.time()
+            decay = 0.5 ** ((now - profile.updated_at) / self.half_life)
+            profile.updated_at = now
+            for weights, value in ((profile.moods, mood), (profile.content_types, content_type),
+                                   (profile.languages, language)):
+                if decay < 1:
+                    for k in weights:
+                        weights[k] *= decay
+                if value:
+                    weights[value] = weights.get(value, 0.0) + 1.0
+
+    def record(self, row):
+        """Activity writer listener: "searched for <type>" rows count towards mood and content type."""
+        action = row.get("action") or ""
+        content_type = action[len(SEARCH_PREFIX):] if action.startswith(SEARCH_PREFIX) else None
+        self.observe(row.get("user_id"), mood=row.get("mood"), content_type=content_type)
+
+    def affinities(self, user_id):
+        with self._lock:
+            profile = self._profile(user_id)
+            if profile is None:
+                return None
+            return {
+                "moods": _normalized(profile.moods),
+                "content_types": _normalized(profile.content_types),
+                "languages": _normalized(profile.languages),
+            }
+
+    def rankings(self, user_id):
+        """The user's moods, content types and languages, most preferred first; None for an unknown user."""
+        with self._lock:
+            profile = self._profile(user_id)
+            if profile is None:
+                return None
+            return {
+                "moods": _ranking(profile.moods),
+                "content_types": _ranking(profile.content_types),
+                "languages": _ranking(profile.languages),
+            }
+
+    def profile_version(self, user_id):
+        """What rerank() orders a one-mood page of `user_id`'s rows by (hide_seen aside), or
+        None when it leaves them as they are; see mixed_moods() for other pages. It only
+        changes when the user's language ranking does, not with every search."""
+        rankings = self.rankings(user_id)
+        return rankings["languages"] or None if rankings else None
+
+    def rerank(self, user_id, content_type, rows, key, hide_seen=False):
+        """`rows` ordered by the user's mood, then language affinity, optionally without seen items.
+
+        A row's mood is that of its genre. Ties keep their original order;
+        rows are never modified.
+        """
+        rankings = self.rankings(user_id)
+        if rankings is None:
+            return rows
+        if hide_seen:
+            with self._lock:
+                profile = self._users.get(user_id)
+                if profile is not None:
+                    rows = [r for r in rows if f"{content_type}:{r.get(key)}" not in profile.seen]
+        moods, languages = rankings["moods"], rankings["languages"]
+        if not moods and not languages:
+            return rows
+        mood_rank = {mood: i for i, mood in enumerate(moods)}
+        language_rank = {language: i for i, language in enumerate(languages)}
+
+        def rank(row):
+            return (mood_rank.get(GENRE_MOODS.get(row.get("genre")), len(moods)),
+                    language_rank.get(row.get("language"), len(languages)))
+        return sorted(rows, key=rank)
+
+    def mark_seen(self, user_id, content_type, rows, key):
+        """Remember what the user was shown, for hide_seen; it does not affect the order."""
+        if not user_id:
+            return
+        with self._lock:
+            seen = self._profile(user_id, create=True).seen
+            for row in rows:
+                seen.add(f"{content_type}:{row.get(key)}")
+
+    def content_type_order(self, user_id, content_types):
+        """`content_types` with the user's most searched first."""
+        rankings = self.rankings(user_id)
+        if rankings is None:
+            return list(content_types)
+        rank = {t: i for i, t in enumerate(rankings["content_types"])}
+        return sorted(content_types, key=lambda t: rank.get(t, len(rank)))
+
+
+personalizer = Personalizer(
+    max_users=int(os.getenv("PERSONALIZE_USERS", 5000)),
+    half_life=float(os.getenv("PERSONALIZE_HALF_LIFE_DAYS", 7)) * 86400,
+    seen_capacity=int(os.getenv("PERSONALIZE_SEEN_CAPACITY", 2000)),
+)
@@ -0,0 +1,39 @@
+import re
+
+from utils.catalog_index import CONTENT_KEYS
+
+# Columns the React client renders; send "fields": "*" for whole rows
+DEFAULT_FIELDS = {
+    "movies": ("api_id", "title", "genre", "release_year", "language"),
+    "series": ("api_id", "title", "genre", "release_year", "language"),
+    "songs": ("deezer_id", "title", "artist", "release_year", "tempo", "valence", "energy"),
+}
+_FIELD_RE = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+
+def parse_fields(raw, content_type):
+    """Column tuple to select, or None for every column. Raises ValueError on bad names."""
+    if raw is None:
+        return DEFAULT_FIELDS[content_type]
+    if raw == "*":
+        return None
+    names = raw.split(",") if isinstance(raw, str) else raw
+    if not isinstance(names, list):
+        raise ValueError("fields must be a list or comma-separated string")
+    fields = []
+    for name in names:
+        name = name.strip() if isinstance(name, str) else ""
+        if not _FIELD_RE.match(name):
+            raise ValueError(f"Invalid field: {name!r}")
+        if name not in fields:
+            fields.append(name)
+    # The content key is always returned; cursors are built from it
+    key = CONTENT_KEYS[content_type]
+    if key not in fields:
+        fields.insert(0, key)
+    return tuple(fields)
+
+
+def to_columnar(rows, fields):
+    columns = list(fields) if fields else (list(rows[0]) if rows else [])
+    return columns, [[row.get(col) for col in columns] for row in rows]
@@ -0,0 +1,147 @@
+from utils.catalog_index import CONTENT_KEYS
+from utils.metrics import count_upstream
+
+
+def _or_filter_value(value):
+    # Quote for PostgREST logic trees: emails contain "." which is reserved there
+    return '"' + str(value).replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def _or_filter(query, filters):
+    """query.or_(filters), also on postgrest-py 0.10.3 (pinned through supabase==1.0.0), which has no or_()."""
+    if hasattr(query, "or_"):
+        return query.or_(filters)
+    # The same PostgREST query parameter or_() would add
+    query.params = query.params.add("or", f"({filters})")
+    return query
+
+
+def _content_query(client, content_type, mood_id, language, offset, limit, after=None, fields=None):
+    key = CONTENT_KEYS[content_type]
+    projection = ", ".join(fields) if fields else "*"
+    query = client.table(content_type).select(projection).eq("mood_id", mood_id)
+    if language:
+        query = query.eq("language", language)
+
+    # Always order by the content key so pages are stable. With `after` (cursor mode)
+    # Postgres seeks straight past the previous page instead of skipping `offset` rows.
+    query = query.order(key)
+    if after is not None:
+        return query.gt(key, after).limit(limit)
+    return query.range(offset, offset + limit - 1)
+
+
+def _activity_query(client, user_id, columns, limit, before=None):
+    # One round trip for both identifiers; served by (user_id, created_at) and
+    # (user_email, created_at) indexes
+    ident = _or_filter_value(user_id)
+    query = _or_filter(
+        client.table("activity_logs").select(columns), f"user_id.eq.{ident},user_email.eq.{ident}"
+    )
+    if before:
+        query = query.lt("created_at", before)
+    return query.order("created_at", desc=True).limit(limit)
+
+
+class Repository:
+    """The queries the routes make, over one client.
+
+    `client` is the Supabase client or anything with the same shape, such as
+    utils.local_backend.LocalClient; by default the shared one from
+    utils.sup_client, which SUP_BACKEND selects.
+    """
+
+    def __init__(self, client=None):
+        self._client = client
+
+    @property
+    def client(self):
+        if self._client is None:
+            from utils.sup_client import get_client
+            self._client = get_client()
+        return self._client
+
+    # moods
+
+    def moods(self):
+        count_upstream("moods")
+        return self.client.table("moods").select("mood_id, mood_name").execute().data or []
+
+    # movies / series / songs
+
+    def content_page(self, content_type, mood_id, language, offset, limit, after=None, fields=None):
+        count_upstream(content_type)
+        query = _content_query(self.client, content_type, mood_id, language, offset, limit, after, fields)
+        return query.execute().data or []
+
+    def catalog_watermark(self):
+        """(row count, largest key) of each content table: changes with any insert or delete."""
+        marks = {}
+        for table, key in CONTENT_KEYS.items():
+            count_upstream(table)
+            resp = self.client.table(table).select(key, count="exact").order(key, desc=True).limit(1).execute()
+            marks[table] = (resp.count, resp.data[0][key] if resp.data else None)
+        return marks
+
+    # activity_logs
+
+    def activity_page(self, user_id, columns, limit, before=None):
+        count_upstream("activity_logs")
+        return _activity_query(self.client, user_id, columns, limit, before).execute().data or []
+
+    def insert_activity(self, rows):
+        count_upstream("activity_logs_insert")
+        return self.client.table("activity_logs").insert(rows).execute().data or []
+
+    # auth
+
+    def sign_up(self, email, password):
+        count_upstream("auth")
+        return self.client.auth.sign_up({"email": email, "password": password})
+
+    def sign_in(self, email, password):
+        count_upstream("auth")
+        return self.client.auth.sign_in_with_password({"email": email, "password": password})
+
+    def refresh_session(self, refresh_token):
+        count_upstream("auth")
+        return self.client.auth.refresh_session(refresh_token)
+
+
+class AsyncRepository:
+    """Repository for asgi.py: the same queries, awaited on the event loop's pooled async client."""
+
+    def __init__(self, client=None):
+        self._client = client
+
+    @property
+    def client(self):
+        if self._client is not None:
+            return self._client
+        from utils.sup_client import get_async_client
+        return get_async_client()
+
+    async def content_page(self, content_type, mood_id, language, offset, limit, after=None, fields=None):
+        count_upstream(content_type)
+        query = _content_query(self.client, content_type, mood_id, language, offset, limit, after, fields)
+        return (await query.execute()).data or []
+
+    async def activity_page(self, user_id, columns, limit, before=None):
+        count_upstream("activity_logs")
+        return (await _activity_query(self.client, user_id, columns, limit, before).execute()).data or []
+
+    async def sign_up(self, email, password):
+        count_upstream("auth")
+        return await self.client.auth.sign_up({"email": email, "password": password})
+
+    async def sign_in(self, email, password):
+        count_upstream("auth")
+        return await self.client.auth.sign_in_with_password({"email": email, "password": password})
+
+    async def refresh_session(self, refresh_token):
+        count_upstream("auth")
+        return await self.client.auth.refresh_session(refresh_token)
+
+
+repo = Repository()
+async_repo = AsyncRepository()
@@ -0,0 +1,147 @@
+import asyncio
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from utils import catalog_version
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class ResultCache:
+    """Bounded LRU cache with TTL expiry and single-flight loading.
+
+    Bounded both by entry count and by an estimate of the JSON size of the
+    cached values. Concurrent misses on the same key wait for one loader call
+    instead of each querying upstream. Everything is dropped when the catalog
+    version stamp changes (see utils.catalog_version).
+    """
+
+    def __init__(self, max_entries=2048, max_bytes=64 * 1024 * 1024, ttl=300):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (expires_at, size, value)
+        self._inflight = {}
+        self._async_inflight = {}  # key -> asyncio.Task, for get_or_load_async
+        self._bytes = 0
+        self._version = catalog_version.current()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    def get_or_load(self, key, loader):
+        self._check_version()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[2]
+            self.misses += 1
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _Flight()
+
+        if not leader:
+            flight.done.wait()
+            with self._lock:
+                self.coalesced += 1
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            flight.value = loader()
+            self._store(key, flight.value)
+            return flight.value
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            flight.done.set()
+
+    async def get_or_load_async(self, key, load):
+        """get_or_load for a coroutine function `load`: concurrent misses in one
+        event loop await a single load() instead of a thread each."""
+        self._check_version()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[2]
+            self.misses += 1
+            task = self._async_inflight.get(key)
+            if task is None:
+                task = self._async_inflight[key] = asyncio.ensure_future(self._load_async(key, load))
+            else:
+                self.coalesced += 1
+        # shield: one cancelled request must not cancel the load the others wait for
+        return await asyncio.shield(task)
+
+    async def _load_async(self, key, load):
+        try:
+            value = await load()
+            self._store(key, value)
+            return value
+        finally:
+            with self._lock:
+                self._async_inflight.pop(key, None)
+
+    def _store(self, key, value):
+        size = len(json.dumps(value, default=str))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old:
+                self._bytes -= old[1]
+            self._entries[key] = (time.monotonic() + self.ttl, size, value)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, (_, evicted_size, _) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def _check_version(self):
+        version = catalog_version.current()
+        if version != self._version:
+            self._version = version
+            self.invalidate()
+
+    def invalidate(self, predicate=None):
+        """Drop every entry, or only those whose key matches `predicate(key)`."""
+        with self._lock:
+            for key in [k for k in self._entries if predicate is None or predicate(k)]:
+                self._bytes -= self._entries.pop(key)[1]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "evictions": self.evictions,
+            }
+
+
+results_cache = ResultCache(
+    max_entries=int(os.getenv("RESULT_CACHE_ENTRIES", 2048)),
+    max_bytes=int(os.getenv("RESULT_CACHE_BYTES", 64 * 1024 * 1024)),
+    ttl=int(os.getenv("RESULT_CACHE_TTL", 300)),
+)
@@ -0,0 +1,162 @@
+import os
+import threading
+import time
+
+import numpy as np
+from sklearn.neighbors import NearestNeighbors
+
+from utils import catalog_version
+from utils.catalog_index import pull_rows
+
+SONG_FIELDS = "deezer_id, title, artist, release_year, tempo, valence, energy, mood_id"
+TEMPO_RANGE = (60.0, 200.0)  # BPM mapped onto [0, 1] so it weighs like valence/energy
+
+SIMILAR_REFRESH_INTERVAL = int(os.getenv("SIMILAR_REFRESH_INTERVAL", 60))
+# After a failed pull the current index keeps serving; the next attempt waits this long
+SIMILAR_RETRY_SECONDS = float(os.getenv("SIMILAR_RETRY_SECONDS", 5))
+# New songs are searched brute-force until they exceed this share of the tree, then it is refit
+REBUILD_RATIO = 0.1
+MIN_REBUILD = 256
+
+
+def classify_moods(valence, energy, tempo=None):
+    """Mood name per song, for whole arrays of valence/energy values."""
+    valence = np.asarray(valence, dtype=float)
+    energy = np.asarray(energy, dtype=float)
+    conditions = [
+        (valence > 0.7) & (energy > 0.7),
+        (valence < 0.4) & (energy < 0.4),
+        (energy > 0.7) & (valence < 0.5),
+        (valence > 0.5) & (energy < 0.5),
+    ]
+    choices = ["Happy / Joyful", "Sad / Melancholic", "Energetic / Excited", "Romantic / Love"]
+    return np.select(conditions, choices, default="Thoughtful / Calm").tolist()
+
+
+def feature_matrix(valence, energy, tempo):
+    low, high = TEMPO_RANGE
+    tempo = np.clip((np.asarray(tempo, dtype=float) - low) / (high - low), 0.0, 1.0)
+    return np.column_stack([
+        np.asarray(valence, dtype=float),
+        np.asarray(energy, dtype=float),
+        tempo,
+    ]).astype(np.float32)
+
+
+class SongIndex:
+    """Nearest-neighbour index over normalized (valence, energy, tempo) song features.
+
+    Rows [0, tree_size) are covered by a fitted NearestNeighbors model; songs
+    added since are scanned brute-force and folded into a refit once they make
+    up more than REBUILD_RATIO of the tree. Searches only wait for the lock
+    while pulled rows are being added, never for the pull itself.
+    """
+
+    def __init__(self, client=None, refresh_interval=SIMILAR_REFRESH_INTERVAL, retry_after=SIMILAR_RETRY_SECONDS):
+        self._client = client
+        self.refresh_interval = refresh_interval
+        self.retry_after = retry_after
+        self._lock = threading.RLock()
+        self._refresh_lock = threading.Lock()  # held by the one thread pulling
+        self._rows = []
+        self._positions = {}  # deezer_id -> row position
+        self._features = np.empty((0, 3), dtype=np.float32)
+        self._model = None
+        self._tree_size = 0
+        self.watermark = None
+        self._refreshed_at = None
+        self._version = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            from utils.sup_client import sb
+            self._client = sb
+        return self._client
+
+    def __len__(self):
+        return len(self._rows)
+
+    def add_rows(self, rows):
+        rows = [
+            r for r in rows
+            if r.get("deezer_id") not in self._positions
+            and None not in (r.get("valence"), r.get("energy"), r.get("tempo"))
+        ]
+        with self._lock:
+            for row in rows:
+                self._positions[row["deezer_id"]] = len(self._rows)
+                self._rows.append(row)
+            if rows:
+                new = feature_matrix(
+                    [r["valence"] for r in rows], [r["energy"] for r in rows], [r["tempo"] for r in rows]
+                )
+                self._features = np.vstack([self._features, new])
+            pending = len(self._rows) - self._tree_size
+            if pending and (self._model is None or pending > max(MIN_REBUILD, REBUILD_RATIO * self._tree_size)):
+                self._rebuild()
+
+    def _rebuild(self):
+        self._model = NearestNeighbors(algorithm="kd_tree").fit(self._features)
+        self._tree_size = len(self._features)
+
+    def refresh(self):
+        """Pull songs above the deezer_id watermark and add them."""
+        version = catalog_version.current()
+        for rows in pull_rows(self.client, "songs", "deezer_id", self.watermark, SONG_FIELDS):
+            self.add_rows(rows)
+            if rows:
+                self.watermark = max(self.watermark or rows[-1]["deezer_id"], rows[-1]["deezer_id"])
+        self._version = version
+        self._refreshed_at = time.monotonic()
+
+    def ensure_fresh(self):
+        stale = (
+            self._refreshed_at is None
+            or time.monotonic() - self._refreshed_at > self.refresh_interval
+            or catalog_version.current() != self._version
+        )
+        # One pull at a time; with an index to serve from, nobody waits for it
+        if not stale or not self._refresh_lock.acquire(blocking=not self._rows):
+            return
+        try:
+            self.refresh()
+        except Exception as e:
+            if not self._rows:
+                raise
+            print("Song index refresh failed, serving the current index:", e)
+            self._version = catalog_version.current()
+            self._refreshed_at = time.monotonic() - self.refresh_interval + self.retry_after
+        finally:
+            self._refresh_lock.release()
+
+    def similar(self, deezer_id=None, features=None, k=10):
+        """The k songs closest to a known song (by deezer_id) or to a (valence, energy, tempo) triple.
+
+        Raises KeyError for an unknown deezer_id.
+        """
+        with self._lock:
+            exclude = None
+            if deezer_id is not None:
+                exclude = self._positions[str(deezer_id)]
+                query = self._features[exclude]
+            else:
+                query = feature_matrix(*([v] for v in features))[0]
+
+            candidates = []
+            if self._tree_size:
+                n = min(k + 1, self._tree_size)
+                dist, idx = self._model.kneighbors(query.reshape(1, -1), n_neighbors=n)
+                candidates += zip(dist[0].tolist(), idx[0].tolist())
+            if len(self._features) > self._tree_size:
+                pending = np.linalg.norm(self._features[self._tree_size:] - query, axis=1)
+                candidates += ((d, self._tree_size + i) for i, d in enumerate(pending.tolist()))
+
+            candidates.sort()
+            return [
+                dict(self._rows[pos], distance=round(dist, 4))
+                for dist, pos in candidates if pos != exclude
+            ][:k]
+
+
+song_index = SongIndex()
@@ -0,0 +1,47 @@
+from utils.activity_writer import activity_writer
+from utils.auth_tokens import claims_cache
+from utils.catalog_index import catalog_index, CATALOG_INDEX_ENABLED
+from utils.catalog_snapshot import catalog_snapshot
+from utils.http_response import compressed_cache
+from utils.metrics import metrics
+from utils.mood_registry import moods
+from utils.result_cache import results_cache
+
+# Process setup shared by the WSGI (app.py) and ASGI (asgi.py) entry points
+
+_collectors_registered = False
+
+
+def register_collectors():
+    """Cache and writer stats as gauges on /metrics; once per process."""
+    global _collectors_registered
+    if _collectors_registered:
+        return
+    _collectors_registered = True
+    metrics.add_collector(lambda: {f"moodmuse_result_cache_{k}": v for k, v in results_cache.stats().items()})
+    metrics.add_collector(lambda: {f"moodmuse_activity_writer_{k}": v for k, v in activity_writer.stats().items()})
+    metrics.add_collector(lambda: {f"moodmuse_compressed_cache_{k}": v for k, v in compressed_cache.stats().items()})
+    if claims_cache:
+        metrics.add_collector(lambda: {f"moodmuse_auth_claims_cache_{k}": v for k, v in claims_cache.stats().items()})
+
+
+def warm_up():
+    """Load what requests should find in process before a worker takes its first one."""
+    # Map the catalog snapshot written by the last ingestion (if any); pages of the
+    # current catalog version are served from it, and it is the fallback when Supabase is down
+    snapshot = catalog_snapshot.get()
+
+    # Load the moods table once up front so requests resolve moods in process
+    try:
+        moods.refresh()
+    except Exception as e:
+        if snapshot:
+            moods.load(snapshot.moods)
+            print("Could not load moods from Supabase, using the catalog snapshot's copy:", e)
+        else:
+            print("Could not preload moods, will retry on first request:", e)
+
+    # Optional: serve recommendations from an in-process copy of the catalog (CATALOG_INDEX=1).
+    # It loads in the background; requests fall back to Supabase until it is warm.
+    if CATALOG_INDEX_ENABLED:
+        catalog_index.start()
@@ -1,10 +1,60 @@
-from supabase import create_client, Client
-import os 
+import asyncio
+import os
+import threading
+import weakref
 from dotenv import load_dotenv
 
 load_dotenv()
 
 SUP_URL = os.getenv("SUP_URL")
 SUP_KEY = os.getenv("SUP_KEY")
+# "local" swaps Supabase for the SQLite stand-in in utils/local_backend.py (offline load tests)
+SUP_BACKEND = os.getenv("SUP_BACKEND", "supabase")
 
-sb: Client = create_client(SUP_URL, SUP_KEY)
+_lock = threading.Lock()
+_client = None
+# Async clients hold connection pools bound to the event loop that made them
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def get_client():
+    """The shared sync client, created on first use."""
+    global _client
+    if _client is None:
+        with _lock:
+            if _client is None:
+                if SUP_BACKEND == "local":
+                    from utils.local_backend import create_local_client
+                    _client = create_local_client()
+                else:
+                    from supabase import create_client
+                    _client = create_client(SUP_URL, SUP_KEY)
+    return _client
+
+
+def get_async_client():
+    """The shared async client of the running event loop (asgi.py), created on first use."""
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        if SUP_BACKEND == "local":
+            from utils.local_backend import AsyncLocalClient
+            client = AsyncLocalClient(get_client())
+        else:
+            from utils.async_supabase import AsyncSupabase
+            client = AsyncSupabase(SUP_URL, SUP_KEY)
+        _async_clients[loop] = client
+    return client
+
+
+async def close_async_client():
+    client = _async_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+
+def __getattr__(name):
+    # `from utils.sup_client import sb` keeps working, without connecting at import time
+    if name == "sb":
+        return get_client()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")